@@ -0,0 +1,43 @@
+import argparse
+import json
+
+from forecasting import create_app, warm_up
+from forecasting.blueprints.api.transaction import run_backtest
+
+
+def main():
+    # Backtests the algorithms on the history of an SLT query, the best one is used by algorithm=auto.
+    # Usage: python backtest.py --input-data '{"zone": "A"}' --event-type both --horizon 24
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input-data', type=json.loads, default={}, help='The SLT query as JSON')
+    parser.add_argument('--event-type', default='both', choices=('storage', 'retrieval', 'both'))
+    parser.add_argument('--horizon', type=float, required=True, help='The forecast horizon in hours')
+    parser.add_argument('--origins', type=int, help='The number of rolling forecast origins')
+    parser.add_argument('--step', type=float, help='The hours between two origins, by default the horizon')
+    parser.add_argument('--bucket', type=float, help='The length of the scored count buckets in hours, by default the horizon')
+    parser.add_argument('--candidates', type=json.loads, help='The candidates as JSON list of {"algorithm": ..., "input_data": {...}}')
+    args = parser.parse_args()
+
+    app = create_app()
+    warm_up()
+
+    with app.app_context():
+        result = run_backtest({
+            'input_data': args.input_data,
+            'event_type': args.event_type,
+            'prediction_horizon': args.horizon,
+            'origins': args.origins,
+            'step': args.step,
+            'bucket': args.bucket,
+            'candidates': args.candidates
+        })
+        print(f"{'algorithm':<24} {'parameters':<32} {'mae':>10} {'rmse':>10} {'bias':>10} {'failures':>8}")
+        for score in result['scores']:
+            values = [f"{score[metric]:10.3f}" if score[metric] is not None else f"{'-':>10}" for metric in ('mae', 'rmse', 'bias')]
+            print(f"{score['algorithm']:<24} {json.dumps(score['input_data']):<32} {' '.join(values)} {score['failures']:>8}")
+        print(f"Backtest {result['id']}: algorithm=auto uses {result['algorithm']} {json.dumps(result['parameters'])}")
+
+
+# The process pool spawns its workers, which import this script as __main__ again
+if __name__ == '__main__':
+    main()
\ No newline at end of file
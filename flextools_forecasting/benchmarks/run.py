@@ -0,0 +1,225 @@
+"""
+Benchmarks the transaction forecasting on synthetic warehouse workloads served by a local SLT stub.
+
+Run from the application directory, e.g.
+
+    python -m benchmarks.run --sizes 1000 100000 --output bench.json
+    python -m benchmarks.run --sizes 1000 100000 --compare bench.json
+
+The api stage posts through the Flask test client and needs the configured database,
+skip it with --no-api.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from . import workload
+from .slt_stub import SLTStub
+
+# Named algorithm variants: (algorithm, model parameters)
+VARIANTS = {
+    'poisson_process': ('poisson_process', {'seed': 0}),
+    'poisson_process_mc': ('poisson_process', {'seed': 0, 'samples': 1000}),
+    'exponential_smoothing': ('exponential_smoothing', {}),
+    'holt_winters': ('holt_winters', {}),
+    'holt_winters_fit': ('holt_winters', {'fit': True}),
+    'seasonal_poisson': ('seasonal_poisson', {}),
+}
+
+
+def measure(func, iterations, setup=None):
+    """
+    Times `iterations` calls of func and measures the peak traced memory of one extra call.
+
+    :return: The latencies in seconds and the peak memory in bytes
+    :rtype: tuple
+    """
+    latencies = []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    # Tracing slows the call down, so memory is measured separately from the latency
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return latencies, peak
+
+
+def summarize(latencies, peak, events):
+    latencies_ms = np.array(latencies) * 1000
+    p50, p90, p99 = np.percentile(latencies_ms, (50, 90, 99))
+    return {
+        'iterations': len(latencies),
+        'mean_ms': float(latencies_ms.mean()),
+        'min_ms': float(latencies_ms.min()),
+        'max_ms': float(latencies_ms.max()),
+        'p50_ms': float(p50),
+        'p90_ms': float(p90),
+        'p99_ms': float(p99),
+        'events_per_second': float(events / (p50 / 1000)) if p50 else None,
+        'peak_memory_bytes': int(peak)
+    }
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'arguments': vars(args)
+    }
+
+
+def run(args):
+    stub = SLTStub().start()
+    # The SLT URI is read when the application modules are imported
+    os.environ['STORAGE_LOCATION_TRACKING_URI'] = stub.url
+    from forecasting.algorithms.transaction import TransactionForecastAlgorithm, history_cache, forecast_cache
+
+    results = []
+    app = None
+    if args.api:
+        from forecasting import create_app
+        app = create_app()
+
+    for size in args.sizes:
+        name = f"ul_records_{size}"
+        records = workload.ul_records(size, rate=args.rate, daily_amplitude=args.daily_amplitude,
+                                      weekly_amplitude=args.weekly_amplitude, missing_retrieval=args.missing,
+                                      items=args.items, seed=args.seed)
+        stub.add_dataset(name, records, workload.encode(records))
+        input_data = {'dataset': name}
+
+        latencies, peak = measure(
+            lambda: TransactionForecastAlgorithm.load_transaction_history(input_data),
+            args.iterations, setup=history_cache.clear
+        )
+        results.append({'stage': 'fetch_parse', 'size': size, **summarize(latencies, peak, size)})
+        print(f"{size:>10} fetch_parse {results[-1]['p50_ms']:10.2f} ms", file=sys.stderr)
+
+        history = TransactionForecastAlgorithm.load_transaction_history(input_data)
+        for variant in args.algorithms:
+            algorithm, parameters = VARIANTS[variant]
+            for event_type in args.event_types:
+                events = TransactionForecastAlgorithm.select_events(history, event_type).size
+                latencies, peak = measure(
+                    lambda: TransactionForecastAlgorithm.predict(algorithm, {**input_data, **parameters}, event_type, args.horizon, history),
+                    args.iterations
+                )
+                results.append({'stage': 'algorithm', 'size': size, 'algorithm': variant, 'event_type': event_type, **summarize(latencies, peak, events)})
+                print(f"{size:>10} {variant} {event_type} {results[-1]['p50_ms']:10.2f} ms", file=sys.stderr)
+
+        if args.items:
+            from forecasting.algorithms.demand import DemandForecastAlgorithm
+            demand_input = {**input_data, 'item_number': [workload.item_number(item) for item in range(args.items)]}
+            demand_history = DemandForecastAlgorithm.get_demand_history(demand_input)
+            for algorithm in ('moving_average', 'exponential_smoothing'):
+                latencies, peak = measure(
+                    lambda: DemandForecastAlgorithm.predict(algorithm, demand_input, 7, demand_history),
+                    args.iterations
+                )
+                results.append({'stage': 'demand', 'size': size, 'algorithm': algorithm, 'items': args.items, **summarize(latencies, peak, demand_history['item'].size)})
+                print(f"{size:>10} demand {algorithm} {results[-1]['p50_ms']:10.2f} ms", file=sys.stderr)
+
+        if app is not None:
+            client = app.test_client()
+            for variant in args.algorithms:
+                algorithm, parameters = VARIANTS[variant]
+                iteration = iter(range(sys.maxsize))
+
+                def post():
+                    # A fresh seed per call keeps the forecast memoization from answering
+                    body = {
+                        'algorithm': algorithm,
+                        'event_type': 'both',
+                        'prediction_horizon': args.horizon,
+                        'input_data': {**input_data, **parameters, 'seed': next(iteration)}
+                    }
+                    response = client.post('/api/v1/transaction/', json=body)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"POST failed with {response.status_code}: {response.get_data(as_text=True)}")
+
+                def cold():
+                    history_cache.clear()
+                    forecast_cache.clear()
+
+                latencies, peak = measure(post, args.iterations, setup=cold)
+                results.append({'stage': 'api_post', 'size': size, 'algorithm': variant, 'event_type': 'both', **summarize(latencies, peak, size)})
+                print(f"{size:>10} api_post {variant} {results[-1]['p50_ms']:10.2f} ms", file=sys.stderr)
+
+    stub.stop()
+    return {'metadata': metadata(args), 'results': results}
+
+
+def result_key(result):
+    return (result['stage'], result['size'], result.get('algorithm'), result.get('event_type'))
+
+
+def compare(report, baseline):
+    """
+    Prints the median latency of each result relative to the baseline report.
+    """
+    previous = {result_key(result): result for result in baseline['results']}
+    for result in report['results']:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        ratio = result['p50_ms'] / before['p50_ms'] if before['p50_ms'] else float('nan')
+        label = ' '.join(str(part) for part in result_key(result) if part is not None)
+        print(f"{label:<60} {before['p50_ms']:10.2f} ms -> {result['p50_ms']:10.2f} ms ({ratio:5.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Numbers of ulRecords, up to 1e7')
+    parser.add_argument('--algorithms', nargs='+', default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument('--event-types', nargs='+', default=['storage', 'both'], choices=['storage', 'retrieval', 'both'])
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--horizon', type=float, default=1, help='Prediction horizon in hours')
+    parser.add_argument('--rate', type=float, default=60, help='Mean storage rate per hour')
+    parser.add_argument('--daily-amplitude', type=float, default=0.5)
+    parser.add_argument('--weekly-amplitude', type=float, default=0.3)
+    parser.add_argument('--missing', type=float, default=0.2, help='Fraction of records without retrieval')
+    parser.add_argument('--items', type=int, default=0, help='Spread the records over this many items and benchmark the demand forecasts')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-api', dest='api', action='store_false', help='Skip the POST stage that needs the database')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--compare', help='Print the change against a previous JSON report')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
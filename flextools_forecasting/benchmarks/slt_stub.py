@@ -0,0 +1,80 @@
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class SLTStub:
+    """
+    A local stand-in for the `/ulRecords` endpoint of the Storage Location Tracking service.
+
+    Datasets are registered by name and selected with the 'dataset' key of the JSON query,
+    the 'since' key returns only the records with an event after that time and the 'item_number'
+    key only the records of those items.
+    """
+    def __init__(self, host='127.0.0.1', port=0):
+        self.datasets = {}
+        self._encoded = {}
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                query = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                stub.requests += 1
+                if self.path.split('?')[0].rstrip('/') != '/ulRecords' or query.get('dataset') not in stub.datasets:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = stub.body(query['dataset'], query.get('since'), query.get('item_number'))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_dataset(self, name, records, encoded=None):
+        self.datasets[name] = records
+        self._encoded[name] = encoded
+
+    def body(self, name, since=None, item_numbers=None):
+        if since is None and item_numbers is None and self._encoded[name] is not None:
+            return self._encoded[name]
+        records = self.datasets[name]
+        if item_numbers is not None:
+            item_numbers = set(item_numbers if isinstance(item_numbers, list) else [item_numbers])
+            records = [record for record in records if record.get('item_number') in item_numbers]
+        if since is not None:
+            since = datetime.fromisoformat(since.replace('Z', '+00:00')).replace(tzinfo=None).isoformat(timespec='microseconds') + 'Z'
+            # The generated ISO strings share this format and compare chronologically, "None" never matches
+            records = [
+                record for record in records
+                if (record['stored_at'] != "None" and record['stored_at'] > since)
+                or (record['retrieved_at'] != "None" and record['retrieved_at'] > since)
+            ]
+        return json.dumps(records, separators=(',', ':')).encode()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,76 @@
+"""
+Benchmarks the worker startup, i.e. the time from a fresh interpreter to a ready app and to the first forecast.
+
+Run from the application directory, e.g.
+
+    python -m benchmarks.startup --iterations 10 --output startup.json
+
+Each iteration starts a new interpreter and times importing and creating the app, warming
+up the algorithms (what a preloaded gunicorn parent does once) and the first forecast over
+a small synthetic history. No database or SLT service is needed.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+from .run import metadata
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+from forecasting import create_app, warm_up
+app = create_app()
+created = time.perf_counter()
+if {warm}:
+    warm_up()
+warmed = time.perf_counter()
+from benchmarks import workload
+from forecasting.algorithms.transaction import TransactionForecastAlgorithm
+history = TransactionForecastAlgorithm.parse_ul_records(workload.ul_records(1000))
+for algorithm in ('poisson_process', 'exponential_smoothing', 'holt_winters'):
+    TransactionForecastAlgorithm.predict(algorithm, {{}}, 'both', 1, history)
+forecast = time.perf_counter()
+print(json.dumps({{'create_app': created - start, 'warm_up': warmed - created, 'first_forecast': forecast - warmed, 'total': forecast - start}}))
+"""
+
+
+def probe(warm):
+    output = subprocess.run([sys.executable, '-c', PROBE.format(warm=warm)], stdout=subprocess.PIPE, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    for mode, warm in (('lazy', False), ('preload', True)):
+        timings = [probe(warm) for _ in range(args.iterations)]
+        for stage in timings[0]:
+            latencies_ms = np.array([timing[stage] for timing in timings]) * 1000
+            results.append({
+                'stage': stage,
+                'mode': mode,
+                'iterations': len(timings),
+                'p50_ms': float(np.median(latencies_ms)),
+                'min_ms': float(latencies_ms.min()),
+                'max_ms': float(latencies_ms.max())
+            })
+            print(f"{mode:>8} {stage:<15} {results[-1]['p50_ms']:10.2f} ms", file=sys.stderr)
+
+    report = {'metadata': metadata(args), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == '__main__':
+    main()
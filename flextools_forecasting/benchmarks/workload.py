@@ -0,0 +1,106 @@
+import json
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+SECONDS_PER_WEEK = 7 * SECONDS_PER_DAY
+
+
+def arrival_times(rng, size, rate, start, daily_amplitude=0.5, weekly_amplitude=0.3):
+    """
+    Draws `size` arrival times (epoch seconds) of a non-homogeneous Poisson process with daily
+    and weekly seasonality by thinning a homogeneous process.
+
+    :param rng: The random generator
+    :type rng: numpy.random.Generator
+    :param size: The number of arrivals
+    :type size: int
+    :param rate: The mean arrival rate per hour
+    :type rate: float
+    :param start: The epoch second of the first possible arrival
+    :type start: float
+    :param daily_amplitude: The relative amplitude of the daily cycle (0 disables it)
+    :type daily_amplitude: float
+    :param weekly_amplitude: The relative amplitude of the weekly cycle (0 disables it)
+    :type weekly_amplitude: float
+    :return: The sorted arrival times
+    :rtype: numpy.ndarray
+    """
+    max_rate = rate * (1 + daily_amplitude) * (1 + weekly_amplitude) / 3600
+    arrivals = []
+    current = start
+    remaining = size
+    while remaining > 0:
+        # Accepted fraction is about 1 / ((1 + daily) * (1 + weekly)), oversample accordingly
+        candidates = current + np.cumsum(rng.exponential(1 / max_rate, size=int(remaining * (1 + daily_amplitude) * (1 + weekly_amplitude) * 1.1) + 100))
+        intensity = (1 + daily_amplitude * np.sin(2 * np.pi * candidates / SECONDS_PER_DAY)) \
+            * (1 + weekly_amplitude * np.sin(2 * np.pi * candidates / SECONDS_PER_WEEK)) * rate / 3600
+        accepted = candidates[rng.random(candidates.size) * max_rate < intensity][:remaining]
+        arrivals.append(accepted)
+        remaining -= accepted.size
+        current = candidates[-1]
+    return np.concatenate(arrivals)
+
+
+def iso_strings(epoch_seconds):
+    """
+    Formats epoch seconds as ISO 8601 UTC strings with a 'Z' suffix.
+    """
+    return np.char.add(np.datetime_as_string((epoch_seconds * 1e6).astype('datetime64[us]')), 'Z')
+
+
+def ul_records(size, rate=60, start=1704067200, daily_amplitude=0.5, weekly_amplitude=0.3,
+               mean_dwell_hours=24, missing_retrieval=0.2, missing_storage=0.01, items=0, seed=0):
+    """
+    Generates synthetic ulRecords as returned by the Storage Location Tracking service.
+
+    :param size: The number of records
+    :type size: int
+    :param rate: The mean storage rate per hour
+    :type rate: float
+    :param start: The epoch second the history starts at
+    :type start: float
+    :param daily_amplitude: The relative amplitude of the daily cycle
+    :type daily_amplitude: float
+    :param weekly_amplitude: The relative amplitude of the weekly cycle
+    :type weekly_amplitude: float
+    :param mean_dwell_hours: The mean time a load unit stays stored
+    :type mean_dwell_hours: float
+    :param missing_retrieval: The fraction of records not retrieved yet ("None")
+    :type missing_retrieval: float
+    :param missing_storage: The fraction of records with a missing storage time ("None")
+    :type missing_storage: float
+    :param items: The number of items ('item_number') the records are spread over with
+        Zipf-like popularity, no item numbers if 0
+    :type items: int
+    :param seed: The random seed
+    :type seed: int
+    :return: The records
+    :rtype: list
+    """
+    rng = np.random.default_rng(seed)
+    stored = arrival_times(rng, size, rate, start, daily_amplitude, weekly_amplitude)
+    retrieved = stored + rng.exponential(mean_dwell_hours * 3600, size=size)
+    stored_at = iso_strings(stored).astype(object)
+    retrieved_at = iso_strings(retrieved).astype(object)
+    stored_at[rng.random(size) < missing_storage] = "None"
+    retrieved_at[rng.random(size) < missing_retrieval] = "None"
+    records = [
+        {'id': i, 'stored_at': stored_value, 'retrieved_at': retrieved_value}
+        for i, (stored_value, retrieved_value) in enumerate(zip(stored_at.tolist(), retrieved_at.tolist()))
+    ]
+    if items:
+        popularity = 1 / np.arange(1, items + 1)
+        for record, item in zip(records, rng.choice(items, size=size, p=popularity / popularity.sum()).tolist()):
+            record['item_number'] = item_number(item)
+    return records
+
+
+def item_number(index):
+    return f"ITEM-{index:05d}"
+
+
+def encode(records):
+    """
+    Encodes records as the JSON body served by the SLT stub.
+    """
+    return json.dumps(records, separators=(',', ':')).encode()
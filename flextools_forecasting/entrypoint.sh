@@ -1,7 +1,17 @@
 #!/bin/sh
 
+# The gunicorn workers share their metrics through METRICS_DIR, which starts empty
+export METRICS_DIR="${METRICS_DIR:-/tmp/forecasting-metrics}"
+rm -rf "$METRICS_DIR"
+
 python init_db.py
 
 python save_swagger.py
 
-exec gunicorn --bind 0.0.0.0:5002 --log-level 'debug' wsgi:app 
+python run_jobs.py &
+
+if [ -n "$EVENT_STORE_DIR" ]; then
+    python sync_events.py &
+fi
+
+exec gunicorn --preload --bind 0.0.0.0:5002 --log-level 'debug' wsgi:app 
@@ -11,8 +11,10 @@ def create_app(config_filename="config.py"):
     db.init_app(app)
     CORS(app)
 
-    with app.app_context():
-        db.create_all()
+    # The schema is created by init_db.py, workers only opt in to avoid a database round trip per boot
+    if app.config.get('CREATE_SCHEMA_ON_STARTUP'):
+        with app.app_context():
+            db.create_all()
     
     # LayoutHandler.load_layout(app, app.config.get("LAYOUT_FILE"))
 
@@ -22,5 +24,15 @@ def create_app(config_filename="config.py"):
     # app.register_blueprint(ui_blueprint)
     app.register_blueprint(api_blueprint)
 
+    from .scheduler import start_scheduler
+    app.before_request(start_scheduler)
+
     return app
 
+def warm_up():
+    """
+    Imports the forecasting algorithms and their NumPy/SciPy dependencies ahead of the first request.
+    Called by wsgi.py, so that with gunicorn --preload the workers fork from a warm parent.
+    """
+    import scipy.signal
+    from .algorithms import transaction
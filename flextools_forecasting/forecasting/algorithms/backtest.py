@@ -0,0 +1,143 @@
+import numpy as np
+from instance import config
+from .pool import get_process_pool, shared_arrays, attach_arrays
+from .transaction import TransactionForecastAlgorithm, US_PER_HOUR, count_buckets, slt_query, to_datetime_strings
+
+# The error metrics of a backtest, the candidates are ranked by the first one
+METRICS = ('mae', 'rmse', 'bias')
+
+def backtest_candidates(candidates=None):
+    """
+    Returns the algorithm/parameter sets to evaluate, by default every registered algorithm with
+    the parameter sets of BACKTEST_PARAMETERS (or its defaults).
+
+    :param candidates: Dicts with 'algorithm' and optional 'input_data' holding model parameters
+    :type candidates: list
+    :rtype: list
+    """
+    if candidates is None:
+        candidates = [
+            {'algorithm': algorithm.value, 'input_data': parameters}
+            for algorithm in TransactionForecastAlgorithm.algorithms
+            for parameters in config.BACKTEST_PARAMETERS.get(algorithm.value, [{}])
+        ]
+    for candidate in candidates:
+        if candidate.get('algorithm') not in TransactionForecastAlgorithm.algorithms:
+            raise ValueError("Invalid algorithm")
+        if slt_query(candidate.get('input_data')):
+            raise ValueError("Backtest candidates can only set model parameters")
+    return [{'algorithm': candidate['algorithm'], 'input_data': candidate.get('input_data') or {}} for candidate in candidates]
+
+def rolling_origins(timestamps, horizon, origins, step=None):
+    """
+    Returns up to `origins` forecast origins, every `step` hours (default the horizon) back from
+    the latest event whose horizon is fully observed. Each origin is the latest event before
+    its nominal time, so that the forecasts of all algorithms start at the origin.
+
+    :return: The sorted origins as epoch microseconds
+    :rtype: numpy.ndarray
+    """
+    step = float(step or horizon)
+    if horizon <= 0 or step <= 0:
+        raise ValueError("prediction_horizon and step must be positive")
+    nominal = timestamps[-1] - int(horizon * US_PER_HOUR) - np.rint(np.arange(origins) * step * US_PER_HOUR).astype(np.int64)
+    indexes = np.searchsorted(timestamps, nominal, side='right') - 1
+    # Leave some events before the first origin to fit on
+    indexes = np.unique(indexes[indexes >= config.BACKTEST_MIN_EVENTS])
+    if indexes.size == 0:
+        raise ValueError("Not enough history for a backtest with this horizon.")
+    return timestamps[indexes]
+
+def _backtest_origins(descriptors, event_type, horizon, bucket, origins, candidates):
+    """
+    Forecasts the horizon after each origin with every candidate over the history up to the origin.
+
+    :return: The per bucket errors (forecast minus actual count) per candidate and origin, None
+        where the forecast failed
+    :rtype: list
+    """
+    history = attach_arrays(descriptors)
+    timestamps = TransactionForecastAlgorithm.select_events(history, event_type)
+    errors = [[] for _ in candidates]
+    for origin in origins:
+        past = {name: events[:np.searchsorted(events, origin, side='right')] for name, events in history.items()}
+        edges = count_buckets({'bucket': bucket}, origin, horizon)
+        future = timestamps[np.searchsorted(timestamps, origin, side='right'):]
+        actual = np.diff(np.searchsorted(future, edges, side='left'))
+        for candidate, candidate_errors in zip(candidates, errors):
+            input_data = {**candidate['input_data'], 'output': 'counts', 'bucket': bucket, 'seed': 0}
+            try:
+                forecast = TransactionForecastAlgorithm.predict(candidate['algorithm'], input_data, event_type, horizon, past)
+            except ValueError:
+                candidate_errors.append(None)
+                continue
+            counts = forecast['counts']
+            predicted = np.asarray(counts['expected'] if 'expected' in counts else counts['count'], dtype=float)
+            candidate_errors.append((predicted - actual).tolist())
+    return errors
+
+def backtest(history, event_type, horizon, origins=None, bucket=None, step=None, candidates=None):
+    """
+    Replays the history with rolling forecast origins and scores every candidate on the number
+    of events it forecasts per bucket of the horizon after each origin. The origins are split
+    across the process pool, which reads the history from shared memory.
+
+    :param history: The history as returned by load_transaction_history
+    :type history: dict
+    :param event_type: Type of event ('storage', 'retrieval', or 'both')
+    :type event_type: str
+    :param horizon: The forecast horizon in hours
+    :type horizon: float
+    :param origins: The number of forecast origins (default BACKTEST_ORIGINS)
+    :type origins: int
+    :param bucket: The length of the scored count buckets in hours (default the horizon)
+    :type bucket: float
+    :param step: The hours between two origins (default the horizon)
+    :type step: float
+    :param candidates: The candidates as accepted by backtest_candidates
+    :type candidates: list
+    :return: The origins, and the candidates with their scores, best first. `mae` and `rmse`
+        are the mean absolute and root mean squared error of the bucket counts, `bias` the mean
+        error of the total count of a horizon, `failures` the origins the candidate failed on.
+    :rtype: dict
+    """
+    if event_type not in ('storage', 'retrieval', 'both'):
+        raise ValueError("Invalid event type")
+    origins = int(origins or config.BACKTEST_ORIGINS)
+    if not 0 < origins <= config.BACKTEST_MAX_ORIGINS:
+        raise ValueError(f"origins must be between 1 and {config.BACKTEST_MAX_ORIGINS}")
+    horizon = float(horizon)
+    bucket = float(bucket or horizon)
+    candidates = backtest_candidates(candidates)
+    history = {name: history[name] for name in ('storage', 'retrieval')}
+    origin_times = rolling_origins(TransactionForecastAlgorithm.select_events(history, event_type), horizon, origins, step)
+
+    chunks = [chunk for chunk in np.array_split(origin_times, min(config.PROCESS_POOL_WORKERS, origin_times.size)) if chunk.size]
+    with shared_arrays(history) as descriptors:
+        args = [(descriptors, event_type, horizon, bucket, chunk, candidates) for chunk in chunks]
+        if len(chunks) < 2:
+            results = [_backtest_origins(*arguments) for arguments in args]
+        else:
+            results = list(get_process_pool().map(_backtest_origins, *zip(*args)))
+
+    scores = []
+    for index, candidate in enumerate(candidates):
+        errors = [origin_errors for result in results for origin_errors in result[index]]
+        succeeded = np.array([origin_errors for origin_errors in errors if origin_errors is not None], dtype=float)
+        score = {**candidate, 'failures': len(errors) - len(succeeded)}
+        if len(succeeded):
+            score.update(
+                mae=float(np.abs(succeeded).mean()),
+                rmse=float(np.sqrt((succeeded ** 2).mean())),
+                bias=float(succeeded.sum(axis=1).mean())
+            )
+        else:
+            score.update({metric: None for metric in METRICS})
+        scores.append(score)
+    # Candidates that failed on any origin rank behind the others
+    scores.sort(key=lambda score: (score['failures'] > 0, score['mae'] is None, score['mae'] or 0))
+    return {
+        'origins': to_datetime_strings(origin_times),
+        'bucket': bucket,
+        'scores': scores
+    }
@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """
+    A pending upstream call that concurrent callers of the same key wait for.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _Entry:
+    def __init__(self, value, loaded_at):
+        self.value = value
+        self.loaded_at = loaded_at
+        self.refreshed_at = loaded_at
+
+
+class HistoryCache:
+    """
+    A bounded in-process cache for histories fetched from the Storage Location Tracking service.
+
+    Entries are keyed by the SLT query. Concurrent misses for the same query are collapsed into
+    a single upstream call. Once an entry is older than `ttl` it is brought up to date with the
+    `refresh` callable (if given), entries older than `max_age` are reloaded completely.
+
+    :param maxsize: The maximum number of cached queries
+    :type maxsize: int
+    :param ttl: Seconds after which an entry is refreshed
+    :type ttl: float
+    :param max_age: Seconds after which an entry is reloaded from scratch
+    :type max_age: float
+    """
+    def __init__(self, maxsize=128, ttl=30, max_age=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query):
+        """
+        Returns a canonical key for the given SLT query.
+        """
+        return json.dumps(query, sort_keys=True, default=str)
+
+    def get(self, query, load, refresh=None):
+        """
+        Returns the cached value for the query, loading or refreshing it if necessary.
+
+        :param query: The SLT query
+        :type query: dict
+        :param load: Called as load(query) to fetch the complete history
+        :type load: callable
+        :param refresh: Called as refresh(query, value) to bring a stale value up to date
+        :type refresh: callable
+        """
+        key = self.make_key(query)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                entry = self._entries.get(key)
+                if entry is not None and now - entry.loaded_at > self.max_age:
+                    del self._entries[key]
+                    entry = None
+                if entry is not None and now - entry.refreshed_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry.value
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    break
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            if entry is not None and refresh is not None:
+                flight.value = refresh(query, entry.value)
+            else:
+                flight.value = load(query)
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                now = time.monotonic()
+                if entry is not None and refresh is not None:
+                    entry.value = flight.value
+                    entry.refreshed_at = now
+                else:
+                    entry = _Entry(flight.value, now)
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            return flight.value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe least recently used cache.
+
+    :param maxsize: The maximum number of entries
+    :type maxsize: int
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key, predicate=None):
+        """
+        Removes the entry of the key if there is one and `predicate` (if given) accepts its value.
+        """
+        with self._lock:
+            if key in self._entries and (predicate is None or predicate(self._entries[key])):
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
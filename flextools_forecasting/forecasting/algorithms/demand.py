@@ -1,9 +1,46 @@
-import requests 
+import requests
+import numpy as np
 from instance import config
+from .cache import HistoryCache
+from .slt import slt_client
+from .transaction import US_PER_HOUR, parse_timestamps, since_query, to_datetime_strings
+from forecasting import metrics
+
+history_cache = HistoryCache(config.HISTORY_CACHE_SIZE, config.HISTORY_CACHE_TTL, config.HISTORY_CACHE_MAX_AGE)
+
+# The keys identifying items in the input data and in the ulRecords
+ITEM_KEYS = ('item_number', 'item_id')
+MODEL_PARAMETERS = ('bucket', 'lookback', 'window', 'alpha')
+
+def demand_items(input_data):
+    """
+    Returns the item key ('item_number' or 'item_id') and the requested items of the input data.
+    A single item may be given instead of a list.
+    """
+    for key in ITEM_KEYS:
+        items = (input_data or {}).get(key)
+        if items is not None and items != []:
+            items = items if isinstance(items, list) else [items]
+            return key, list(dict.fromkeys(str(item) for item in items))
+    raise ValueError("input_data requires an item_number or item_id (or a list of them)")
+
+def demand_query(input_data):
+    """
+    Returns the SLT query of the input data, i.e. everything except the model parameters with
+    the requested items as a list.
+    """
+    key, items = demand_items(input_data)
+    query = {name: value for name, value in input_data.items() if name not in MODEL_PARAMETERS and name not in ITEM_KEYS}
+    query[key] = items
+    return query
 
 class DemandForecastAlgorithm:
     """
-    The DemandForecastAlgorithm class is responsible for predicting demand forecasts
+    The DemandForecastAlgorithm class is responsible for predicting demand forecasts.
+
+    The demand of an item is the number of its unit loads retrieved per time bucket (or the
+    sum of their 'quantity' if the ulRecords carry one). All requested items are forecast at
+    once on an items x buckets demand matrix.
 
     :param algorithm: The algorithm to use for the prediction
     :type algorithm: str
@@ -11,47 +48,245 @@ class DemandForecastAlgorithm:
     :type input_data: dict
     """
     @staticmethod
-    def get_demand_history(input_data):
-        if 'demand_history' not in input_data or not input_data.get('demand_history'):
-            try: 
-                if 'item_number' in input_data:
-                    response = requests.get(f"{config.STORAGE_LOCATION_TRACKING_API}/?item_number={input_data['item_number']}")
-                elif 'item_id' in input_data:
-                    response = requests.get(f"{config.STORAGE_LOCATION_TRACKING_API}/?item_id={input_data['item_id']}")
-                else:
-                    response = requests.post(f"{config.STORAGE_LOCATION_TRACKING_API}/", json=input_data)
+    def fetch_demand_history(query, since=None):
+        """
+        Fetches the ulRecords of all items of the query from the Storage Location Tracking service in one call.
+        If `since` is given, only the records with an event after that epoch microsecond are fetched.
+        """
+        try:
+            with metrics.stage('fetch'):
+                response = slt_client.get("/ulRecords", json=since_query(query, since))
                 response.raise_for_status()
                 return response.json()
-            except requests.exceptions.RequestException as e:
-                raise ValueError(f"Error getting demand history: {e}")
-        else: 
+        except requests.exceptions.RequestException as e:
+            raise ValueError(f"Error getting demand history: {e}")
+
+    @staticmethod
+    def parse_demand_history(records, key):
+        """
+        Parses the retrievals of ulRecords into read-only arrays of the 'item', the 'retrieved' epoch
+        microseconds and the 'quantity' of each retrieval.
+        """
+        with metrics.stage('parse'):
+            records = [record for record in records if record.get('retrieved_at') and record.get('retrieved_at') != "None" and record.get(key) is not None]
+            history = {
+                'item': np.array([str(record[key]) for record in records], dtype=str),
+                'retrieved': parse_timestamps([record['retrieved_at'] for record in records], sort=False),
+                'quantity': np.array([record.get('quantity', 1) for record in records], dtype=float)
+            }
+        for values in history.values():
+            values.setflags(write=False)
+        return history
+
+    @staticmethod
+    def refresh_demand_history(query, history, key):
+        """
+        Appends the retrievals newer than the latest retrieval of a cached demand history.
+
+        :param query: The SLT query of the history
+        :type query: dict
+        :param history: The cached history as returned by parse_demand_history
+        :type history: dict
+        :param key: The item key of the ulRecords
+        :type key: str
+        :return: The updated history
+        :rtype: dict
+        """
+        if not history['retrieved'].size:
+            return DemandForecastAlgorithm.parse_demand_history(DemandForecastAlgorithm.fetch_demand_history(query), key)
+        watermark = int(history['retrieved'].max())
+        new = DemandForecastAlgorithm.parse_demand_history(DemandForecastAlgorithm.fetch_demand_history(query, watermark), key)
+        # Records stored before the watermark may be returned again, keep only the new retrievals
+        newer = new['retrieved'] > watermark
+        updated = {name: np.concatenate((values, new[name][newer])) for name, values in history.items()}
+        for values in updated.values():
+            values.setflags(write=False)
+        return updated
+
+    @staticmethod
+    def get_demand_history(input_data):
+        """
+        Loads the demand history of all requested items through the history cache, refreshing it
+        incrementally from its latest retrieval.
+        """
+        if 'demand_history' not in input_data or not input_data.get('demand_history'):
+            key, _ = demand_items(input_data)
+            return history_cache.get(
+                demand_query(input_data),
+                lambda query: DemandForecastAlgorithm.parse_demand_history(DemandForecastAlgorithm.fetch_demand_history(query), key),
+                lambda query, history: DemandForecastAlgorithm.refresh_demand_history(query, history, key)
+            )
+        else:
             raise NotImplementedError("This feature is not implemented yet")
 
-    def moving_average(input_data):
+    @staticmethod
+    def demand_matrix(history, items, bucket=24, lookback=None):
         """
-        Predicts demand forecasts using the moving average algorithm
+        Sums the retrievals of the items into an items x buckets matrix. Buckets are aligned to
+        multiples of the bucket length since the epoch and end with the bucket of the latest retrieval.
 
-        :param input_data: The input data to use for the prediction
-        :type input_data: dict
+        :param history: The demand history as returned by get_demand_history
+        :type history: dict
+        :param items: The items of the matrix rows
+        :type items: list
+        :param bucket: The bucket length in hours
+        :type bucket: float
+        :param lookback: The maximum number of buckets, older retrievals are ignored
+        :type lookback: int
+        :return: The demand matrix and the index of its last bucket
+        :rtype: tuple
+        """
+        bucket_us = int(bucket * US_PER_HOUR)
+        if bucket_us <= 0:
+            raise ValueError("bucket must be positive")
+        lookback = lookback or config.DEMAND_LOOKBACK_BUCKETS
+
+        requested = np.array(items, dtype=str)
+        order = np.argsort(requested)
+        positions = np.searchsorted(requested[order], history['item'])
+        positions = np.minimum(positions, len(items) - 1)
+        known = requested[order][positions] == history['item']
+        if not known.any():
+            raise ValueError("No demand history for the requested items")
+        rows = order[positions[known]]
+        buckets = history['retrieved'][known] // bucket_us
+        quantities = history['quantity'][known]
+
+        last = int(buckets.max())
+        first = max(int(buckets.min()), last - lookback + 1)
+        recent = buckets >= first
+        size = last - first + 1
+        if len(items) * size > config.DEMAND_MAX_CELLS:
+            raise ValueError(f"The demand matrix of {len(items)} items and {size} buckets exceeds {config.DEMAND_MAX_CELLS} cells, use a longer bucket or a shorter lookback")
+        cells = rows[recent] * size + (buckets[recent] - first)
+        matrix = np.bincount(cells, weights=quantities[recent], minlength=len(items) * size).reshape(len(items), size)
+        return matrix, last
+
+    @staticmethod
+    def moving_average(matrix, horizon, window=7):
+        """
+        Forecasts every item with the mean demand of its last `window` buckets. The rolling means
+        of all items come from a single cumulative sum.
+
+        :return: The forecasts (items x horizon) and the mean absolute one-step error of each item
+        :rtype: tuple
         """
-        demand_history = DemandForecastAlgorithm.get_demand_history(input_data)
-        return {"forecast": demand_history, "confidence_interval": None}
+        window = int(window)
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        items, size = matrix.shape
+        window = min(window, size)
+        cumulative = np.zeros((items, size + 1))
+        np.cumsum(matrix, axis=1, out=cumulative[:, 1:])
+        level = (cumulative[:, size] - cumulative[:, size - window]) / window
+        # The mean of buckets t-window .. t-1 predicts bucket t
+        predicted = (cumulative[:, window:size] - cumulative[:, :size - window]) / window
+        errors = np.abs(matrix[:, window:] - predicted)
+        mae = errors.mean(axis=1) if errors.shape[1] else np.full(items, np.nan)
+        return np.repeat(level[:, None], horizon, axis=1), mae
 
+    @staticmethod
+    def exponential_smoothing(matrix, horizon, alpha=0.3):
+        """
+        Forecasts every item with its exponentially smoothed demand, l_t = alpha * x_t + (1 - alpha) * l_t-1
+        with l_0 = x_0. The recursion runs over all items at once.
+
+        :return: The forecasts (items x horizon) and the mean absolute one-step error of each item
+        :rtype: tuple
+        """
+        # SciPy takes about a second to import, load it with the first forecast instead of at startup
+        from scipy.signal import lfilter
+
+        alpha = float(alpha)
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be between 0 and 1")
+        items, size = matrix.shape
+        levels = np.empty_like(matrix)
+        levels[:, 0] = matrix[:, 0]
+        if size > 1:
+            levels[:, 1:], _ = lfilter([alpha], [1, alpha - 1], matrix[:, 1:], axis=1, zi=(1 - alpha) * matrix[:, :1])
+        errors = np.abs(matrix[:, 1:] - levels[:, :-1])
+        mae = errors.mean(axis=1) if errors.shape[1] else np.full(items, np.nan)
+        return np.repeat(levels[:, -1:], horizon, axis=1), mae
 
     algorithms = {
-        'moving_average': moving_average
-    } 
+        'moving_average': (moving_average, ('window',)),
+        'exponential_smoothing': (exponential_smoothing, ('alpha',))
+    }
 
     @staticmethod
-    def predict(algorithm, input_data):
+    def predict(algorithm, input_data, horizon=7, history=None, matrices=None):
         """
-        Predicts demand forecasts
+        Predicts the demand of every requested item for the next `horizon` buckets
 
         :param algorithm: The algorithm to use for the prediction
         :type algorithm: str
-        :param input_data: The input data to use for the prediction
+        :param input_data: The requested items (item_number or item_id) and model parameters
+            ('bucket' in hours, 'lookback' in buckets, 'window', 'alpha')
         :type input_data: dict
+        :param horizon: The number of buckets to forecast
+        :type horizon: int
+        :param history: Preloaded history as returned by get_demand_history
+        :type history: dict
+        :param matrices: Demand matrices keyed by (bucket, lookback), shared between forecasts
+        :type matrices: dict
+        :return: The item key, the items and the prediction of each item
+        :rtype: tuple
         """
         if algorithm not in DemandForecastAlgorithm.algorithms:
             raise ValueError("Invalid algorithm")
-        return DemandForecastAlgorithm.algorithms[algorithm](input_data)
\ No newline at end of file
+        horizon = int(horizon or 7)
+        if horizon < 1:
+            raise ValueError("prediction_horizon must be at least 1")
+        key, items = demand_items(input_data)
+        if history is None:
+            history = DemandForecastAlgorithm.get_demand_history(input_data)
+        bucket, lookback = input_data.get('bucket', 24), input_data.get('lookback')
+        matrices = {} if matrices is None else matrices
+        if (bucket, lookback) not in matrices:
+            matrices[(bucket, lookback)] = DemandForecastAlgorithm.demand_matrix(history, items, bucket, lookback)
+        matrix, last = matrices[(bucket, lookback)]
+
+        func, parameter_names = DemandForecastAlgorithm.algorithms[algorithm]
+        parameters = {name: input_data[name] for name in parameter_names if input_data.get(name) is not None}
+        forecasts, mae = func(matrix, horizon, **parameters)
+        bucket_us = int(bucket * US_PER_HOUR)
+        buckets = to_datetime_strings((last + 1 + np.arange(horizon)) * bucket_us)
+        predictions = [
+            {
+                'forecast': forecast,
+                'buckets': buckets,
+                'confidence_interval': None,
+                'parameters': {**parameters, 'bucket': bucket, 'mae': None if np.isnan(error) else error}
+            }
+            for forecast, error in zip(forecasts.tolist(), mae.tolist())
+        ]
+        return key, items, predictions
+
+    @staticmethod
+    def predict_batch(input_data, specs):
+        """
+        Predicts the demand of all requested items for many algorithm/parameter combinations over a
+        single history pull. Demand matrices are shared between specs with the same bucket and lookback.
+
+        :param input_data: The requested items and the model parameters shared by all forecasts
+        :type input_data: dict
+        :param specs: Dicts with 'algorithm', 'prediction_horizon' and optional 'input_data'
+            holding model parameters that override the shared input data
+        :type specs: list
+        :return: The result of predict for each spec
+        :rtype: list
+        """
+        query = demand_query(input_data)
+        spec_input_data = []
+        for spec in specs:
+            spec_input = {**input_data, **(spec.get('input_data') or {})}
+            if demand_query(spec_input) != query:
+                raise ValueError("Batch forecasts can only override model parameters of the shared input data")
+            spec_input_data.append(spec_input)
+        history = DemandForecastAlgorithm.get_demand_history(input_data)
+        matrices = {}
+        return [
+            DemandForecastAlgorithm.predict(spec.get('algorithm'), spec_input, spec.get('prediction_horizon'), history, matrices)
+            for spec, spec_input in zip(specs, spec_input_data)
+        ]
@@ -0,0 +1,164 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+EVENT_TYPES = ('storage', 'retrieval')
+# Little-endian int64 epoch microseconds
+EVENT_DTYPE = np.dtype('<i8')
+
+
+class EventStore:
+    """
+    A local mirror of the SLT event history that all worker processes share through the page cache.
+
+    Each SLT query gets a directory with one append-only file of sorted epoch microseconds per
+    event type and a `meta.json` holding the committed length of each file, its watermark (the
+    latest mirrored event) and the time of the last sync. A sync appends only the events after
+    the watermark of their type. The data files are flushed before the metadata is atomically replaced, so a
+    crash mid-sync leaves an uncommitted tail that readers ignore and the next sync truncates.
+    Syncs of the same query are serialized across processes with a file lock.
+
+    :param directory: The root directory of the store
+    :type directory: str
+    :param ttl: Seconds after which a mirrored history is synced again
+    :type ttl: float
+    """
+    def __init__(self, directory, ttl=30):
+        self.directory = directory
+        self.ttl = ttl
+        self._mapped = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query):
+        return hashlib.sha256(json.dumps(query, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+    def path(self, key, name):
+        return os.path.join(self.directory, key, name)
+
+    def read_meta(self, key):
+        try:
+            with open(self.path(key, 'meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, key, meta):
+        path = self.path(key, 'meta.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    @contextmanager
+    def _sync_lock(self, key, blocking=True):
+        os.makedirs(os.path.join(self.directory, key), exist_ok=True)
+        with open(self.path(key, 'lock'), 'w') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def sync(self, query, fetch, force=False, blocking=True):
+        """
+        Appends the events after the watermark of the query to its files.
+
+        :param query: The SLT query
+        :type query: dict
+        :param fetch: Called as fetch(query, since) with the earliest watermark epoch microsecond (None
+            on the first sync), returns sorted epoch microsecond arrays keyed by event type
+        :type fetch: callable
+        :param force: Sync even if the last sync is younger than the ttl
+        :type force: bool
+        :param blocking: Wait for a sync of another process instead of returning
+        :type blocking: bool
+        :return: The metadata after the sync
+        :rtype: dict
+        """
+        key = self.make_key(query)
+        with self._sync_lock(key, blocking) as locked:
+            # Another process may have synced while this one waited for the lock
+            meta = self.read_meta(key)
+            if not locked or (meta is not None and not force and time.time() - meta['synced_at'] <= self.ttl):
+                return meta
+            if meta is None:
+                meta = {
+                    'query': query,
+                    'watermarks': {event_type: None for event_type in EVENT_TYPES},
+                    'lengths': {event_type: 0 for event_type in EVENT_TYPES}
+                }
+            watermarks = [watermark for watermark in meta['watermarks'].values() if watermark is not None]
+            events = fetch(query, min(watermarks) if watermarks else None)
+            for event_type in EVENT_TYPES:
+                new_events = np.asarray(events[event_type], dtype=EVENT_DTYPE)
+                watermark = meta['watermarks'][event_type]
+                if watermark is not None:
+                    new_events = new_events[new_events > watermark]
+                with open(self.path(key, f'{event_type}.i64'), 'ab') as f:
+                    # Drop the tail of an interrupted sync before appending
+                    f.truncate(meta['lengths'][event_type] * EVENT_DTYPE.itemsize)
+                    f.write(new_events.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                meta['lengths'][event_type] += int(new_events.size)
+                if new_events.size:
+                    meta['watermarks'][event_type] = int(new_events[-1])
+            meta['synced_at'] = time.time()
+            self._write_meta(key, meta)
+            return meta
+
+    def _map(self, key, event_type, length):
+        """
+        Returns a read-only, zero-copy array over the first `length` events of a file.
+        """
+        if length == 0:
+            empty = np.empty(0, dtype=EVENT_DTYPE)
+            empty.setflags(write=False)
+            return empty
+        with open(self.path(key, f'{event_type}.i64'), 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), length * EVENT_DTYPE.itemsize, access=mmap.ACCESS_READ)
+        return np.frombuffer(buffer, dtype=EVENT_DTYPE, count=length)
+
+    def get(self, query, fetch):
+        """
+        Returns the mirrored history of the query, syncing it first if it is missing or stale.
+        A stale history is served as is while another process syncs it.
+
+        :return: Read-only, memory-mapped epoch microsecond arrays keyed by event type
+        :rtype: dict
+        """
+        key = self.make_key(query)
+        meta = self.read_meta(key)
+        if meta is None:
+            meta = self.sync(query, fetch)
+        elif time.time() - meta['synced_at'] > self.ttl:
+            meta = self.sync(query, fetch, blocking=False) or meta
+        lengths = meta['lengths']
+        with self._lock:
+            mapped = self._mapped.get(key)
+            if mapped is None or mapped[0] != lengths:
+                # The files are append-only, mappings of an older length stay valid for their readers
+                mapped = (dict(lengths), {event_type: self._map(key, event_type, lengths[event_type]) for event_type in EVENT_TYPES})
+                self._mapped[key] = mapped
+            return dict(mapped[1])
+
+    def queries(self):
+        """
+        Returns the queries of all mirrored histories.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        metas = (self.read_meta(key) for key in sorted(os.listdir(self.directory)))
+        return [meta['query'] for meta in metas if meta is not None]
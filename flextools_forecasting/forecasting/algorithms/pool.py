@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+from instance import config
+
+_pool = None
+_pid = None
+_lock = threading.Lock()
+# Shared memory segments attached by this worker process, by name
+_attached = {}
+
+
+def get_process_pool():
+    """
+    Returns the process pool of the current worker, creating it on first use.
+
+    The NumPy/SciPy work of the algorithms holds the GIL, so CPU bound forecasts are
+    spread across processes instead of threads.
+
+    :return: The process pool
+    :rtype: concurrent.futures.ProcessPoolExecutor
+    """
+    global _pool, _pid
+    with _lock:
+        # A pool inherited from a preloaded parent cannot be used after the fork
+        if _pool is None or _pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=config.PROCESS_POOL_WORKERS,
+                mp_context=multiprocessing.get_context(config.PROCESS_POOL_START_METHOD)
+            )
+            _pid = os.getpid()
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+@contextmanager
+def shared_arrays(arrays):
+    """
+    Copies arrays into shared memory for the workers of the process pool, so that tasks
+    receive a small descriptor instead of a pickled copy of each array.
+
+    :param arrays: The arrays keyed by name
+    :type arrays: dict
+    :return: The descriptors to pass to attach_arrays, keyed like the arrays
+    :rtype: dict
+    """
+    blocks = []
+    try:
+        descriptors = {}
+        for name, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+            descriptors[name] = (block.name, values.shape, values.dtype.str)
+        yield descriptors
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def attach_arrays(descriptors):
+    """
+    Returns read-only views of the arrays shared with shared_arrays. The segments stay attached
+    for the following tasks until a task attaches other segments.
+    """
+    names = {block_name for block_name, _, _ in descriptors.values()}
+    for block_name in list(_attached):
+        if block_name not in names:
+            try:
+                _attached[block_name].close()
+                del _attached[block_name]
+            except BufferError:
+                # Still referenced by a running task of another thread
+                pass
+    arrays = {}
+    for name, (block_name, shape, dtype) in descriptors.items():
+        if block_name not in _attached:
+            _attached[block_name] = shared_memory.SharedMemory(name=block_name)
+        values = np.ndarray(shape, dtype=dtype, buffer=_attached[block_name].buf)
+        values.setflags(write=False)
+        arrays[name] = values
+    return arrays
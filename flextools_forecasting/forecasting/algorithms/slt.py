@@ -0,0 +1,193 @@
+import codecs
+import json
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from instance import config
+
+RETRY_STATUS_CODES = (502, 503, 504)
+# The largest record iter_records buffers before it gives up on a response
+MAX_RECORD_SIZE = 1 << 20
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised instead of calling the Storage Location Tracking service while the circuit breaker is open.
+    """
+
+
+class SLTClient:
+    """
+    A keep-alive client for the Storage Location Tracking service.
+
+    Each worker process uses its own pooled session. Failed calls (connection errors, timeouts
+    and gateway errors) are retried with jittered exponential backoff. After `breaker_threshold`
+    consecutive failed calls the circuit opens and calls fail fast for `breaker_cooldown` seconds.
+    Then a single trial call is let through, which closes the circuit or opens it again.
+
+    :param base_url: The base URL of the SLT API
+    :type base_url: str
+    :param pool_size: The maximum number of pooled connections per worker
+    :type pool_size: int
+    :param connect_timeout: The connect timeout in seconds
+    :type connect_timeout: float
+    :param read_timeout: The read timeout in seconds
+    :type read_timeout: float
+    :param retries: The number of retries after a failed attempt
+    :type retries: int
+    :param backoff: The base backoff in seconds
+    :type backoff: float
+    :param backoff_max: The maximum backoff in seconds
+    :type backoff_max: float
+    :param breaker_threshold: The number of consecutive failed calls that opens the circuit
+    :type breaker_threshold: int
+    :param breaker_cooldown: Seconds the circuit stays open
+    :type breaker_cooldown: float
+    """
+    def __init__(self, base_url, pool_size=10, connect_timeout=3.05, read_timeout=30, retries=2,
+                 backoff=0.2, backoff_max=5, breaker_threshold=5, breaker_cooldown=30):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._session = None
+        self._pid = None
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        The pooled session of the current worker process. Sessions are never shared across a fork.
+        """
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    def _before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._probing or time.monotonic() - self._opened_at < self.breaker_cooldown:
+                raise CircuitOpenError("Storage Location Tracking service unavailable, circuit breaker is open")
+            # Half-open: let this call through as the only trial, concurrent calls keep failing fast
+            self._probing = True
+
+    def _after_call(self, failed):
+        with self._lock:
+            self._probing = False
+            if not failed:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.breaker_threshold:
+                self._opened_at = time.monotonic()
+
+    def request(self, method, path, **kwargs):
+        """
+        Sends a request to the SLT API and returns the last response.
+
+        :param method: The HTTP method
+        :type method: str
+        :param path: The path relative to the SLT base URL
+        :type path: str
+        :return: The response
+        :rtype: requests.Response
+        """
+        self._before_call()
+        kwargs.setdefault('timeout', self.timeout)
+        url = f"{self.base_url}{path}"
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if attempt == self.retries:
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                        break
+                    response.close()
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+        except Exception:
+            # Every failed call counts, and ends a trial call of the half-open circuit
+            self._after_call(failed=True)
+            raise
+        self._after_call(failed=response.status_code in RETRY_STATUS_CODES)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+
+def iter_records(chunks):
+    """
+    Incrementally parses a JSON array of objects from an iterable of UTF-8 byte chunks and
+    yields the objects, so that only the current chunk and record are held in memory.
+
+    :param chunks: The body of the response, e.g. response.iter_content(chunk_size)
+    :type chunks: iterable
+    :raises ValueError: If the body is not a complete JSON array of objects
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer, position, started = '', 0, False
+    for chunk in chunks:
+        buffer = buffer[position:] + text.decode(chunk)
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError("Expected a JSON array of ulRecords")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            if buffer[position] != '{':
+                raise ValueError("Expected a JSON object in the ulRecords array")
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The record continues in the next chunk
+                if len(buffer) - position > MAX_RECORD_SIZE:
+                    raise ValueError("Invalid ulRecords response")
+                break
+            yield record
+    raise ValueError("Truncated ulRecords response")
+
+
+slt_client = SLTClient(
+    config.STORAGE_LOCATION_TRACKING_API,
+    pool_size=config.SLT_POOL_SIZE,
+    connect_timeout=config.SLT_CONNECT_TIMEOUT,
+    read_timeout=config.SLT_READ_TIMEOUT,
+    retries=config.SLT_RETRIES,
+    backoff=config.SLT_BACKOFF,
+    backoff_max=config.SLT_BACKOFF_MAX,
+    breaker_threshold=config.SLT_BREAKER_THRESHOLD,
+    breaker_cooldown=config.SLT_BREAKER_COOLDOWN
+)
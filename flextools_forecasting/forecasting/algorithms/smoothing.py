@@ -0,0 +1,124 @@
+import numpy as np
+
+# Approximate number of observations folded into one affine map by holt_winters_filter
+BLOCK_STEPS = 64
+# Number of blocks processed per chunk in holt_winters_filter
+CHUNK_BLOCKS = 512
+
+
+def _holt_winters_step(x, i, alpha, beta, gamma, level, trend, season):
+    """
+    Applies observation `x` as step `i` of the Holt-Winters recursion to every candidate in place.
+    Returns the squared one-step-ahead error and the smoothed inter-arrival time of each candidate.
+    """
+    m = season.shape[1]
+    previous = season[:, (i - 1) % m].copy()
+    error = x - (level + trend + previous)
+    new_level = alpha * (x - previous) + (1 - alpha) * (level + trend)
+    trend[:] = beta * (new_level - level) + (1 - beta) * trend
+    level[:] = new_level
+    season[:, i % m] = gamma * (x - new_level) + (1 - gamma) * previous
+    return error ** 2, level + trend + season[:, i % m]
+
+
+def _block_map(start, length, alpha, beta, gamma, m):
+    """
+    Expresses `length` steps of the recursion as linear maps of the state at the start of the
+    block and of the observations of the block.
+
+    The state is (level, trend, season_0 ... season_m-1). Each returned map has the shape
+    (candidates, rows, state + length), its first columns act on the state and the last
+    columns on the observations of the block.
+
+    :return: The state transition over the block, the one-step-ahead forecast of each step
+        and the sum of the smoothed inter-arrival times over the block
+    :rtype: tuple
+    """
+    candidates = alpha.size
+    k = m + 2
+    alpha, beta, gamma = alpha[:, None], beta[:, None], gamma[:, None]
+    transition = np.zeros((candidates, k, k + length))
+    transition[:, np.arange(k), np.arange(k)] = 1
+    forecasts = np.empty((candidates, length, k + length))
+    smoothed = np.zeros((candidates, k + length))
+    for j in range(length):
+        i = start + j
+        p, q = 2 + (i - 1) % m, 2 + i % m
+        observation = np.zeros(k + length)
+        observation[k + j] = 1
+        level, trend, previous = transition[:, 0].copy(), transition[:, 1].copy(), transition[:, p].copy()
+        forecasts[:, j] = level + trend + previous
+        new_level = alpha * (observation - previous) + (1 - alpha) * (level + trend)
+        transition[:, 1] = beta * (new_level - level) + (1 - beta) * trend
+        transition[:, 0] = new_level
+        transition[:, q] = gamma * (observation - new_level) + (1 - gamma) * previous
+        smoothed += transition[:, 0] + transition[:, 1] + transition[:, q]
+    return transition, forecasts, smoothed
+
+
+def holt_winters_filter(inter_event_times, alpha, beta, gamma, level, trend, season, start=1):
+    """
+    Runs the Holt-Winters recursion over the inter-arrival times for many (alpha, beta, gamma)
+    candidates at once.
+
+    Step i deseasonalizes observation i with season slot (i-1) % m and updates slot i % m.
+    As the recursion is linear in its state, a block of whole seasonal periods is applied as
+    one affine map, so each Python level step advances all candidates by a whole block.
+
+    :param inter_event_times: The inter-arrival times in seconds
+    :type inter_event_times: numpy.ndarray
+    :param alpha: Smoothing factors for the level, one per candidate
+    :type alpha: numpy.ndarray
+    :param beta: Smoothing factors for the trend, one per candidate
+    :type beta: numpy.ndarray
+    :param gamma: Smoothing factors for the seasonality, one per candidate
+    :type gamma: numpy.ndarray
+    :param level: The initial level of each candidate
+    :type level: numpy.ndarray
+    :param trend: The initial trend of each candidate
+    :type trend: numpy.ndarray
+    :param season: The initial season slots of each candidate (candidates x seasonality)
+    :type season: numpy.ndarray
+    :param start: The step index of the first inter-arrival time
+    :type start: int
+    :return: Dict with the sum of squared one-step-ahead errors ('sse'), the final 'level',
+        'trend' and 'season' and the sum of the smoothed inter-arrival times ('smoothed')
+        of each candidate
+    :rtype: dict
+    """
+    candidates, m = season.shape
+    k = m + 2
+    x = np.asarray(inter_event_times, dtype=float)
+    alpha, beta, gamma = (np.broadcast_to(np.asarray(value, dtype=float), (candidates,)) for value in (alpha, beta, gamma))
+    state = np.empty((candidates, k))
+    state[:, 0], state[:, 1], state[:, 2:] = level, trend, season
+    sse = np.zeros(candidates)
+    smoothed = np.zeros(candidates)
+
+    length = m * max(1, BLOCK_STEPS // m)
+    blocks = x.size // length
+    if blocks:
+        transition, forecasts, block_smoothed = _block_map(start, length, alpha, beta, gamma, m)
+        state_map = transition[:, :, :k]
+        observation_map = transition[:, :, k:].reshape(candidates * k, length)
+        forecast_state_map = forecasts[:, :, :k].transpose(0, 2, 1)
+        forecast_observation_map = forecasts[:, :, k:].transpose(0, 2, 1)
+        observations = x[:blocks * length].reshape(blocks, length)
+        for offset in range(0, blocks, CHUNK_BLOCKS):
+            chunk = observations[offset:offset + CHUNK_BLOCKS]
+            inputs = (chunk @ observation_map.T).reshape(chunk.shape[0], candidates, k)
+            states = np.empty((chunk.shape[0], candidates, k))
+            for block in range(chunk.shape[0]):
+                states[block] = state
+                state = np.matmul(state_map, state[:, :, None])[:, :, 0] + inputs[block]
+            # One-step-ahead forecasts of every step in the chunk (candidates x blocks x length)
+            predicted = np.matmul(states.transpose(1, 0, 2), forecast_state_map) + np.matmul(chunk, forecast_observation_map)
+            sse += ((predicted - chunk) ** 2).sum(axis=(1, 2))
+            smoothed += (states.sum(axis=0) * block_smoothed[:, :k]).sum(axis=1) + block_smoothed[:, k:] @ chunk.sum(axis=0)
+
+    level, trend, season = state[:, 0].copy(), state[:, 1].copy(), state[:, 2:].copy()
+    for i, value in enumerate(x[blocks * length:].tolist(), start=start + blocks * length):
+        squared_error, step_smoothed = _holt_winters_step(value, i, alpha, beta, gamma, level, trend, season)
+        sse += squared_error
+        smoothed += step_smoothed
+    return {'sse': sse, 'level': level, 'trend': trend, 'season': season, 'smoothed': smoothed}
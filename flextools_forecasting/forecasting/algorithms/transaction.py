@@ -1,14 +1,230 @@
 import requests 
 from instance import config
 from datetime import datetime, timedelta, timezone
-from scipy.stats import expon
 import numpy as np
+import hashlib
+import json
 from enum import Enum
+from itertools import islice
+from .cache import HistoryCache, LRUCache
+from .event_store import EventStore
+from .slt import slt_client, iter_records
+from .pool import get_process_pool
+from .smoothing import holt_winters_filter
+from forecasting import metrics
+
+US_PER_SECOND = 1_000_000
+US_PER_HOUR = 3600 * US_PER_SECOND
+HOURS_PER_WEEK = 7 * 24
+# 1970-01-01 was a Thursday, shifts epoch hours to hours of the week starting on Monday 00:00
+EPOCH_HOUR_OF_WEEK = 3 * 24
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MODEL_PARAMETERS = ('alpha', 'beta', 'gamma', 'seasonality', 'samples', 'quantiles', 'seed', 'fit', 'lookback', 'profile', 'prior', 'output', 'bucket')
+
+history_cache = HistoryCache(config.HISTORY_CACHE_SIZE, config.HISTORY_CACHE_TTL, config.HISTORY_CACHE_MAX_AGE)
+forecast_cache = LRUCache(config.FORECAST_CACHE_SIZE)
+# Histories are mirrored into memory-mapped files shared by all workers if a directory is configured
+event_store = EventStore(config.EVENT_STORE_DIR, config.EVENT_STORE_TTL) if config.EVENT_STORE_DIR else None
 
 class AlgorithmType(str, Enum):
     POISSON_PROCESS = 'poisson_process'
     EXPONENTIAL_SMOOTHING = 'exponential_smoothing'
     HOLT_WINTERS = 'holt_winters'
+    SEASONAL_POISSON = 'seasonal_poisson'
+
+# Algorithms whose forecasts depend on a random seed
+STOCHASTIC_ALGORITHMS = (AlgorithmType.POISSON_PROCESS,)
+
+# The model parameters that define the persisted state of the incremental algorithms
+STATE_PARAMETERS = {
+    AlgorithmType.EXPONENTIAL_SMOOTHING: ('alpha',),
+    AlgorithmType.HOLT_WINTERS: ('alpha', 'beta', 'gamma', 'seasonality', 'fit'),
+    # The hour of week histogram does not depend on the profile or prior
+    AlgorithmType.SEASONAL_POISSON: ()
+}
+
+# 'events' returns the predicted event times, 'counts' the number of events per bucket of the horizon
+OUTPUT_MODES = ('events', 'counts')
+
+# The ulRecords field holding the timestamps of each event type
+EVENT_FIELDS = {'storage': 'stored_at', 'retrieval': 'retrieved_at'}
+# ulRecords are parsed in batches of this many records while the response streams in
+PARSE_BATCH_SIZE = 10000
+# The number of parsed batches per event type after which the ones outside the window are dropped
+WINDOW_COMPACT_BATCHES = 32
+
+# The rate profiles of seasonal_poisson: one rate per hour of the week, per hour of the day or a single rate
+SEASONAL_PROFILES = ('week', 'day', 'flat')
+
+def parse_timestamps(values, sort=True):
+    """
+    Parses ISO 8601 timestamps into a sorted int64 array of UTC epoch microseconds.
+    Missing values and the literal string "None" are skipped.
+
+    :param values: The timestamp strings to parse
+    :type values: iterable
+    :param sort: Whether to sort the timestamps, otherwise their order is kept
+    :type sort: bool
+    :return: The sorted epoch microseconds
+    :rtype: numpy.ndarray
+    """
+    values = [value.removesuffix('Z').removesuffix('+00:00') for value in values if value and value != "None"]
+    if any('+' in value[10:] or '-' in value[10:] for value in values):
+        # Non-UTC offsets are rare, parse those histories record by record
+        epochs = np.array([to_epoch_us(datetime.fromisoformat(value)) for value in values], dtype=np.int64)
+    else:
+        epochs = np.array(values, dtype='datetime64[us]').astype(np.int64)
+    if sort:
+        epochs.sort()
+    return epochs
+
+def to_epoch_us(timestamp):
+    """
+    Converts a datetime into UTC epoch microseconds. Naive datetimes are treated as UTC.
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+def to_datetime(epoch):
+    """
+    Converts UTC epoch microseconds into a timezone aware datetime.
+    """
+    return EPOCH + timedelta(microseconds=int(epoch))
+
+def to_datetime_strings(epochs):
+    """
+    Converts epoch microseconds into the `str(datetime)` representation used in forecast outputs.
+    """
+    return [str(to_datetime(epoch)) for epoch in epochs]
+
+def output_mode(input_data):
+    mode = (input_data or {}).get('output', 'events')
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"output must be one of {', '.join(OUTPUT_MODES)}")
+    return mode
+
+def check_event_count(count):
+    """
+    Rejects forecasts with more predicted events than a response may hold.
+    """
+    if count > config.MAX_PREDICTED_EVENTS:
+        raise ValueError(f"The forecast has {count} events, more than {config.MAX_PREDICTED_EVENTS}. Use output=counts or a shorter horizon.")
+
+def count_buckets(input_data, start, horizon):
+    """
+    Returns the edges (epoch microseconds) of the count buckets of `bucket` hours (default 1)
+    that split the horizon after `start`. The last bucket ends with the horizon.
+    """
+    bucket = float((input_data or {}).get('bucket', 1))
+    if bucket <= 0:
+        raise ValueError("bucket must be positive")
+    size = int(np.ceil(horizon / bucket))
+    if size > config.MAX_FORECAST_BUCKETS:
+        raise ValueError(f"The horizon has {size} buckets, more than {config.MAX_FORECAST_BUCKETS}. Use a longer bucket.")
+    offsets = np.minimum(np.arange(size + 1) * bucket, horizon) * US_PER_HOUR
+    return start + np.rint(offsets).astype(np.int64)
+
+def counts_output(edges, **columns):
+    """
+    Returns the 'counts' part of a forecast: the bucket starts and a list per column of bucket values.
+    """
+    return {'start': to_datetime_strings(edges[:-1]), **{name: np.asarray(values).tolist() for name, values in columns.items()}}
+
+def periodic_event_count(origin, offsets, period, end):
+    """
+    Returns the number of predicted events up to and including the first one after `end`.
+    The k-th event (k = q * len(offsets) + j + 1) is at origin + q * period + offsets[j], i.e.
+    the inter-arrival times repeat every len(offsets) events and add up to `period`.
+    """
+    offsets = np.asarray(offsets, dtype=float)
+    remaining = end - origin - offsets
+    if period > 0:
+        periods = np.where(remaining < 0, 0, np.floor(remaining / period) + 1)
+    else:
+        periods = np.where(remaining < 0, 0, np.inf)
+    count = (periods * offsets.size + np.arange(1, offsets.size + 1)).min()
+    if not np.isfinite(count):
+        raise ValueError("The predicted inter-arrival times are not positive, the forecast never reaches the horizon.")
+    return int(count)
+
+def periodic_events(origin, offsets, period, count):
+    """
+    Returns the first `count` events of a periodic_event_count sequence.
+    """
+    offsets = np.asarray(offsets, dtype=float)
+    k = np.arange(count)
+    return origin + (k // offsets.size) * period + offsets[k % offsets.size]
+
+def periodic_counts(origin, offsets, period, count, edges):
+    """
+    Returns how many of the first `count` events of a periodic_event_count sequence fall into
+    each bucket between the edges, in O(buckets * len(offsets)) without generating the events.
+    """
+    offsets = np.asarray(offsets, dtype=float)
+    # The number of events of each offset among the first `count`
+    available = np.maximum((count - 1 - np.arange(offsets.size)) // offsets.size + 1, 0)
+    if period > 0:
+        before = np.clip(np.ceil((edges[:, None] - origin - offsets) / period), 0, available)
+    else:
+        before = np.where(origin + offsets < edges[:, None], np.minimum(available, 1), 0)
+    return np.diff(before.sum(axis=1)).astype(np.int64)
+
+def hour_of_week(epochs):
+    """
+    Returns the hour of the week (0 is Monday 00:00 UTC) of epoch microseconds.
+    """
+    return (epochs // US_PER_HOUR + EPOCH_HOUR_OF_WEEK) % HOURS_PER_WEEK
+
+def hour_of_week_exposure(first_hour, last_hour):
+    """
+    Returns how often each hour of the week occurs among the epoch hours first_hour..last_hour,
+    in constant time instead of counting the hours.
+    """
+    hours = last_hour - first_hour + 1
+    offsets = (np.arange(HOURS_PER_WEEK) - (first_hour + EPOCH_HOUR_OF_WEEK)) % HOURS_PER_WEEK
+    return hours // HOURS_PER_WEEK + (offsets < hours % HOURS_PER_WEEK)
+
+def trim_window(history, window):
+    """
+    Returns the events of a history at most `window` microseconds before its latest event, as
+    zero-copy slices of the sorted arrays. This is the lookback window of select_events.
+    """
+    latest = max((int(timestamps[-1]) for timestamps in history.values() if timestamps.size), default=None)
+    if latest is None:
+        return history
+    return {name: timestamps[np.searchsorted(timestamps, latest - window, side='left'):] for name, timestamps in history.items()}
+
+def lookback_window(lookback):
+    """
+    Returns a lookback in hours as microseconds.
+    """
+    return int(float(lookback) * US_PER_HOUR)
+
+def normalize_horizon(horizon):
+    """
+    Returns a prediction horizon as float, so that equal horizons given as int or float hash alike.
+    """
+    return float(horizon) if horizon is not None else None
+
+def digest(value):
+    """
+    Returns the sha256 hex digest of the canonical JSON of a value.
+    """
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+def since_query(query, since):
+    """
+    Returns the SLT query of the records with an event after the epoch microsecond `since`, or the query itself.
+    """
+    return {**query, 'since': to_datetime(since).isoformat()} if since is not None else query
+
+def slt_query(input_data):
+    """
+    Returns the part of the input data that is sent to the Storage Location Tracking service,
+    i.e. everything except the model parameters.
+    """
+    return {key: value for key, value in (input_data or {}).items() if key not in MODEL_PARAMETERS}
 
 class TransactionForecastAlgorithm:
     """
@@ -20,178 +236,664 @@ class TransactionForecastAlgorithm:
     :type input_data: dict
     """
     @staticmethod
-    def get_transaction_history(input_data, event_type):
-        if input_data is None or 'transaction_history' not in input_data or not input_data.get('transaction_history'):
-            try: 
-                response = requests.get(f"{config.STORAGE_LOCATION_TRACKING_API}/ulRecords", json=input_data)
+    def stream_ul_records(query, since=None, window=None):
+        """
+        Streams the ulRecords matching the query from the Storage Location Tracking service and
+        parses them in batches while they arrive, skipping missing timestamps.
+
+        :param query: The SLT query
+        :type query: dict
+        :param since: Only request the records with an event after this epoch microsecond
+        :type since: int
+        :param window: Only keep the events at most `window` microseconds before the latest event.
+            Events outside the window of the latest event seen so far are dropped while the records
+            stream in, so memory is bounded by the window instead of the history.
+        :type window: int
+        :return: Read-only, sorted epoch microsecond arrays keyed by 'storage' and 'retrieval'
+        :rtype: dict
+        """
+        query = since_query(query, since)
+        parts = {event_type: [] for event_type in EVENT_FIELDS}
+        latest = None
+        try:
+            with metrics.stage('fetch'):
+                response = slt_client.get("/ulRecords", json=query, stream=True)
+            with response:
                 response.raise_for_status()
-                transaction_history = response.json()
-            except requests.exceptions.RequestException as e:
-                raise ValueError(f"Error getting transaction history: {e}")
-        else: 
+                records = iter_records(response.iter_content(config.SLT_STREAM_CHUNK_SIZE))
+                while True:
+                    with metrics.stage('fetch'):
+                        batch = list(islice(records, PARSE_BATCH_SIZE))
+                    if not batch:
+                        break
+                    with metrics.stage('parse'):
+                        for event_type, field in EVENT_FIELDS.items():
+                            timestamps = parse_timestamps([record.get(field) for record in batch])
+                            if timestamps.size:
+                                parts[event_type].append(timestamps)
+                                latest = int(timestamps[-1]) if latest is None else max(latest, int(timestamps[-1]))
+                        if window is not None and latest is not None:
+                            for event_type, arrays in parts.items():
+                                if len(arrays) > WINDOW_COMPACT_BATCHES:
+                                    timestamps = np.concatenate(arrays)
+                                    parts[event_type] = [timestamps[timestamps >= latest - window]]
+        except requests.exceptions.RequestException as e:
+            raise ValueError(f"Error getting transaction history: {e}")
+
+        with metrics.stage('parse'):
+            history = {}
+            for event_type, arrays in parts.items():
+                timestamps = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+                timestamps.sort()
+                history[event_type] = timestamps
+            if window is not None:
+                history = trim_window(history, window)
+        for timestamps in history.values():
+            timestamps.setflags(write=False)
+        return history
+
+    @staticmethod
+    def parse_ul_records(records):
+        """
+        Parses ulRecords into read-only, sorted epoch microsecond arrays keyed by 'storage' and 'retrieval'.
+        """
+        with metrics.stage('parse'):
+            history = {
+                'storage': parse_timestamps([entry.get('stored_at') for entry in records]),
+                'retrieval': parse_timestamps([entry.get('retrieved_at') for entry in records])
+            }
+        for timestamps in history.values():
+            timestamps.setflags(write=False)
+        return history
+
+    @staticmethod
+    def refresh_transaction_history(query, history):
+        """
+        Appends the events newer than the high-water mark of each event type of a cached history.
+
+        :param query: The SLT query of the history
+        :type query: dict
+        :param history: The cached history as returned by fetch_new_events
+        :type history: dict
+        :return: The updated history
+        :rtype: dict
+        """
+        watermarks = [timestamps[-1] for timestamps in history.values() if timestamps.size]
+        if not watermarks:
+            return TransactionForecastAlgorithm.fetch_new_events(query)
+        # Records with any event after `since` are returned, fetch from the older watermark so no type misses events
+        new_events = TransactionForecastAlgorithm.fetch_new_events(query, int(min(watermarks)))
+        updated = {}
+        for event_type, timestamps in history.items():
+            new = new_events[event_type]
+            if timestamps.size:
+                new = new[new > timestamps[-1]]
+            updated[event_type] = np.concatenate((timestamps, new))
+        if query.get('lookback') is not None:
+            updated = trim_window(updated, lookback_window(query['lookback']))
+        for timestamps in updated.values():
+            timestamps.setflags(write=False)
+        return updated
+
+    @staticmethod
+    def fetch_new_events(query, since=None):
+        """
+        Fetches and parses the ulRecords with an event after the epoch microsecond `since`, or all of them.
+
+        A 'lookback' in the query bounds the history to the events of the last `lookback` hours
+        before its latest event. The window is pushed down to SLT as 'since', with a margin of
+        another `lookback` hours for the time since the latest event. Histories that were idle
+        for longer are streamed without the pushdown, keeping only the window.
+        """
+        lookback = query.get('lookback')
+        query = slt_query(query)
+        if lookback is None:
+            return TransactionForecastAlgorithm.stream_ul_records(query, since)
+        window = lookback_window(lookback)
+        floor = to_epoch_us(datetime.now(timezone.utc)) - 2 * window
+        if since is not None and since >= floor:
+            return TransactionForecastAlgorithm.stream_ul_records(query, since, window)
+        history = TransactionForecastAlgorithm.stream_ul_records(query, floor, window)
+        latest = TransactionForecastAlgorithm.latest_event(history, 'both')
+        if latest is not None and latest - window >= floor:
+            return history
+        return TransactionForecastAlgorithm.stream_ul_records(query, since, window)
+
+    @staticmethod
+    def load_transaction_history(input_data):
+        """
+        Loads the transaction history from the Storage Location Tracking service.
+        Histories are read from the event store if one is configured, otherwise they are shared
+        through the history cache. Both are refreshed incrementally. Cached histories of input
+        data with a 'lookback' only hold the events of that window, see fetch_new_events.
+
+        :param input_data: The input data used as SLT query
+        :type input_data: dict
+        :return: Sorted epoch microsecond arrays keyed by 'storage' and 'retrieval'
+        :rtype: dict
+        """
+        if input_data is not None and input_data.get('transaction_history'):
             raise NotImplementedError("This feature is not implemented yet")
-        timestamps = []
-        for entry in transaction_history:
-            if event_type == 'storage' or event_type == 'both':
-                timestamp = entry.get('stored_at')
-                if timestamp != "None":
-                    timestamps.append(datetime.fromisoformat(timestamp.replace('Z', '+00:00')))
-            if event_type == 'retrieval' or event_type == 'both':
-                timestamp = entry.get('retrieved_at')
-                if timestamp != "None":
-                    timestamps.append(datetime.fromisoformat(timestamp.replace('Z', '+00:00')))
-        timestamps.sort()  # Ensure timestamps are in chronological order
-
-        if not timestamps:
+        if event_store is not None:
+            history = event_store.get(slt_query(input_data), TransactionForecastAlgorithm.fetch_new_events)
+        else:
+            query = slt_query(input_data)
+            if input_data is not None and input_data.get('lookback') is not None:
+                query['lookback'] = float(input_data['lookback'])
+            history = history_cache.get(
+                query,
+                TransactionForecastAlgorithm.fetch_new_events,
+                TransactionForecastAlgorithm.refresh_transaction_history
+            )
+        metrics.label(history_size=sum(timestamps.size for timestamps in history.values()))
+        return history
+
+    @staticmethod
+    def select_events(history, event_type, after=None, lookback=None):
+        """
+        Selects the event timestamps of the given type from a loaded transaction history.
+        Single event types are returned as zero-copy slices of the history.
+
+        :param history: The history as returned by load_transaction_history
+        :type history: dict
+        :param event_type: Type of event ('storage', 'retrieval', or 'both')
+        :type event_type: str
+        :param after: Only select events after this epoch microsecond, the result may then be empty
+        :type after: int
+        :param lookback: Only select events of the last `lookback` hours before the latest event of the history
+        :type lookback: float
+        :return: The sorted epoch microseconds
+        :rtype: numpy.ndarray
+        """
+        event_types = ('storage', 'retrieval') if event_type == 'both' else (event_type,)
+        selected = [history[name] for name in event_types]
+        if lookback is not None:
+            latest = max((int(timestamps[-1]) for timestamps in history.values() if timestamps.size), default=None)
+            if latest is not None:
+                start = latest - lookback_window(lookback)
+                selected = [timestamps[np.searchsorted(timestamps, start, side='left'):] for timestamps in selected]
+        if after is not None:
+            selected = [timestamps[np.searchsorted(timestamps, after, side='right'):] for timestamps in selected]
+        if len(selected) > 1:
+            timestamps = np.concatenate(selected)
+            timestamps.sort(kind='mergesort')
+        else:
+            timestamps = selected[0]
+
+        if timestamps.size == 0 and after is None:
             raise ValueError("No valid records to process after cleaning data.")
         return timestamps
 
     @staticmethod
-    def poisson_process(input_data, event_type, horizon=1):
+    def get_transaction_history(input_data, event_type, history=None, after=None):
+        if history is None:
+            history = TransactionForecastAlgorithm.load_transaction_history(input_data)
+        return TransactionForecastAlgorithm.select_events(history, event_type, after, (input_data or {}).get('lookback'))
+
+    @staticmethod
+    def latest_event(history, event_type):
+        """
+        Returns the epoch microsecond of the latest event of the given type, or None.
+        """
+        event_types = ('storage', 'retrieval') if event_type == 'both' else (event_type,)
+        latest = [int(history[name][-1]) for name in event_types if history[name].size]
+        return max(latest) if latest else None
+
+    @staticmethod
+    def forecast_key(algorithm, input_data, event_type, horizon, history):
+        """
+        Returns the canonical hash of a forecast request. Requests with the same key over a
+        history with the same latest event produce the same forecast.
+
+        :return: The hex digest
+        :rtype: str
+        """
+        key = {
+            'algorithm': AlgorithmType(algorithm).value,
+            'input_data': input_data or {},
+            'event_type': event_type,
+            'horizon': normalize_horizon(horizon),
+            'latest_event': TransactionForecastAlgorithm.latest_event(history, event_type)
+        }
+        return digest(key)
+
+    @staticmethod
+    def seeded_input_data(algorithm, input_data, forecast_key):
+        """
+        Returns the input data with a seed derived from the forecast key for stochastic algorithms
+        without an explicit seed, so that recomputing a memoized forecast reproduces it.
+        """
+        if algorithm not in STOCHASTIC_ALGORITHMS or (input_data or {}).get('seed') is not None:
+            return input_data
+        return {**(input_data or {}), 'seed': int(forecast_key[:12], 16)}
+
+    @staticmethod
+    def state_key(algorithm, input_data, event_type):
+        """
+        Returns the key of the persisted model state of a forecast, or None if the algorithm
+        does not update incrementally.
+
+        :return: The key columns of forecasting.models.ModelState
+        :rtype: dict
+        """
+        input_data = input_data or {}
+        # A window over the latest events cannot be updated by folding in new events only
+        if algorithm not in STATE_PARAMETERS or input_data.get('lookback') is not None:
+            return None
+        parameters = {name: input_data[name] for name in STATE_PARAMETERS[algorithm] if name in input_data}
+        return {
+            'query_hash': digest(slt_query(input_data)),
+            'event_type': event_type,
+            'algorithm': AlgorithmType(algorithm).value,
+            'parameters_hash': digest(parameters)
+        }
+
+    @staticmethod
+    def get_inter_event_times(timestamps):
+        """
+        Returns the inter-arrival times of the given epoch microseconds in seconds.
+        """
+        if timestamps.size < 2:
+            raise ValueError("At least two events are required to estimate inter-arrival times.")
+        return np.diff(timestamps) / US_PER_SECOND
+
+    @staticmethod
+    def simulate_poisson_paths(rng, rate, horizon, samples):
+        """
+        Simulates sample paths of a homogeneous Poisson process in one vectorized draw.
+
+        :param rng: The random generator
+        :type rng: numpy.random.Generator
+        :param rate: The event rate per hour
+        :type rate: float
+        :param horizon: The simulated horizon in hours
+        :type horizon: float
+        :param samples: The number of sample paths
+        :type samples: int
+        :return: The arrival times in hours of each path (samples x max events) and the
+            number of events of each path within the horizon
+        :rtype: tuple
+        """
+        expected = rate * horizon
+        # Enough arrivals per path that virtually no path runs out before the horizon
+        max_events = int(np.ceil(expected + 6 * np.sqrt(expected) + 10))
+        if samples * max_events > config.POISSON_MAX_DRAWS:
+            raise ValueError("Too many samples for the expected number of events in the horizon.")
+        arrival_times = rng.exponential(1 / rate, size=(samples, max_events))
+        np.cumsum(arrival_times, axis=1, out=arrival_times)
+        return arrival_times, (arrival_times <= horizon).sum(axis=1)
+
+    @staticmethod
+    def poisson_process(input_data, event_type, horizon=1, history=None, state=None):
         """
         Predicts transaction forecast using a Poisson process (with filtering).
+
+        With `samples` in the input data, the horizon after the last event is simulated
+        as many sample paths. The forecast then holds the median time of each event and
+        the confidence interval the `quantiles` band (default 5%/95%) of the event times
+        and of the number of events. With output=counts, the number of events in each
+        bucket of the horizon is drawn instead, next to its expected number.
+
+        :param input_data: Input data containing transaction history, samples, quantiles and seed
+        :param event_type: Type of event (storage, retrieval, both)
+        :param horizon: Prediction horizon in hours
+        :param history: Preloaded history as returned by load_transaction_history
         """
-        timestamps = TransactionForecastAlgorithm.get_transaction_history(input_data, event_type)
-        inter_event_times = [(timestamps[i] - timestamps[i-1]).total_seconds() 
-                             for i in range(1, len(timestamps))]
+        timestamps = TransactionForecastAlgorithm.get_transaction_history(input_data, event_type, history)
+        inter_event_times = TransactionForecastAlgorithm.get_inter_event_times(timestamps)
+        input_data = input_data or {}
+        rng = np.random.default_rng(input_data.get('seed'))
 
         # 2. Estimate the average transaction rate (lambda)
-        avg_transaction_rate = len(inter_event_times) / (sum(inter_event_times) / 3600) 
+        avg_transaction_rate = inter_event_times.size / (inter_event_times.sum() / 3600) 
+
+        if output_mode(input_data) == 'counts':
+            # The number of events in each bucket is Poisson distributed with the bucket's share of the rate
+            edges = count_buckets(input_data, int(timestamps[-1]), horizon)
+            expected = avg_transaction_rate * np.diff(edges) / US_PER_HOUR
+            return {
+                "next_transaction": [],
+                "confidence_interval": None,
+                "counts": counts_output(edges, count=rng.poisson(expected), expected=expected)
+            }
+
+        samples = input_data.get('samples')
+        if samples:
+            if not isinstance(samples, int) or not 0 < samples <= config.POISSON_MAX_SAMPLES:
+                raise ValueError(f"samples must be an integer between 1 and {config.POISSON_MAX_SAMPLES}")
+            lower, upper = input_data.get('quantiles', (0.05, 0.95))
+            if not 0 <= lower <= 0.5 <= upper <= 1:
+                raise ValueError("quantiles must be a lower and an upper quantile around the median")
+            arrival_times, counts = TransactionForecastAlgorithm.simulate_poisson_paths(rng, avg_transaction_rate, horizon, samples)
+            count_bands = np.quantile(counts, (lower, 0.5, upper))
+            num_events = int(count_bands[1])
+            check_event_count(num_events)
+            time_bands = timestamps[-1] + np.rint(np.quantile(arrival_times[:, :num_events], (lower, 0.5, upper), axis=0) * US_PER_HOUR)
+            return {
+                "next_transaction": to_datetime_strings(time_bands[1]),
+                "confidence_interval": {
+                    "quantiles": [lower, upper],
+                    "lower": to_datetime_strings(time_bands[0]),
+                    "upper": to_datetime_strings(time_bands[2]),
+                    "event_count": [int(count_bands[0]), int(count_bands[2])]
+                }
+            }
 
         # 3. Predict transactions within the horizon
-        num_events_in_horizon = np.random.poisson(avg_transaction_rate * horizon)
-        predicted_times = []
-        current_time = timestamps[-1] 
-        for _ in range(num_events_in_horizon):
-            time_to_next_event = expon.rvs(scale=1/avg_transaction_rate)  # Time in hours
-            current_time += timedelta(hours=time_to_next_event) 
-            if (current_time - datetime.now()).total_seconds() <= horizon * 3600:
-                predicted_times.append(str(current_time))
+        num_events_in_horizon = rng.poisson(avg_transaction_rate * horizon)
+        check_event_count(num_events_in_horizon)
+        times_to_next_event = rng.exponential(1/avg_transaction_rate, size=num_events_in_horizon)  # Time in hours
+        predicted_times = timestamps[-1] + np.cumsum(times_to_next_event * US_PER_HOUR).astype(np.int64)
+        now = to_epoch_us(datetime.now(timezone.utc))
+        predicted_times = predicted_times[predicted_times - now <= horizon * US_PER_HOUR]
 
         return {
-            "next_transaction": predicted_times, 
+            "next_transaction": to_datetime_strings(predicted_times), 
             "confidence_interval": None
         }
 
     @staticmethod
-    def exponential_smoothing(input_data, event_type, horizon=1):
+    def exponential_smoothing(input_data, event_type, horizon=1, history=None, state=None):
         """
         Predicts transaction forecast using exponential smoothing.
 
         :param input_data: Input data containing transaction history and alpha
         :param event_type: Type of event (storage, retrieval, both)
         :param horizon: Prediction horizon in hours
+        :param history: Preloaded history as returned by load_transaction_history
+        :param state: Persisted model state, resumed from and updated in place
         :param alpha: Smoothing factor (between 0 and 1)
+        :param output: 'events' (default) for the predicted event times or 'counts' for the number of events per bucket
+        :param bucket: The length of the count buckets in hours (default 1)
         """
-        timestamps = TransactionForecastAlgorithm.get_transaction_history(input_data, event_type)
-        if not all(timestamp.tzinfo == timestamps[0].tzinfo for timestamp in timestamps):
-            raise ValueError("Timestamps have inconsistent time zone information.")
+        # SciPy takes about a second to import, load it with the first forecast instead of at startup
+        from scipy.signal import lfilter
+
         alpha = 0.2
         if input_data is not None:
             alpha = input_data.get('alpha', 0.2)
 
-        # Calculate smoothed timestamps
-        smoothed_timestamps = []
-        smoothed_timestamps.append(timestamps[0])  # Initialize with the first timestamp
-
-        for i in range(1, len(timestamps)):
-            # Calculate the difference between timestamps as seconds
-            time_diff_seconds = (timestamps[i] - timestamps[i-1]).total_seconds() 
-            # Calculate the smoothed time difference
-            smoothed_time_diff_seconds = alpha * time_diff_seconds + (1 - alpha) * (smoothed_timestamps[i-1] - smoothed_timestamps[i-2]).total_seconds() 
-            smoothed_timestamps.append(smoothed_timestamps[i-1] + timedelta(seconds=smoothed_time_diff_seconds))
-
-        # Predict next timestamps
-        predicted_times = []
-        current_time = timestamps[-1]
-        while (current_time - smoothed_timestamps[-1]).total_seconds() <= horizon * 3600:
-            time_to_next_event = (smoothed_timestamps[-1] - smoothed_timestamps[-2]).total_seconds()
-            current_time += timedelta(seconds=time_to_next_event)
-            predicted_times.append(str(current_time))
+        # Smoothed inter-arrival times, s_i = alpha * d_i + (1 - alpha) * s_{i-1} with s_0 = 0
+        if state:
+            # Fold only the events after the watermark into the persisted state
+            new_events = TransactionForecastAlgorithm.get_transaction_history(input_data, event_type, history, after=state['watermark'])
+            inter_event_times = np.diff(new_events, prepend=state['watermark']) / US_PER_SECOND
+            smoothed_diffs, _ = lfilter([alpha], [1, alpha - 1], inter_event_times, zi=[(1 - alpha) * state['smoothed_diff']])
+            smoothed_last = state['smoothed_last'] + smoothed_diffs.sum() * US_PER_SECOND
+            last_event = int(new_events[-1]) if new_events.size else state['watermark']
+            smoothed_diff = float(smoothed_diffs[-1]) if smoothed_diffs.size else state['smoothed_diff']
+        else:
+            timestamps = TransactionForecastAlgorithm.get_transaction_history(input_data, event_type, history)
+            inter_event_times = TransactionForecastAlgorithm.get_inter_event_times(timestamps)
+            smoothed_diffs = lfilter([alpha], [1, alpha - 1], inter_event_times)
+            smoothed_last = timestamps[0] + smoothed_diffs.sum() * US_PER_SECOND
+            last_event = int(timestamps[-1])
+            smoothed_diff = float(smoothed_diffs[-1])
+        if state is not None:
+            state.update(watermark=last_event, smoothed_last=float(smoothed_last), smoothed_diff=smoothed_diff)
+        time_to_next_event = smoothed_diff * US_PER_SECOND
+
+        # Events every smoothed inter-arrival time after the last event, up to the first one
+        # more than the horizon after the smoothed last event
+        end_time = smoothed_last + horizon * US_PER_HOUR
+        count = 0 if last_event > end_time else periodic_event_count(last_event, [time_to_next_event], time_to_next_event, end_time)
+        if output_mode(input_data) == 'counts':
+            edges = count_buckets(input_data, last_event, horizon)
+            return {
+                "next_transaction": [],
+                "confidence_interval": None,
+                "counts": counts_output(edges, count=periodic_counts(last_event, [time_to_next_event], time_to_next_event, count, edges))
+            }
+        check_event_count(count)
+        predicted_times = periodic_events(last_event, [time_to_next_event], time_to_next_event, count)
 
         return {
-            "next_transaction": predicted_times,
+            "next_transaction": to_datetime_strings(np.rint(predicted_times)),
             "confidence_interval": None  # Implement if needed
         }
 
     @staticmethod
-    def holt_winters(input_data, event_type, horizon=1):
+    def holt_winters(input_data, event_type, horizon=1, history=None, state=None):
         """
         Predicts transaction forecast using Holt-Winters exponential smoothing.
 
+        With `fit` in the input data, every (alpha, beta, gamma) combination of the parameter
+        grid is evaluated in one pass over the history and the forecast uses the combination
+        with the lowest in-sample one-step-ahead error. `fit` is either true for the default
+        grid or a dict with 'alpha', 'beta' and/or 'gamma' value lists.
+
         :param input_data: Input data containing transaction history
         :param event_type: Type of event (storage, retrieval, both)
         :param horizon: Prediction horizon in hours
+        :param history: Preloaded history as returned by load_transaction_history
+        :param state: Persisted model state, resumed from and updated in place
         :param alpha: Smoothing factor for level (between 0 and 1)
         :param beta: Smoothing factor for trend (between 0 and 1)
         :param gamma: Smoothing factor for seasonality (between 0 and 1)
         :param seasonality: Seasonal period (e.g., 7 for weekly seasonality)
+        :param fit: Parameter grid to fit alpha, beta and gamma on
+        :param output: 'events' (default) for the predicted event times or 'counts' for the number of events per bucket
+        :param bucket: The length of the count buckets in hours (default 1)
         """
-        timestamps = TransactionForecastAlgorithm.get_transaction_history(input_data, event_type)
-
-        if not all(timestamp.tzinfo == timestamps[0].tzinfo for timestamp in timestamps):
-            raise ValueError("Timestamps have inconsistent time zone information.")
-
         alpha = 0.2
         beta = 0.1
         gamma = 0.3
         seasonality = 7
+        fit = None
         if input_data is not None:
             alpha = input_data.get('alpha', 0.2)
             beta = input_data.get('beta', 0.1)
             gamma = input_data.get('gamma', 0.3)
             seasonality = input_data.get('seasonality', 7)
+            fit = input_data.get('fit')
 
-        if len(timestamps) <= seasonality:
-            raise ValueError("Not enough data to perform Holt-Winters with the given seasonality.")
+        if state:
+            # Fold only the events after the watermark into the persisted state of all candidates
+            new_events = TransactionForecastAlgorithm.get_transaction_history(input_data, event_type, history, after=state['watermark'])
+            inter_event_times = np.diff(new_events, prepend=state['watermark']) / US_PER_SECOND
+            alpha, beta, gamma = (np.array(state[name]) for name in ('alpha', 'beta', 'gamma'))
+            result = holt_winters_filter(
+                inter_event_times, alpha, beta, gamma,
+                np.array(state['level']), np.array(state['trend']), np.array(state['season']),
+                start=state['count'] + 1
+            )
+            result['sse'] += state['sse']
+            result['smoothed'] += state['smoothed']
+            first_event = state['first_event']
+            last_event = int(new_events[-1]) if new_events.size else state['watermark']
+            count = state['count'] + inter_event_times.size
+        else:
+            timestamps = TransactionForecastAlgorithm.get_transaction_history(input_data, event_type, history)
+            if len(timestamps) <= seasonality:
+                raise ValueError("Not enough data to perform Holt-Winters with the given seasonality.")
+
+            inter_event_times = TransactionForecastAlgorithm.get_inter_event_times(timestamps)
+
+            # Initialization (using simple averages for simplicity)
+            l0 = inter_event_times[:seasonality - 1].sum() / seasonality
+            if len(timestamps) < 2*seasonality:
+                # Estimate initial trend with available data
+                b0 = (timestamps[-1] - timestamps[0]) / US_PER_SECOND / len(timestamps) 
+            else:
+                b0 = ((timestamps[seasonality:2*seasonality] - timestamps[:seasonality]) / US_PER_SECOND).mean() - l0 
+            s0 = np.concatenate(([0.0], inter_event_times[:seasonality - 1] - l0))
+
+            if fit:
+                grid = {**config.HOLT_WINTERS_GRID, **(fit if isinstance(fit, dict) else {})}
+                alpha, beta, gamma = (np.ravel(values) for values in np.meshgrid(grid['alpha'], grid['beta'], grid['gamma'], indexing='ij'))
+                if alpha.size > config.HOLT_WINTERS_MAX_CANDIDATES:
+                    raise ValueError(f"The parameter grid must not exceed {config.HOLT_WINTERS_MAX_CANDIDATES} candidates.")
+            alpha, beta, gamma = (np.atleast_1d(np.asarray(value, dtype=float)) for value in (alpha, beta, gamma))
+            if not all(((0 <= values) & (values <= 1)).all() for values in (alpha, beta, gamma)):
+                raise ValueError("alpha, beta and gamma must be between 0 and 1.")
+
+            # Holt-Winters calculations for all candidates, only the last smoothed timestamp is needed for the prediction
+            candidates = alpha.size
+            result = holt_winters_filter(
+                inter_event_times, alpha, beta, gamma,
+                np.full(candidates, l0), np.full(candidates, b0), np.tile(s0, (candidates, 1))
+            )
+            first_event = int(timestamps[0])
+            last_event = int(timestamps[-1])
+            count = inter_event_times.size
+
+        if state is not None:
+            state.update(
+                watermark=last_event, first_event=first_event, count=count,
+                alpha=alpha.tolist(), beta=beta.tolist(), gamma=gamma.tolist(),
+                level=result['level'].tolist(), trend=result['trend'].tolist(), season=result['season'].tolist(),
+                sse=result['sse'].tolist(), smoothed=result['smoothed'].tolist()
+            )
+
+        sse = np.where(np.isfinite(result['sse']), result['sse'], np.inf)
+        best = int(np.argmin(sse))
+        if not np.isfinite(sse[best]):
+            raise ValueError("Holt-Winters diverged for all parameter candidates.")
+        l0, b0 = result['level'][best], result['trend'][best]
+        s = result['season'][best]
+        smoothed_offset = result['smoothed'][best]
+        parameters = {
+            "alpha": float(alpha[best]),
+            "beta": float(beta[best]),
+            "gamma": float(gamma[best]),
+            "seasonality": seasonality,
+            "mse": float(sse[best] / count)
+        }
+
+        # The predicted inter-arrival times l + b + s[step % seasonality] repeat every season,
+        # the events continue from the smoothed last event up to the first one after the horizon
+        smoothed_last = first_event + smoothed_offset * US_PER_SECOND
+        end_time = last_event + horizon * US_PER_HOUR
+        offsets = np.cumsum(l0 + b0 + np.roll(s, -(count % seasonality))) * US_PER_SECOND
+        num_events = periodic_event_count(smoothed_last, offsets, offsets[-1], end_time)
+        if output_mode(input_data) == 'counts':
+            edges = count_buckets(input_data, last_event, horizon)
+            return {
+                "next_transaction": [],
+                "confidence_interval": None,
+                "counts": counts_output(edges, count=periodic_counts(smoothed_last, offsets, offsets[-1], num_events, edges)),
+                "parameters": parameters
+            }
+        check_event_count(num_events)
+        predicted_times = periodic_events(smoothed_last, offsets, offsets[-1], num_events)
+
+        return {
+            "next_transaction": to_datetime_strings(np.rint(predicted_times)),
+            "confidence_interval": None,
+            "parameters": parameters
+        }
+
+    @staticmethod
+    def seasonal_poisson(input_data, event_type, horizon=1, history=None, state=None):
+        """
+        Predicts transaction forecast using a non-homogeneous Poisson process with an hourly rate profile.
+
+        The events are counted into an hour of week histogram in one bincount pass. The histogram
+        is kept in the model state and only the new events are added to it, so the cost of a
+        forecast scales with the new events and the horizon instead of the history. The rate of
+        each hour is its count divided by how often the hour occurred between the first and the
+        last event, shrunk towards the mean rate by `prior` pseudo-hours.
+
+        The forecast holds the expected number of events and its `quantiles` band (default 5%/95%)
+        in every `bucket` (default 1 hour) of the horizon after the last event, the band of the total
+        number of events and, unless output=counts, as next_transaction the times at which the
+        expected cumulative number of events reaches 1, 2, ...
+
+        :param input_data: Input data containing transaction history, profile, prior and quantiles
+        :param event_type: Type of event (storage, retrieval, both)
+        :param horizon: Prediction horizon in hours
+        :param history: Preloaded history as returned by load_transaction_history
+        :param state: Persisted model state, resumed from and updated in place
+        :param profile: One rate per hour of the 'week' (default), per hour of the 'day', or a 'flat' rate
+        :param prior: The weight of the mean rate in each hourly rate in hours (default 1)
+        :param output: 'events' (default) or 'counts' to leave out the predicted event times
+        :param bucket: The length of the count buckets in hours (default 1)
+        """
+        # SciPy takes about a second to import, load it with the first forecast instead of at startup
+        from scipy.stats import poisson
+
+        input_data = input_data or {}
+        profile = input_data.get('profile', 'week')
+        if profile not in SEASONAL_PROFILES:
+            raise ValueError(f"profile must be one of {', '.join(SEASONAL_PROFILES)}")
+        prior = float(input_data.get('prior', 1))
+        if prior < 0:
+            raise ValueError("prior must not be negative")
+        lower, upper = input_data.get('quantiles', (0.05, 0.95))
+        if not 0 <= lower <= 0.5 <= upper <= 1:
+            raise ValueError("quantiles must be a lower and an upper quantile around the median")
+        if not horizon or horizon <= 0:
+            raise ValueError("prediction_horizon must be positive")
+
+        if state:
+            # Add only the events after the watermark to the persisted histogram
+            new_events = TransactionForecastAlgorithm.get_transaction_history(input_data, event_type, history, after=state['watermark'])
+            counts = np.array(state['counts']) + np.bincount(hour_of_week(new_events), minlength=HOURS_PER_WEEK)
+            first_event = state['first_event']
+            last_event = int(new_events[-1]) if new_events.size else state['watermark']
+        else:
+            timestamps = TransactionForecastAlgorithm.get_transaction_history(input_data, event_type, history)
+            counts = np.bincount(hour_of_week(timestamps), minlength=HOURS_PER_WEEK)
+            first_event = int(timestamps[0])
+            last_event = int(timestamps[-1])
+        if state is not None:
+            state.update(watermark=last_event, first_event=first_event, counts=counts.tolist())
 
-        # Initialization (using simple averages for simplicity)
-        l0 = sum((timestamps[i] - timestamps[i-1]).total_seconds() for i in range(1, seasonality)) / seasonality
-        if len(timestamps) < 2*seasonality:
-            # Estimate initial trend with available data
-            b0 = (timestamps[-1] - timestamps[0]).total_seconds() / len(timestamps) 
+        # Rates per hour of the week
+        exposure = hour_of_week_exposure(first_event // US_PER_HOUR, last_event // US_PER_HOUR)
+        mean_rate = counts.sum() / exposure.sum()
+        if profile == 'week':
+            rates = (counts + prior * mean_rate) / (exposure + prior)
+        elif profile == 'day':
+            daily_counts, daily_exposure = counts.reshape(7, 24).sum(axis=0), exposure.reshape(7, 24).sum(axis=0)
+            rates = np.tile((daily_counts + prior * mean_rate) / (daily_exposure + prior), 7)
         else:
-            b0 = (sum((timestamps[i] - timestamps[i-seasonality]).total_seconds() for i in range(seasonality, min(2*seasonality, len(timestamps)))) / (min(2*seasonality, len(timestamps)) - seasonality)) - l0 
-        s = [0] + [(timestamps[i] - timestamps[i-1]).total_seconds() - l0 for i in range(1, seasonality)]
-
-        # Holt-Winters calculations
-        smoothed_timestamps = []
-        smoothed_timestamps.append(timestamps[0])  # Initialize with the first timestamp
-
-        for i in range(1, len(timestamps)):
-            time_diff_seconds = (timestamps[i] - timestamps[i-1]).total_seconds() 
-            l = alpha * (time_diff_seconds - s[(i-1) % seasonality]) + (1 - alpha) * (l0 + b0) 
-            b = beta * (l - l0) + (1 - beta) * b0
-            s[i % seasonality] = gamma * (time_diff_seconds - l) + (1 - gamma) * s[(i-1) % seasonality] 
-            l0, b0 = l, b
-            smoothed_timestamps.append(smoothed_timestamps[i-1] + timedelta(seconds=l0 + b0 + s[i % seasonality]))
-
-        # Predict next timestamps
-        predicted_times = []
-        current_time = timestamps[-1]
-        start_time = current_time 
-        end_time = start_time + timedelta(hours=horizon)
-
-        while current_time <= end_time:
-            next_timestamp = smoothed_timestamps[-1] + timedelta(seconds=l0 + b0 + s[(len(smoothed_timestamps) - 1) % seasonality]) 
-            predicted_times.append(str(next_timestamp))
-            current_time = next_timestamp
-            smoothed_timestamps.append(next_timestamp)
+            rates = np.full(HOURS_PER_WEEK, mean_rate)
 
+        # The cumulative intensity at the full hours of the horizon after the last event
+        end = last_event + int(horizon * US_PER_HOUR)
+        hours = np.concatenate((
+            [last_event],
+            np.arange((last_event // US_PER_HOUR + 1) * US_PER_HOUR, end, US_PER_HOUR, dtype=np.int64),
+            [end]
+        ))
+        cumulative = np.concatenate(([0.0], np.cumsum(rates[hour_of_week(hours[:-1])] * np.diff(hours) / US_PER_HOUR)))
+        edges = count_buckets(input_data, last_event, horizon)
+        expected = np.diff(np.interp(edges, hours, cumulative))
+        if output_mode(input_data) == 'counts':
+            predicted_times = []
+        else:
+            check_event_count(int(cumulative[-1]))
+            predicted_times = np.interp(np.arange(1, int(cumulative[-1]) + 1), cumulative, hours)
 
         return {
-            "next_transaction": predicted_times,
-            "confidence_interval": None 
+            "next_transaction": to_datetime_strings(np.rint(predicted_times)),
+            "confidence_interval": {
+                "quantiles": [lower, upper],
+                "event_count": [int(poisson.ppf(lower, cumulative[-1])), int(poisson.ppf(upper, cumulative[-1]))]
+            },
+            "counts": counts_output(
+                edges,
+                expected=expected,
+                lower=poisson.ppf(lower, expected).astype(int),
+                upper=poisson.ppf(upper, expected).astype(int)
+            ),
+            "parameters": {
+                "profile": profile,
+                "prior": prior,
+                "rate": float(mean_rate)
+            }
         }
 
     algorithms = {
         AlgorithmType.POISSON_PROCESS: poisson_process, 
         AlgorithmType.EXPONENTIAL_SMOOTHING: exponential_smoothing,
-        AlgorithmType.HOLT_WINTERS: holt_winters
+        AlgorithmType.HOLT_WINTERS: holt_winters,
+        AlgorithmType.SEASONAL_POISSON: seasonal_poisson
     } 
 
     @staticmethod
-    def predict(algorithm: AlgorithmType, input_data, event_type, horizon):
+    def predict(algorithm: AlgorithmType, input_data, event_type, horizon, history=None, state=None):
         """
         Predicts transaction forecasts using the specified algorithm.
 
@@ -203,6 +905,10 @@ class TransactionForecastAlgorithm:
         :type event_type: str
         :param horizon: Prediction horizon.
         :type horizon: int
+        :param history: Preloaded history as returned by load_transaction_history.
+        :type history: dict
+        :param state: Persisted model state of the forecast, resumed from and updated in place.
+        :type state: dict
         :return: Prediction results.
         :rtype: dict
         """
@@ -210,4 +916,94 @@ class TransactionForecastAlgorithm:
             raise ValueError("Invalid algorithm")
         if event_type not in ('storage', 'retrieval', 'both'):
             raise ValueError("Invalid event type")
-        return TransactionForecastAlgorithm.algorithms[algorithm](input_data, event_type, horizon)
\ No newline at end of file
+        return TransactionForecastAlgorithm.algorithms[algorithm](input_data, event_type, horizon, history, state)
+
+    @staticmethod
+    def check_request(event_type, horizon):
+        """
+        Validates the event type and prediction horizon of a forecast request, before its history
+        is loaded and its forecast key computed.
+        """
+        if event_type not in ('storage', 'retrieval', 'both'):
+            raise ValueError("Invalid event type")
+        if horizon is None:
+            raise ValueError("prediction_horizon is required")
+        try:
+            horizon = float(horizon)
+        except (TypeError, ValueError):
+            raise ValueError("prediction_horizon must be a number")
+        if not horizon > 0:
+            raise ValueError("prediction_horizon must be positive")
+
+    @staticmethod
+    def batch_jobs(input_data, specs):
+        """
+        Validates the specs of a batch and returns its forecasts as (algorithm, input data,
+        event type, horizon) tuples, the input data merged with the shared input data.
+        """
+        query = slt_query(input_data)
+        jobs = []
+        for spec in specs:
+            spec_input_data = {**(input_data or {}), **(spec.get('input_data') or {})}
+            if slt_query(spec_input_data) != query:
+                raise ValueError("Batch forecasts can only override model parameters of the shared input data")
+            if spec.get('algorithm') not in TransactionForecastAlgorithm.algorithms:
+                raise ValueError("Invalid algorithm")
+            TransactionForecastAlgorithm.check_request(spec.get('event_type'), spec.get('prediction_horizon', 1))
+            jobs.append((spec['algorithm'], spec_input_data, spec['event_type'], spec.get('prediction_horizon', 1)))
+        return jobs
+
+    @staticmethod
+    def batch_history(input_data, jobs):
+        """
+        Loads the history shared by the forecasts of a batch. It covers the longest lookback of
+        the forecasts, or all events if one has none.
+        """
+        lookbacks = [job_input.get('lookback') for _, job_input, _, _ in jobs]
+        history_input = slt_query(input_data)
+        if lookbacks and None not in lookbacks:
+            history_input['lookback'] = max(float(lookback) for lookback in lookbacks)
+        return TransactionForecastAlgorithm.load_transaction_history(history_input)
+
+    @staticmethod
+    def predict_batch(input_data, specs, states=None, history=None):
+        """
+        Predicts many transaction forecasts over a single history pull. The forecasts are
+        computed on the shared process pool and returned in the order of the specs.
+
+        :param input_data: The input data shared by all forecasts.
+        :type input_data: dict
+        :param specs: Dicts with 'algorithm', 'event_type', 'prediction_horizon' and optional
+            'input_data' holding model parameters that override the shared input data.
+        :type specs: list
+        :param states: Persisted model states of the forecasts (or None), updated in place.
+        :type states: list
+        :param history: The history as returned by batch_history, loaded if not given.
+        :type history: dict
+        :return: Prediction results.
+        :rtype: list
+        """
+        jobs = TransactionForecastAlgorithm.batch_jobs(input_data, specs)
+        states = states or [None] * len(jobs)
+        if history is None:
+            history = TransactionForecastAlgorithm.batch_history(input_data, jobs)
+        # Ship only the event arrays each forecast needs to the workers
+        # (the lookback window is relative to the latest event of both types)
+        histories = [
+            {event_type: history[event_type]} if event_type != 'both' and job_input.get('lookback') is None else history
+            for _, job_input, event_type, _ in jobs
+        ]
+        if len(jobs) < 2:
+            outputs = [_predict_job(*args) for args in zip(jobs, histories, states)]
+        else:
+            outputs = list(get_process_pool().map(_predict_job, jobs, histories, states))
+        # Worker processes return their updated copy of the state
+        for state, (_, updated_state) in zip(states, outputs):
+            if state is not None and updated_state is not state:
+                state.clear()
+                state.update(updated_state)
+        return [forecast for forecast, _ in outputs]
+
+def _predict_job(job, history, state):
+    algorithm, input_data, event_type, horizon = job
+    return TransactionForecastAlgorithm.predict(algorithm, input_data, event_type, horizon, history, state), state
@@ -2,6 +2,8 @@ from flask import Blueprint
 from flask_restx import Api
 
 from .transaction import api_namespace as transaction_namespace
+from .demand import api_namespace as demand_namespace
+from .metrics import api_namespace as metrics_namespace
 
 api_blueprint = Blueprint('api', __name__, url_prefix='/api/v1')
 api = Api(
@@ -11,4 +13,6 @@ api = Api(
     description='A simple API for accessing the Forecasting system.'
 )
 
-api.add_namespace(transaction_namespace)
\ No newline at end of file
+api.add_namespace(transaction_namespace)
+api.add_namespace(demand_namespace)
+api.add_namespace(metrics_namespace)
\ No newline at end of file
@@ -1,36 +1,76 @@
-from flask import Response 
+from flask import Response, stream_with_context
 from flask_restx import Namespace, Resource
 from functools import wraps
+from werkzeug.exceptions import HTTPException
+import json
+import time
+from forecasting import metrics
 
 api_namespace = Namespace('api')
 
 def request_wrapper(func):
     @wraps(func)
     def decorated_function(*args, **kwargs):
-        try:
-            # Assuming 'self' is the first argument for class methods
-            if args and isinstance(args[0], Resource):
-                self = args[0]
-                response = func(self, *args[1:], **kwargs)
-            else:
-                response = func(*args, **kwargs)
+        start = time.perf_counter()
+        profiler = metrics.start_profile()
+        response = handle_request(func, *args, **kwargs)
+        if isinstance(response, Response) and response.is_streamed:
+            response.headers.update(metrics.finish_stream(response, start, profiler))
+            return response
+        status = response.status_code if isinstance(response, Response) else response[1]
+        headers = metrics.finish_request(start, status, profiler)
+        if isinstance(response, Response):
+            response.headers.update(headers)
+            return response
+        return response[0], status, headers
 
-            # Check if the response is already a Flask Response object
-            if isinstance(response, Response):
-                return response
+    return decorated_function
 
-            # If it's a tuple, assume it's (data, status_code, headers)
-            if isinstance(response, tuple):
-                data, status_code, headers = response
-                return self.api.make_response(data, status_code, headers)
+def handle_request(func, *args, **kwargs):
+    try:
+        # Assuming 'self' is the first argument for class methods
+        if args and isinstance(args[0], Resource):
+            self = args[0]
+            response = func(self, *args[1:], **kwargs)
+        else:
+            response = func(*args, **kwargs)
 
-            # Otherwise, assume it's data to be serialized and return it with 200 OK
-            return response, 200
+        # Check if the response is already a Flask Response object
+        if isinstance(response, Response):
+            return response
 
-        except ValueError as e:
-            return {"error": str(e)}, 400
+        # If it's a tuple, assume it's (data, status_code, headers)
+        if isinstance(response, tuple):
+            data, status_code, headers = response
+            return self.api.make_response(data, status_code, headers)
 
-        except Exception as e:
-            return {"error": str(e)}, 500
+        # Otherwise, assume it's data to be serialized and return it with 200 OK
+        return response, 200
 
-    return decorated_function
\ No newline at end of file
+    except HTTPException as e:
+        return {"error": e.description}, e.code
+
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+def stream_json_list(items, serialize, headers=None):
+    """
+    Streams items as a JSON array without building the whole list in memory.
+
+    :param items: The items to stream
+    :type items: iterable
+    :param serialize: Converts an item into a JSON serializable object
+    :type serialize: callable
+    :param headers: Additional response headers
+    :type headers: dict
+    """
+    def generate():
+        yield '['
+        for i, item in enumerate(items):
+            yield (',' if i else '') + json.dumps(serialize(item), default=str)
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json', headers=headers)
\ No newline at end of file
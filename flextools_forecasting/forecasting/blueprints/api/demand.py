@@ -1,60 +1,173 @@
-from flask import request 
-from flask_restx import Namespace, Resource, fields
+import uuid
+from flask import request
+from sqlalchemy import insert
+from flask_restx import Namespace, Resource, fields, marshal
 from forecasting.models import db, DemandForecast
-from .api import request_wrapper
-from forecasting.algorithms.demand import DemandForecastAlgorithm
+from .api import request_wrapper, stream_json_list
+from .transaction import list_parser, parse_list_args, fetch_page
+from . import formats
+from forecasting import metrics
 
 api_namespace = Namespace('demand', description='Demand Forecast operations')
 
-input_data_model = api_namespace.model('InputData', {
-    'item_number': fields.String(description='The item number of the item', required=False),
-    'item_id': fields.String(description='The item id of the item', required=False),
+input_data_model = api_namespace.model('DemandInputData', {
+    'item_number': fields.Raw(description='The item number of the item, or a list of item numbers', required=False),
+    'item_id': fields.Raw(description='The item id of the item, or a list of item ids', required=False),
+    'bucket': fields.Float(description='The length of the demand buckets in hours', required=False, default=24),
+    'lookback': fields.Integer(description='The maximum number of past buckets used', required=False),
+    'window': fields.Integer(description='The number of buckets averaged by moving_average', required=False, default=7),
+    'alpha': fields.Float(description='The smoothing factor of exponential_smoothing', required=False, default=0.3),
     'demand_history': fields.String(description='The demand history of the item', required=False)
 })
 
+demand_prediction_model = api_namespace.model('DemandPrediction', {
+    'forecast': fields.List(fields.Float, description='The predicted demand of each bucket'),
+    'buckets': fields.List(fields.String, description='The start of each forecast bucket'),
+    'confidence_interval': fields.Raw(description='The confidence interval of the forecast', required=False),
+    'parameters': fields.Raw(description='The model parameters and the mean absolute one-step error', required=False)
+})
+
 demand_forecast_model = api_namespace.model('DemandForecast', {
     'id': fields.String(description='The unique identifier of the DemandForecast', readonly=True),
     'timestamp': fields.String(description='The timestamp of the DemandForecast', readonly=True),
-    'input_data': fields.Nested(input_data_model, description='The input data for the forecast', required=False), 
-    #TODO: define the possible types
+    'input_data': fields.Nested(input_data_model, description='The input data for the forecast', required=False),
     'forecast_type': fields.String(description='The type of the forecast', readonly=True, default="demand"),
-    'algorithm': fields.String(description='The algorithm used for the forecast', required=True, default="moving_average"),
+    'algorithm': fields.String(
+        description='The algorithm used for the forecast',
+        required=True,
+        default="moving_average",
+        enum=['moving_average', 'exponential_smoothing']
+    ),
     'algorithm_version': fields.String(description='The version of the algorithm used', required=False, default="v1"),
-    'prediction_horizon': fields.Integer(description='The prediction horizon of the forecast', required=False, default=10),
-    'confidence_interval': fields.String(description='The confidence interval of the forecast', readonly=True),
-    'predicted_demand': fields.String(description='The predicted demand data', readonly=True)
+    'prediction_horizon': fields.Integer(description='The number of buckets to forecast', required=False, default=7),
+    'item_number': fields.String(description='The item number of the forecast item', readonly=True),
+    'item_id': fields.String(description='The item id of the forecast item', readonly=True),
+    'predicted_output': fields.Nested(demand_prediction_model, description='The predicted demand', readonly=True)
 })
 
+demand_forecast_spec_model = api_namespace.model('DemandForecastSpec', {
+    'algorithm': fields.String(
+        description='The algorithm used for the forecast',
+        required=True,
+        default="moving_average",
+        enum=['moving_average', 'exponential_smoothing']
+    ),
+    'prediction_horizon': fields.Integer(description='The number of buckets to forecast', required=False, default=7),
+    'input_data': fields.Raw(description='Model parameters overriding the shared input data', required=False)
+})
+
+batch_demand_forecast_model = api_namespace.model('BatchDemandForecast', {
+    'input_data': fields.Nested(input_data_model, description='The items and model parameters shared by all forecasts', required=True),
+    'forecasts': fields.List(fields.Nested(demand_forecast_spec_model), description='The forecasts to compute', required=True)
+})
+
+demand_list_parser = list_parser.copy()
+demand_list_parser.remove_argument('event_type')
+demand_list_parser.add_argument('item_number', type=str, required=False, help='Only forecasts of this item number', location='query')
+demand_list_parser.add_argument('item_id', type=str, required=False, help='Only forecasts of this item id', location='query')
+
+def insert_forecasts(algorithm, input_data, horizon, prediction):
+    """
+    Bulk inserts one DemandForecast per item of a prediction and returns them as dicts.
+    """
+    key, items, outputs = prediction
+    rows = [
+        {
+            'id': uuid.uuid4(),
+            'input_data': input_data,
+            'algorithm': algorithm,
+            'prediction_horizon': horizon,
+            key: item,
+            **DemandForecast.output_values(output)
+        }
+        for item, output in zip(items, outputs)
+    ]
+    db_forecasts = db.session.scalars(
+        insert(DemandForecast).returning(DemandForecast, sort_by_parameter_order=True),
+        rows
+    ).all()
+    return [db_forecast.to_dict() for db_forecast in db_forecasts]
+
+def forecast_record(result, mimetype):
+    """
+    Returns a forecast dict with its bucket timestamps as epoch microseconds for the binary formats.
+    """
+    if mimetype in formats.BINARY_FORMATS:
+        return {**result, 'predicted_output': DemandForecast.epoch_output(result['predicted_output'])}
+    return result
+
 @api_namespace.route('/', methods=['GET', 'POST'])
 class DemandForecastResource(Resource):
-    @api_namespace.expect(api_namespace.parser().add_argument('id', type=str, required=False, help='The unique identifier of the DemandForecast', location='query'))
-    @api_namespace.marshal_list_with(demand_forecast_model)
+    @api_namespace.expect(demand_list_parser)
+    @api_namespace.response(200, 'Success', [demand_forecast_model], headers={'X-Next-Cursor': 'The cursor of the next page, missing on the last page'})
+    @api_namespace.produces(formats.MEDIA_TYPES)
     @request_wrapper
     def get(self):
         """
-        Returns a list of all DemandForecasts
+        Returns a page of DemandForecasts ordered by creation time
         """
-        return DemandForecast.query.all()
+        mimetype = formats.response_format()
+        filters, limit = parse_list_args(request.args)
+        query = DemandForecast.page_query(
+            algorithm=request.args.get('algorithm'),
+            item_number=request.args.get('item_number'),
+            item_id=request.args.get('item_id'),
+            **filters
+        )
+        rows, cursor = fetch_page(query, limit)
+        headers = {'X-Next-Cursor': cursor} if cursor else {}
+        if mimetype != formats.JSON:
+            records = (row.to_dict(epochs=mimetype in formats.BINARY_FORMATS) for row in rows)
+            return formats.respond(records, mimetype, headers=headers)
+        return stream_json_list(rows, lambda row: marshal(row, demand_forecast_model), headers)
 
     @api_namespace.expect(demand_forecast_model)
-    # @api_namespace.marshal_with(demand_forecast_model)
+    @api_namespace.produces(formats.MEDIA_TYPES)
     @request_wrapper
     def post(self):
         """
-        Creates a new DemandForecast
+        Creates a DemandForecast for each requested item
         """
-        data = request.json
-        forecast = DemandForecastAlgorithm().predict(data['algorithm'], data.get('input_data'))
-        forecast_data = DemandForecast(
-            input_data=data.get('input_data', None),
-            forecast_type='demand',
-            algorithm=data['algorithm'],
-            algorithm_version=data.get('algorithm_version', "v1"),
-            prediction_horizon=data['prediction_horizon'],
-            confidence_interval=data.get('confidence_interval'),
-            predicted_demand=forecast
-        )
-        db.session.add(forecast_data)
-        db.session.commit()
-        db_forecast = DemandForecast.query.get(forecast_data.id)
-        return db_forecast.to_dict()
\ No newline at end of file
+        # The algorithms pull in NumPy, they are imported on first use to keep worker startup fast
+        from forecasting.algorithms.demand import DemandForecastAlgorithm
+
+        mimetype = formats.response_format()
+        data = formats.request_data()
+        algorithm, input_data, horizon = data['algorithm'], data.get('input_data') or {}, data.get('prediction_horizon') or 7
+        metrics.label(algorithm=algorithm, event_type='demand')
+        with metrics.stage('algorithm'):
+            prediction = DemandForecastAlgorithm.predict(algorithm, input_data, horizon)
+        with metrics.stage('db'):
+            results = insert_forecasts(algorithm, input_data, horizon, prediction)
+            db.session.commit()
+        if mimetype != formats.JSON:
+            return formats.respond([forecast_record(result, mimetype) for result in results], mimetype)
+        return results
+
+@api_namespace.route('/batch', methods=['POST'])
+class DemandForecastBatchResource(Resource):
+    @api_namespace.expect(batch_demand_forecast_model)
+    @api_namespace.produces(formats.MEDIA_TYPES)
+    @request_wrapper
+    def post(self):
+        """
+        Creates DemandForecasts for every requested item and many algorithm/parameter combinations over a single history pull
+        """
+        from forecasting.algorithms.demand import DemandForecastAlgorithm
+
+        mimetype = formats.response_format()
+        data = formats.request_data()
+        input_data = data.get('input_data') or {}
+        specs = data.get('forecasts') or []
+        metrics.label(algorithm='batch', event_type='demand')
+        with metrics.stage('algorithm'):
+            predictions = DemandForecastAlgorithm.predict_batch(input_data, specs)
+        results = []
+        with metrics.stage('db'):
+            for spec, prediction in zip(specs, predictions):
+                spec_input = {**input_data, **(spec.get('input_data') or {})}
+                results.extend(insert_forecasts(spec['algorithm'], spec_input, spec.get('prediction_horizon') or 7, prediction))
+            db.session.commit()
+        if mimetype != formats.JSON:
+            return formats.respond([forecast_record(result, mimetype) for result in results], mimetype)
+        return results
@@ -0,0 +1,134 @@
+import json
+from datetime import datetime
+from flask import Response, request, stream_with_context
+from werkzeug.exceptions import NotAcceptable, UnsupportedMediaType
+
+JSON = 'application/json'
+NDJSON = 'application/x-ndjson'
+MSGPACK = 'application/msgpack'
+ARROW = 'application/vnd.apache.arrow.stream'
+MEDIA_TYPES = (JSON, NDJSON, MSGPACK, ARROW)
+# Alternative names of the supported media types
+ALIASES = {
+    'application/x-msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK,
+    'application/vnd.apache.arrow.file': ARROW,
+    'application/jsonl': NDJSON
+}
+# Formats that carry the predicted timestamps as int64 epoch microseconds
+BINARY_FORMATS = (MSGPACK, ARROW)
+
+
+def response_format():
+    """
+    Returns the media type of the response negotiated from the Accept header, JSON by default.
+    """
+    if not request.accept_mimetypes:
+        return JSON
+    best = request.accept_mimetypes.best_match(MEDIA_TYPES + tuple(ALIASES))
+    if best is None:
+        raise NotAcceptable(f"Supported media types are {', '.join(MEDIA_TYPES)}")
+    return ALIASES.get(best, best)
+
+
+def _import_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise NotAcceptable("MessagePack requires the msgpack package")
+    return msgpack
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise NotAcceptable("Arrow IPC requires the pyarrow package")
+    return pyarrow
+
+
+def request_data():
+    """
+    Returns the request body decoded according to its Content-Type (JSON or MessagePack).
+    """
+    mimetype = ALIASES.get(request.mimetype, request.mimetype)
+    if mimetype == MSGPACK:
+        try:
+            import msgpack
+        except ImportError:
+            raise UnsupportedMediaType("MessagePack requires the msgpack package")
+        try:
+            return msgpack.unpackb(request.get_data(), raw=False)
+        except Exception as e:
+            raise ValueError(f"Invalid MessagePack body: {e}")
+    return request.json
+
+
+def _arrow_table(records):
+    """
+    Builds an Arrow table with one row per record. The keys of the predicted output become
+    columns of their own, lists of integers are typed int64 lists and nested objects are
+    JSON encoded.
+    """
+    pa = _import_pyarrow()
+    rows = []
+    for record in records:
+        row = {key: value for key, value in record.items() if key != 'predicted_output'}
+        for key, value in (record.get('predicted_output') or {}).items():
+            row[f'predicted_output.{key}'] = value
+        rows.append(row)
+    names = list(dict.fromkeys(name for row in rows for name in row))
+
+    columns = []
+    for name in names:
+        values = [row.get(name) for row in rows]
+        present = [value for value in values if value is not None]
+        if name == 'timestamp':
+            values = [datetime.fromisoformat(value) if value is not None else None for value in values]
+            columns.append(pa.array(values, pa.timestamp('us', tz='UTC')))
+        elif present and all(isinstance(value, list) and all(type(item) is int for item in value) for value in present):
+            columns.append(pa.array(values, pa.list_(pa.int64())))
+        elif present and all(type(value) is bool for value in present):
+            columns.append(pa.array(values, pa.bool_()))
+        elif present and all(type(value) is int for value in present):
+            columns.append(pa.array(values, pa.int64()))
+        elif present and all(type(value) in (int, float) for value in present):
+            columns.append(pa.array(values, pa.float64()))
+        elif all(value is None or isinstance(value, str) for value in values):
+            columns.append(pa.array(values, pa.string()))
+        else:
+            columns.append(pa.array([json.dumps(value, default=str) for value in values], pa.string()))
+    return pa.Table.from_arrays(columns, names=names)
+
+
+def respond(records, mimetype, many=True, headers=None):
+    """
+    Serializes forecast records in the negotiated format. Records for the binary formats are
+    expected to carry their predicted timestamps as epoch microseconds (see to_dict(epochs=True)).
+
+    :param records: The records, or a single record if `many` is False
+    :type records: iterable
+    :param mimetype: The media type returned by response_format
+    :type mimetype: str
+    :param many: Whether a list of records or a single record is returned
+    :type many: bool
+    :param headers: Additional response headers
+    :type headers: dict
+    """
+    if mimetype == NDJSON:
+        records = records if many else [records]
+        lines = (json.dumps(record, default=str) + '\n' for record in records)
+        return Response(stream_with_context(lines), mimetype=NDJSON, headers=headers)
+    if mimetype == MSGPACK:
+        msgpack = _import_msgpack()
+        body = msgpack.packb(list(records) if many else records, default=str)
+        return Response(body, mimetype=MSGPACK, headers=headers)
+    if mimetype == ARROW:
+        pa = _import_pyarrow()
+        table = _arrow_table(list(records) if many else [records])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), mimetype=ARROW, headers=headers)
+    body = json.dumps(list(records) if many else records, default=str)
+    return Response(body, mimetype=JSON, headers=headers)
@@ -0,0 +1,21 @@
+from flask import Response, request
+from flask_restx import Namespace, Resource
+from forecasting import metrics
+from .api import request_wrapper
+
+api_namespace = Namespace('metrics', description='Service metrics')
+
+metrics_parser = api_namespace.parser()
+metrics_parser.add_argument('per_worker', type=str, required=False, help='Break the metrics down by the pid of the worker process', location='query')
+
+@api_namespace.route('', methods=['GET'])
+class MetricsResource(Resource):
+    @api_namespace.expect(metrics_parser)
+    @api_namespace.produces(['text/plain'])
+    @request_wrapper
+    def get(self):
+        """
+        Returns the request and stage latencies of all workers in the Prometheus text format
+        """
+        per_worker = request.args.get('per_worker', 'false').lower() in ('1', 'true', 'yes')
+        return Response(metrics.expose(per_worker), mimetype='text/plain; version=0.0.4')
@@ -1,8 +1,18 @@
+import json
+import time
+import uuid
+from datetime import datetime, timezone
 from flask import request 
-from flask_restx import Namespace, Resource, fields
-from forecasting.models import db, TransactionForecast 
-from .api import request_wrapper
-from forecasting.algorithms.transaction import TransactionForecastAlgorithm
+from sqlalchemy import insert
+from flask_restx import Namespace, Resource, fields, marshal
+from werkzeug.exceptions import Conflict, NotFound, ServiceUnavailable
+from forecasting.models import db, TransactionForecast, ModelState, ForecastJob, BacktestResult, HotForecast
+from .api import request_wrapper, stream_json_list
+from . import formats
+from forecasting import metrics
+from forecasting.scheduler import tracker, forecast_spec, spec_hash, age
+from forecasting.write_behind import forecast_writer
+from instance import config
 
 api_namespace = Namespace('transaction', description='Transaction Forecast operations')
 
@@ -12,7 +22,9 @@ input_data_model = api_namespace.model('InputData', {
 
 prediction_model = api_namespace.model('Prediction', {
     'next_transaction': fields.String(description='The next transaction', required=True),
-    'confidence_interval': fields.String(description='The confidence interval of the forecast', required=False)
+    'confidence_interval': fields.Raw(description='The confidence interval of the forecast', required=False),
+    'parameters': fields.Raw(description='The model parameters used for the forecast', required=False),
+    'counts': fields.Raw(description='The bucket starts and the number of events per bucket of the horizon, with output=counts or seasonal_poisson', required=False)
 })
 
 transaction_forecast_model = api_namespace.model('TransactionForecast', {
@@ -24,7 +36,7 @@ transaction_forecast_model = api_namespace.model('TransactionForecast', {
         description='The algorithm used for the forecast',
         required=True,
         default="poisson_process",
-        enum=['poisson_process', 'exponential_smoothing']
+        enum=['poisson_process', 'exponential_smoothing', 'holt_winters', 'seasonal_poisson', 'auto']
     ),
     'algorithm_version': fields.String(description='The version of the algorithm used', readonly=False, default="v1"),
     'prediction_horizon': fields.Integer(description='The prediction horizon of the forecast', readonly=False, default=10),
@@ -37,33 +49,535 @@ transaction_forecast_model = api_namespace.model('TransactionForecast', {
     )
 })
 
+forecast_spec_model = api_namespace.model('ForecastSpec', {
+    'algorithm': fields.String(
+        description='The algorithm used for the forecast',
+        required=True,
+        default="poisson_process",
+        enum=['poisson_process', 'exponential_smoothing', 'holt_winters', 'seasonal_poisson', 'auto']
+    ),
+    'event_type': fields.String(
+        description='The type of event to forecast',
+        required=True,
+        default="both",
+        enum=['storage', 'retrieval', 'both']
+    ),
+    'prediction_horizon': fields.Integer(description='The prediction horizon of the forecast', required=False, default=1),
+    'input_data': fields.Raw(description='Model parameters overriding the shared input data', required=False)
+})
+
+batch_forecast_model = api_namespace.model('BatchForecast', {
+    'input_data': fields.Nested(input_data_model, description='The input data shared by all forecasts', required=False),
+    'forecasts': fields.List(fields.Nested(forecast_spec_model), description='The forecasts to compute', required=True)
+})
+
+forecast_job_model = api_namespace.model('ForecastJob', {
+    'id': fields.String(description='The unique identifier of the ForecastJob', readonly=True),
+    'status': fields.String(description='The status of the job', readonly=True, enum=['queued', 'running', 'succeeded', 'failed', 'cancelled']),
+    'request': fields.Raw(description='The posted forecast', readonly=True),
+    'forecast_id': fields.String(description='The id of the created TransactionForecast', readonly=True),
+    'error': fields.String(description='The error of a failed job', readonly=True),
+    'created_at': fields.String(description='The time the job was queued', readonly=True),
+    'started_at': fields.String(description='The time the job started running', readonly=True),
+    'finished_at': fields.String(description='The time the job finished', readonly=True),
+    'forecast': fields.Nested(transaction_forecast_model, description='The forecast of a succeeded job', readonly=True)
+})
+
+backtest_candidate_model = api_namespace.model('BacktestCandidate', {
+    'algorithm': fields.String(description='The algorithm', required=True, enum=['poisson_process', 'exponential_smoothing', 'holt_winters', 'seasonal_poisson']),
+    'input_data': fields.Raw(description='The model parameters', required=False)
+})
+
+backtest_model = api_namespace.model('Backtest', {
+    'input_data': fields.Nested(input_data_model, description='The input data of the backtested history', required=False),
+    'event_type': fields.String(description='The type of event to forecast', required=True, default="both", enum=['storage', 'retrieval', 'both']),
+    'prediction_horizon': fields.Float(description='The forecast horizon in hours', required=True, default=24),
+    'origins': fields.Integer(description='The number of rolling forecast origins', required=False),
+    'step': fields.Float(description='The hours between two origins, by default the horizon', required=False),
+    'bucket': fields.Float(description='The length of the scored count buckets in hours, by default the horizon', required=False),
+    'candidates': fields.List(fields.Nested(backtest_candidate_model), description='The candidates to score, by default every algorithm with its configured parameter sets', required=False)
+})
+
+backtest_result_model = api_namespace.model('BacktestResult', {
+    'id': fields.String(description='The unique identifier of the BacktestResult', readonly=True),
+    'created_at': fields.String(description='The time of the backtest', readonly=True),
+    'input_data': fields.Raw(description='The input data of the backtested history', readonly=True),
+    'event_type': fields.String(description='The backtested event type', readonly=True),
+    'prediction_horizon': fields.Float(description='The forecast horizon in hours', readonly=True),
+    'bucket': fields.Float(description='The length of the scored count buckets in hours', readonly=True),
+    'origins': fields.List(fields.String, description='The forecast origins', readonly=True),
+    'scores': fields.Raw(description='The candidates with their mae, rmse, bias and failures, best first', readonly=True),
+    'algorithm': fields.String(description='The algorithm of the best candidate, used by algorithm=auto', readonly=True),
+    'parameters': fields.Raw(description='The model parameters of the best candidate', readonly=True)
+})
+
+list_parser = api_namespace.parser()
+list_parser.add_argument('id', type=str, required=False, help='The unique identifier of the Transaction Forecast', location='query')
+list_parser.add_argument('algorithm', type=str, required=False, help='Only forecasts of this algorithm', location='query')
+list_parser.add_argument('event_type', type=str, required=False, help='Only forecasts of this event type', location='query')
+list_parser.add_argument('since', type=str, required=False, help='Only forecasts created at or after this ISO 8601 time', location='query')
+list_parser.add_argument('until', type=str, required=False, help='Only forecasts created before this ISO 8601 time', location='query')
+list_parser.add_argument('cursor', type=str, required=False, help='The X-Next-Cursor header of the previous page', location='query')
+list_parser.add_argument('limit', type=int, required=False, help='The maximum number of forecasts per page', location='query')
+
+job_parser = api_namespace.parser()
+job_parser.add_argument('async', type=str, required=False, help='Queue a ForecastJob and return it instead of waiting for the forecast', location='query')
+
+latest_parser = api_namespace.parser()
+latest_parser.add_argument('algorithm', type=str, required=True, help='The algorithm of the forecast', location='query')
+latest_parser.add_argument('event_type', type=str, required=False, help='The event type of the forecast (default both)', location='query')
+latest_parser.add_argument('prediction_horizon', type=float, required=True, help='The prediction horizon of the forecast', location='query')
+latest_parser.add_argument('input_data', type=str, required=False, help='The input data of the forecast as JSON', location='query')
+
+job_wait_parser = api_namespace.parser()
+job_wait_parser.add_argument('wait', type=float, required=False, help='Seconds to wait for the job to finish before returning it', location='query')
+
+def parse_list_args(args):
+    """
+    Parses the filter and pagination query parameters of the forecast listings.
+    """
+    try:
+        limit = int(args.get('limit', config.FORECAST_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 0 < limit <= config.FORECAST_PAGE_SIZE_MAX:
+        raise ValueError(f"limit must be between 1 and {config.FORECAST_PAGE_SIZE_MAX}")
+    return {
+        'id': uuid.UUID(args['id']) if args.get('id') else None,
+        'since': datetime.fromisoformat(args['since']) if args.get('since') else None,
+        'until': datetime.fromisoformat(args['until']) if args.get('until') else None,
+        'cursor': args.get('cursor') or None
+    }, limit
+
+def fetch_page(query, limit):
+    """
+    Returns a page of the keyset query and the cursor of the next page, None on the last page.
+    A single query reads one row past the page to tell whether another page follows. The page
+    is read before the response is streamed, because the cursor is sent as a header.
+    """
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].cursor()
+    return rows, None
+
+def forecast_record(result, mimetype):
+    """
+    Returns a forecast dict with its predicted timestamps as epoch microseconds for the binary formats.
+    """
+    if mimetype in formats.BINARY_FORMATS:
+        return {**result, 'predicted_output': TransactionForecast.epoch_output(result['predicted_output'])}
+    return result
+
+def resolve_auto(algorithm, input_data, event_type):
+    """
+    Replaces algorithm=auto with the best candidate of the latest backtest of the query and
+    event type, its model parameters override those of the input data.
+
+    :return: The algorithm and input data
+    :rtype: tuple
+    """
+    if algorithm != 'auto':
+        return algorithm, input_data
+    from forecasting.algorithms.transaction import digest, slt_query
+    with metrics.stage('db'):
+        result = BacktestResult.latest(digest(slt_query(input_data)), event_type)
+    if result is None:
+        raise ValueError("algorithm=auto requires a backtest of this input data and event type, see /transaction/backtest")
+    return result.algorithm, {**(input_data or {}), **(result.parameters or {})}
+
+def run_backtest(data):
+    """
+    Backtests the algorithms on the history of the input data and stores the result.
+    Used by the backtest endpoint and backtest.py.
+
+    :param data: The input_data, event_type, prediction_horizon and optional origins, step,
+        bucket and candidates of the backtest
+    :type data: dict
+    :return: The stored BacktestResult
+    :rtype: dict
+    """
+    from forecasting.algorithms.backtest import backtest
+    from forecasting.algorithms.transaction import TransactionForecastAlgorithm, digest, slt_query
+    input_data, event_type = data.get('input_data') or {}, data.get('event_type')
+    if not data.get('prediction_horizon'):
+        raise ValueError("prediction_horizon is required")
+    metrics.label(algorithm='backtest', event_type=event_type)
+    history = TransactionForecastAlgorithm.load_transaction_history(input_data)
+    with metrics.stage('algorithm'):
+        result = backtest(
+            history, event_type, data['prediction_horizon'],
+            data.get('origins'), data.get('bucket'), data.get('step'), data.get('candidates')
+        )
+    best = next((score for score in result['scores'] if not score['failures'] and score['mae'] is not None), None)
+    with metrics.stage('db'):
+        backtest_result = BacktestResult(
+            query_hash=digest(slt_query(input_data)),
+            input_data=input_data,
+            event_type=event_type,
+            prediction_horizon=float(data['prediction_horizon']),
+            bucket=result['bucket'],
+            origins=result['origins'],
+            scores=result['scores'],
+            algorithm=best['algorithm'] if best else None,
+            parameters=best['input_data'] if best else None
+        )
+        db.session.add(backtest_result)
+        db.session.commit()
+        return backtest_result.to_dict()
+
+def find_forecasts(forecast_keys):
+    """
+    Returns the stored forecasts of the forecast keys from the forecast cache, or else the
+    latest one of each key in the database.
+
+    :param forecast_keys: The keys as returned by TransactionForecastAlgorithm.forecast_key
+    :type forecast_keys: list
+    :return: The forecasts as dicts keyed by forecast key, keys without a forecast are missing
+    :rtype: dict
+    """
+    from forecasting.algorithms.transaction import forecast_cache
+    found = {}
+    for forecast_key in forecast_keys:
+        cached = forecast_cache.get(forecast_key)
+        if cached is not None:
+            found[forecast_key] = cached
+    missing = {forecast_key for forecast_key in forecast_keys if forecast_key not in found}
+    if missing:
+        with metrics.stage('db'):
+            db_forecasts = TransactionForecast.query.filter(
+                TransactionForecast.forecast_key.in_(missing)
+            ).order_by(TransactionForecast.timestamp).all()
+        # Ordered by creation time, the latest forecast of a key wins
+        for db_forecast in db_forecasts:
+            found[db_forecast.forecast_key] = db_forecast.to_dict()
+        for forecast_key in missing & found.keys():
+            forecast_cache.put(forecast_key, found[forecast_key])
+    for forecast_key in forecast_keys:
+        metrics.forecast_cache_lookups.inc(result='hit' if forecast_key in found else 'miss')
+    return found
+
+def create_forecast(data, write_behind=None):
+    """
+    Creates a TransactionForecast for a posted forecast, or returns the stored one if the same
+    forecast was already made over the same history. Used by the POST endpoint and run_jobs.py.
+
+    :param data: The algorithm, input_data, event_type and prediction_horizon of the forecast
+    :type data: dict
+    :param write_behind: Return the forecast before it is inserted by the write-behind buffer
+        (default WRITE_BEHIND). Callers that pass its id on must not set it.
+    :type write_behind: bool
+    :return: The forecast with a 'cache_hit' flag
+    :rtype: dict
+    """
+    # The algorithms pull in NumPy, they are imported on first use to keep worker startup fast
+    from forecasting.algorithms.transaction import TransactionForecastAlgorithm, forecast_cache
+    algorithm, input_data, event_type, horizon = data['algorithm'], data.get('input_data'), data.get('event_type'), data.get('prediction_horizon')
+    TransactionForecastAlgorithm.check_request(event_type, horizon)
+    algorithm, input_data = resolve_auto(algorithm, input_data, event_type)
+    if algorithm not in TransactionForecastAlgorithm.algorithms:
+        raise ValueError("Invalid algorithm")
+    metrics.label(algorithm=algorithm, event_type=event_type)
+    history = TransactionForecastAlgorithm.load_transaction_history(input_data)
+
+    # Identical requests over the same history are answered with the stored forecast
+    forecast_key = TransactionForecastAlgorithm.forecast_key(algorithm, input_data, event_type, horizon, history)
+    cached = find_forecasts([forecast_key]).get(forecast_key)
+    if cached is not None:
+        return {**cached, 'cache_hit': True}
+
+    input_data = TransactionForecastAlgorithm.seeded_input_data(algorithm, input_data, forecast_key)
+    state_key = TransactionForecastAlgorithm.state_key(algorithm, input_data, event_type)
+    with metrics.stage('db'):
+        state = ModelState.load(state_key) if state_key else None
+    with metrics.stage('algorithm'):
+        forecast = TransactionForecastAlgorithm().predict(algorithm, input_data, event_type, horizon, history, state)
+    with metrics.stage('db'):
+        if state_key:
+            ModelState.save(state_key, state)
+        row = {
+            'id': uuid.uuid4(),
+            'input_data': input_data,
+            'algorithm': algorithm,
+            'event_type': data['event_type'],
+            'forecast_key': forecast_key,
+            **TransactionForecast.output_values(forecast)
+        }
+        if config.WRITE_BEHIND if write_behind is None else write_behind:
+            row['timestamp'] = datetime.now(timezone.utc)
+            result = TransactionForecast(**row).to_dict()
+            if state_key:
+                db.session.commit()
+            forecast_writer.put(row)
+        else:
+            # RETURNING yields the server timestamp without reading the row back
+            db_forecast = db.session.scalars(
+                insert(TransactionForecast).returning(TransactionForecast),
+                [row]
+            ).one()
+            result = db_forecast.to_dict()
+            db.session.commit()
+    forecast_cache.put(forecast_key, result)
+    return {**result, 'cache_hit': False}
+
+def queue_forecast(data):
+    """
+    Queues a ForecastJob for a posted forecast and returns it as a dict.
+    """
+    from forecasting.algorithms.transaction import TransactionForecastAlgorithm
+    if data.get('algorithm') != 'auto' and data.get('algorithm') not in TransactionForecastAlgorithm.algorithms:
+        raise ValueError("Invalid algorithm")
+    TransactionForecastAlgorithm.check_request(data.get('event_type'), data.get('prediction_horizon'))
+    with metrics.stage('db'):
+        if ForecastJob.pending_count() >= config.JOB_QUEUE_LIMIT:
+            raise ServiceUnavailable(f"The job queue is full ({config.JOB_QUEUE_LIMIT} pending jobs), retry later")
+        job = ForecastJob(request={key: data.get(key) for key in ('algorithm', 'input_data', 'event_type', 'prediction_horizon')})
+        db.session.add(job)
+        db.session.commit()
+    return job.to_dict()
+
 @api_namespace.route('/', methods=['GET', 'POST'])
 class TransactionForecastResource(Resource):
-    @api_namespace.expect(api_namespace.parser().add_argument('id', type=str, required=False, help='The unique identifier of the Transaction Forecast', location='query'))
-    @api_namespace.marshal_list_with(transaction_forecast_model)
+    @api_namespace.expect(list_parser)
+    @api_namespace.response(200, 'Success', [transaction_forecast_model], headers={'X-Next-Cursor': 'The cursor of the next page, missing on the last page'})
+    @api_namespace.produces(formats.MEDIA_TYPES)
     @request_wrapper
     def get(self):
         """
-        Returns a list of all DemandForecasts
+        Returns a page of TransactionForecasts ordered by creation time
         """
-        return TransactionForecast.query.all()
+        mimetype = formats.response_format()
+        filters, limit = parse_list_args(request.args)
+        query = TransactionForecast.page_query(
+            algorithm=request.args.get('algorithm'),
+            event_type=request.args.get('event_type'),
+            **filters
+        )
+        rows, cursor = fetch_page(query, limit)
+        headers = {'X-Next-Cursor': cursor} if cursor else {}
+        if mimetype != formats.JSON:
+            records = (row.to_dict(epochs=mimetype in formats.BINARY_FORMATS) for row in rows)
+            return formats.respond(records, mimetype, headers=headers)
+        return stream_json_list(rows, lambda row: marshal(row, transaction_forecast_model), headers)
 
-    @api_namespace.expect(transaction_forecast_model)
+    @api_namespace.expect(transaction_forecast_model, job_parser)
     # @api_namespace.marshal_with(transaction_forecast_model)
+    @api_namespace.response(202, 'Job queued', forecast_job_model, headers={'Location': 'The URL of the job'})
+    @api_namespace.produces(formats.MEDIA_TYPES)
     @request_wrapper
     def post(self):
         """
-        Creates a new TransactionForecast 
+        Creates a new TransactionForecast, or queues a ForecastJob creating it with ?async=true
         """
-        data = request.json
-        forecast = TransactionForecastAlgorithm().predict(data['algorithm'], data.get('input_data'), data.get('event_type'), data.get('prediction_horizon'))
-        forecast_data = TransactionForecast(
-            input_data=data.get('input_data'),
-            algorithm=data['algorithm'],
-            event_type=data['event_type'],
-            predicted_output=forecast  
-        )
-        db.session.add(forecast_data)
-        db.session.commit()
-        db_forecast = TransactionForecast.query.get(forecast_data.id)
-        return db_forecast.to_dict()
\ No newline at end of file
+        mimetype = formats.response_format()
+        data = formats.request_data()
+        if request.args.get('async', 'false').lower() in ('1', 'true', 'yes'):
+            job = queue_forecast(data)
+            tracker.record(forecast_spec(data))
+            headers = {'Location': self.api.url_for(ForecastJobResource, id=job['id'])}
+            if mimetype != formats.JSON:
+                response = formats.respond(job, mimetype, many=False, headers=headers)
+                response.status_code = 202
+                return response
+            return job, 202, headers
+        result = create_forecast(data)
+        tracker.record(forecast_spec(data))
+        return result if mimetype == formats.JSON else formats.respond(forecast_record(result, mimetype), mimetype, many=False)
+
+@api_namespace.route('/latest', methods=['GET'])
+class LatestTransactionForecastResource(Resource):
+    @api_namespace.expect(latest_parser)
+    @api_namespace.response(200, 'Success', transaction_forecast_model, headers={'Age': 'Seconds since the forecast was made'})
+    @api_namespace.produces(formats.MEDIA_TYPES)
+    @request_wrapper
+    def get(self):
+        """
+        Returns the latest precomputed TransactionForecast of a spec, computing it if the spec is not hot yet
+        """
+        from forecasting.algorithms.transaction import TransactionForecastAlgorithm
+        mimetype = formats.response_format()
+        try:
+            input_data = json.loads(request.args.get('input_data') or '{}')
+        except ValueError:
+            raise ValueError("input_data must be JSON")
+        horizon = request.args.get('prediction_horizon') or None
+        TransactionForecastAlgorithm.check_request(request.args.get('event_type', 'both'), horizon)
+        spec = forecast_spec({
+            'algorithm': request.args.get('algorithm'),
+            'input_data': input_data,
+            'event_type': request.args.get('event_type', 'both'),
+            'prediction_horizon': horizon
+        })
+        with metrics.stage('db'):
+            # Primary key lookups only, the scheduler keeps forecast_id up to date
+            row = db.session.query(TransactionForecast, HotForecast.refreshed_at).join(
+                HotForecast, HotForecast.forecast_id == TransactionForecast.id
+            ).filter(HotForecast.spec_hash == spec_hash(spec)).first()
+        if row is not None:
+            forecast, refreshed_at = row
+            result = {**forecast.to_dict(), 'precomputed': True, 'refreshed_at': refreshed_at.isoformat(), 'age': age(forecast.timestamp)}
+        else:
+            result = {**create_forecast(spec), 'precomputed': False}
+            result['age'] = age(datetime.fromisoformat(result['timestamp']))
+        tracker.record(spec)
+        headers = {'Age': str(max(int(result['age']), 0))}
+        if mimetype != formats.JSON:
+            return formats.respond(forecast_record(result, mimetype), mimetype, many=False, headers=headers)
+        return result, 200, headers
+
+@api_namespace.route('/batch', methods=['POST'])
+class TransactionForecastBatchResource(Resource):
+    @api_namespace.expect(batch_forecast_model)
+    @api_namespace.produces(formats.MEDIA_TYPES)
+    @request_wrapper
+    def post(self):
+        """
+        Creates TransactionForecasts for many algorithm/event type/horizon combinations over a single history pull.
+        Forecasts that were already made over the same history are returned from the store.
+        """
+        from forecasting.algorithms.transaction import TransactionForecastAlgorithm, forecast_cache
+        mimetype = formats.response_format()
+        data = formats.request_data()
+        input_data = data.get('input_data')
+        specs = data.get('forecasts') or []
+        for index, spec in enumerate(specs):
+            algorithm, spec_input = resolve_auto(spec.get('algorithm'), {**(input_data or {}), **(spec.get('input_data') or {})}, spec.get('event_type'))
+            specs[index] = {**spec, 'algorithm': algorithm, 'input_data': spec_input}
+        metrics.label(algorithm='batch', event_type='batch')
+        jobs = TransactionForecastAlgorithm.batch_jobs(input_data, specs)
+        history = TransactionForecastAlgorithm.batch_history(input_data, jobs)
+
+        # Memoized like single forecasts, identical forecasts of the batch are computed once
+        forecast_keys = [TransactionForecastAlgorithm.forecast_key(*job, history) for job in jobs]
+        found = find_forecasts(forecast_keys)
+        pending = {}
+        for index, forecast_key in enumerate(forecast_keys):
+            if forecast_key not in found:
+                pending.setdefault(forecast_key, index)
+        pending_specs = [
+            {**specs[index], 'input_data': TransactionForecastAlgorithm.seeded_input_data(jobs[index][0], jobs[index][1], forecast_key)}
+            for forecast_key, index in pending.items()
+        ]
+        state_keys = [
+            TransactionForecastAlgorithm.state_key(spec['algorithm'], spec['input_data'], spec['event_type'])
+            for spec in pending_specs
+        ]
+        with metrics.stage('db'):
+            states = [ModelState.load(state_key) if state_key else None for state_key in state_keys]
+        with metrics.stage('algorithm'):
+            forecasts = TransactionForecastAlgorithm.predict_batch(input_data, pending_specs, states, history) if pending_specs else []
+        rows = [
+            {
+                'id': uuid.uuid4(),
+                'input_data': spec['input_data'],
+                'algorithm': spec['algorithm'],
+                'event_type': spec['event_type'],
+                'forecast_key': forecast_key,
+                **TransactionForecast.output_values(forecast)
+            }
+            for forecast_key, spec, forecast in zip(pending, pending_specs, forecasts)
+        ]
+        created = {}
+        with metrics.stage('db'):
+            for state_key, state in zip(state_keys, states):
+                if state_key:
+                    ModelState.save(state_key, state)
+            if rows:
+                db_forecasts = db.session.scalars(
+                    insert(TransactionForecast).returning(TransactionForecast, sort_by_parameter_order=True),
+                    rows
+                ).all()
+                created = {db_forecast.forecast_key: db_forecast.to_dict() for db_forecast in db_forecasts}
+            db.session.commit()
+        for forecast_key, result in created.items():
+            forecast_cache.put(forecast_key, result)
+        results = [
+            {**found[forecast_key], 'cache_hit': True} if forecast_key in found else {**created[forecast_key], 'cache_hit': False}
+            for forecast_key in forecast_keys
+        ]
+        if mimetype != formats.JSON:
+            return formats.respond([forecast_record(result, mimetype) for result in results], mimetype)
+        return results
+
+@api_namespace.route('/jobs/<string:id>', methods=['GET', 'DELETE'])
+class ForecastJobResource(Resource):
+    @api_namespace.expect(job_wait_parser)
+    @api_namespace.response(200, 'Success', forecast_job_model)
+    @api_namespace.produces(formats.MEDIA_TYPES)
+    @request_wrapper
+    def get(self, id):
+        """
+        Returns a ForecastJob with its forecast once it succeeded. With ?wait=<seconds> the
+        request is held until the job finished or the time is up.
+        """
+        mimetype = formats.response_format()
+        try:
+            job_id = uuid.UUID(id)
+            wait = min(float(request.args.get('wait', 0)), config.JOB_MAX_WAIT)
+        except ValueError:
+            raise ValueError("Invalid job id or wait")
+        deadline = time.monotonic() + wait
+        while True:
+            with metrics.stage('db'):
+                job = db.session.get(ForecastJob, job_id)
+                if job is None:
+                    raise NotFound(f"ForecastJob {id} not found")
+                result = job.to_dict()
+                # Release the connection while waiting
+                db.session.rollback()
+            if result['status'] not in ForecastJob.PENDING or time.monotonic() >= deadline:
+                break
+            time.sleep(min(config.JOB_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+        if result['forecast_id']:
+            with metrics.stage('db'):
+                forecast = db.session.get(TransactionForecast, uuid.UUID(result['forecast_id']))
+            result['forecast'] = forecast_record(forecast.to_dict(), mimetype) if forecast is not None else None
+        return result if mimetype == formats.JSON else formats.respond(result, mimetype, many=False)
+
+    @api_namespace.response(200, 'Cancelled', forecast_job_model)
+    @api_namespace.response(409, 'The job already finished')
+    @request_wrapper
+    def delete(self, id):
+        """
+        Cancels a queued or running ForecastJob
+        """
+        try:
+            job_id = uuid.UUID(id)
+        except ValueError:
+            raise ValueError("Invalid job id")
+        with metrics.stage('db'):
+            cancelled = ForecastJob.cancel(job_id)
+            job = db.session.get(ForecastJob, job_id)
+        if job is None:
+            raise NotFound(f"ForecastJob {id} not found")
+        if not cancelled:
+            raise Conflict(f"ForecastJob {id} already {job.status}")
+        return job.to_dict()
+
+@api_namespace.route('/backtest', methods=['POST'])
+class BacktestResource(Resource):
+    @api_namespace.expect(backtest_model)
+    @api_namespace.response(200, 'Success', backtest_result_model)
+    @request_wrapper
+    def post(self):
+        """
+        Backtests the algorithms with rolling forecast origins, the best candidate becomes the model of algorithm=auto
+        """
+        return run_backtest(formats.request_data())
+
+@api_namespace.route('/backtest/<string:id>', methods=['GET'])
+class BacktestResultResource(Resource):
+    @api_namespace.response(200, 'Success', backtest_result_model)
+    @request_wrapper
+    def get(self, id):
+        """
+        Returns a BacktestResult
+        """
+        try:
+            result_id = uuid.UUID(id)
+        except ValueError:
+            raise ValueError("Invalid backtest id")
+        with metrics.stage('db'):
+            result = db.session.get(BacktestResult, result_id)
+        if result is None:
+            raise NotFound(f"BacktestResult {id} not found")
+        return result.to_dict()
\ No newline at end of file
@@ -0,0 +1,106 @@
+import multiprocessing
+import time
+import uuid
+from forecasting.models import db, ForecastJob
+from instance import config
+
+
+def _run_job(app, job_id, request):
+    """
+    Runs a claimed job in a forked child process and records its result.
+    """
+    from forecasting.blueprints.api.transaction import create_forecast
+    with app.app_context():
+        # The connections of the parent must not be shared with the child
+        db.engine.dispose(close=False)
+        try:
+            result = create_forecast(request, write_behind=False)
+            values = {'forecast_id': uuid.UUID(result['id'])}
+            status = ForecastJob.SUCCEEDED
+        except Exception as e:
+            db.session.rollback()
+            values = {'error': str(e)}
+            status = ForecastJob.FAILED
+        ForecastJob.finish(job_id, status, **values)
+        db.session.commit()
+
+
+class JobRunner:
+    """
+    Runs the queued ForecastJobs with up to `workers` forecasts at a time.
+
+    Each job runs in its own child process forked from the warmed up runner, so that a job that
+    is cancelled or exceeds the timeout can be terminated. Jobs are claimed from the database,
+    any number of runners can share the queue.
+
+    :param app: The Flask app
+    :type app: flask.Flask
+    :param workers: The maximum number of concurrently running jobs
+    :type workers: int
+    :param timeout: Seconds after which a running job is terminated and failed
+    :type timeout: float
+    """
+    def __init__(self, app, workers=2, timeout=600):
+        self.app = app
+        self.workers = workers
+        self.timeout = timeout
+        self.context = multiprocessing.get_context('fork')
+        # Running jobs by id: (process, deadline)
+        self.running = {}
+
+    def start_jobs(self):
+        while len(self.running) < self.workers:
+            job = ForecastJob.claim()
+            if job is None:
+                return
+            process = self.context.Process(target=_run_job, args=(self.app, job.id, job.request), daemon=True)
+            process.start()
+            self.running[job.id] = (process, time.monotonic() + self.timeout)
+
+    def check_jobs(self):
+        """
+        Reaps finished children and terminates the ones that were cancelled or timed out.
+        """
+        if not self.running:
+            return
+        statuses = dict(db.session.execute(
+            db.select(ForecastJob.id, ForecastJob.status).where(ForecastJob.id.in_(list(self.running)))
+        ).all())
+        db.session.rollback()
+        for job_id, (process, deadline) in list(self.running.items()):
+            if not process.is_alive():
+                process.join()
+                # A no-op if the job recorded its result
+                ForecastJob.finish(job_id, ForecastJob.FAILED, error=f"The job process exited with code {process.exitcode}")
+                db.session.commit()
+            elif statuses.get(job_id) != ForecastJob.RUNNING:
+                # Cancelled, or expired by another runner
+                process.terminate()
+                process.join()
+            elif time.monotonic() > deadline:
+                process.terminate()
+                process.join()
+                ForecastJob.finish(job_id, ForecastJob.FAILED, error=f"Timed out after {self.timeout:g} seconds")
+                db.session.commit()
+            else:
+                continue
+            del self.running[job_id]
+
+    def run(self, once=False):
+        """
+        Runs jobs until interrupted, or until the queue is drained if `once` is set.
+        """
+        with self.app.app_context():
+            try:
+                while True:
+                    # Jobs left running by a crashed runner
+                    ForecastJob.expire(self.timeout)
+                    self.check_jobs()
+                    self.start_jobs()
+                    if once and not self.running:
+                        return
+                    time.sleep(config.JOB_POLL_INTERVAL)
+            finally:
+                for process, _ in self.running.values():
+                    process.terminate()
+                ForecastJob.requeue(list(self.running))
@@ -0,0 +1,391 @@
+import atexit
+import bisect
+import cProfile
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from instance import config
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Upper bounds of the history size label in events
+HISTORY_SIZE_BUCKETS = (1000, 10000, 100000, 1000000, 10000000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        """
+        Returns a copy of the values of this process by label values.
+        """
+        with self._lock:
+            return {key: self.copy(value) for key, value in self._values.items()}
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def expose(self, values, labelnames=None):
+        """
+        Returns the exposition lines of values by label values, e.g. merged from all processes.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, value in sorted(values.items()):
+            lines.extend(self.samples(key, value, labelnames or self.labelnames))
+        return lines
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count per label combination.
+
+    :param name: The metric name
+    :type name: str
+    :param documentation: The help text of the metric
+    :type documentation: str
+    :param labelnames: The names of the labels
+    :type labelnames: tuple
+    """
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    @staticmethod
+    def copy(value):
+        return value
+
+    @staticmethod
+    def merge(value, other):
+        return value + other
+
+    def samples(self, key, value, labelnames):
+        return [f"{self.name}{_format_labels(labelnames, key)} {value}"]
+
+
+class Histogram(_Metric):
+    """
+    Counts observations into cumulative buckets per label combination.
+
+    :param name: The metric name
+    :type name: str
+    :param documentation: The help text of the metric
+    :type documentation: str
+    :param labelnames: The names of the labels
+    :type labelnames: tuple
+    :param buckets: The sorted upper bounds of the buckets
+    :type buckets: tuple
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @staticmethod
+    def copy(value):
+        return [list(value[0]), value[1]]
+
+    @staticmethod
+    def merge(value, other):
+        return [[count + other_count for count, other_count in zip(value[0], other[0])], value[1] + other[1]]
+
+    def samples(self, key, value, labelnames):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = 'le="{}"'.format('+Inf' if bound == math.inf else float(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsStore:
+    """
+    Shares the metrics of all processes of the service through a directory, so that a scrape
+    answered by any gunicorn worker returns the totals of the service.
+
+    Every process writes its values to a file of its own at most every `interval` seconds, before
+    a scrape and when it exits. A scrape sums the files of all processes. The files of recycled
+    workers are kept, so the totals do not reset when a worker is replaced. The directory must be
+    emptied when the service starts, see entrypoint.sh.
+
+    :param directory: The shared directory
+    :type directory: str
+    :param interval: Seconds between two writes of the values of a process
+    :type interval: float
+    """
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self.written_at = 0
+        self._path = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.write)
+
+    def path(self):
+        # A new process gets a new file, even if it reuses the pid of a recycled worker
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, f"{self._pid}-{uuid.uuid4().hex[:8]}.json")
+        return self._path
+
+    def write(self):
+        """
+        Writes the values of this process, replacing the file atomically.
+        """
+        with self._lock:
+            # Snapshots are taken under the lock, so an older snapshot never replaces a newer one
+            values = {metric.name: [[list(key), value] for key, value in metric.snapshot().items()] for metric in REGISTRY}
+            if not any(values.values()):
+                return
+            path = self.path()
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path + '.tmp', 'w') as file:
+                json.dump(values, file)
+            os.replace(path + '.tmp', path)
+            self.written_at = time.monotonic()
+
+    def maybe_write(self):
+        """
+        Writes the values of this process if the last write is older than `interval` seconds.
+        """
+        if time.monotonic() - self.written_at >= self.interval:
+            self.write()
+
+    def read(self):
+        """
+        Returns the values of all processes by pid and metric name.
+        """
+        processes = {}
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else ():
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as file:
+                    values = json.load(file)
+            except (OSError, ValueError):
+                continue
+            process = processes.setdefault(name.split('-')[0], {})
+            for metric in REGISTRY:
+                merged = process.setdefault(metric.name, {})
+                for key, value in values.get(metric.name, []):
+                    key = tuple(key)
+                    merged[key] = metric.merge(merged[key], value) if key in merged else value
+        return processes
+
+
+request_duration = Histogram(
+    'forecasting_request_duration_seconds',
+    'Latency of the API requests',
+    ('endpoint', 'method', 'status')
+)
+stage_duration = Histogram(
+    'forecasting_stage_duration_seconds',
+    'Latency of the stages of a forecast request',
+    ('stage', 'algorithm', 'event_type', 'history_size')
+)
+forecast_cache_lookups = Counter(
+    'forecasting_forecast_cache_lookups_total',
+    'Lookups of memoized forecasts',
+    ('result',)
+)
+write_behind_rows = Counter(
+    'forecasting_write_behind_rows_total',
+    'Forecast rows passed through the write-behind buffer',
+    ('result',)
+)
+REGISTRY = (request_duration, stage_duration, forecast_cache_lookups, write_behind_rows)
+store = MetricsStore(config.METRICS_DIR, config.METRICS_WRITE_INTERVAL) if config.METRICS_DIR else None
+
+
+def _reset_after_fork():
+    # A forked process starts counting from zero, its parent reports what it counted before the fork
+    for metric in REGISTRY:
+        metric.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def expose(per_worker=False):
+    """
+    Returns the metrics in the Prometheus text exposition format. With METRICS_DIR, these are
+    the totals of all worker processes, otherwise only those of the worker serving the scrape.
+
+    :param per_worker: Break the metrics down by the pid of the worker process
+    :type per_worker: bool
+    """
+    if store is not None:
+        store.write()
+        processes = store.read()
+    else:
+        processes = {str(os.getpid()): {metric.name: metric.snapshot() for metric in REGISTRY}}
+    lines = []
+    for metric in REGISTRY:
+        values = {}
+        for pid, process in processes.items():
+            for key, value in process.get(metric.name, {}).items():
+                key = (pid,) + key if per_worker else key
+                values[key] = metric.merge(values[key], value) if key in values else value
+        lines.extend(metric.expose(values, ('pid',) + metric.labelnames if per_worker else metric.labelnames))
+    return '\n'.join(lines) + '\n'
+
+
+def history_size_bucket(size):
+    """
+    Returns the history size label of a history with `size` events.
+    """
+    for bound in HISTORY_SIZE_BUCKETS:
+        if size <= bound:
+            return f"<={bound}"
+    return f">{HISTORY_SIZE_BUCKETS[-1]}"
+
+
+def label(**labels):
+    """
+    Sets labels (algorithm, event_type, history_size) of the stages of the current request.
+    """
+    if has_request_context():
+        if 'history_size' in labels:
+            labels['history_size'] = history_size_bucket(labels['history_size'])
+        g.setdefault('metric_labels', {}).update(labels)
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a stage of the current request. Outside of a request the stage is not recorded.
+
+    :param name: The stage name, e.g. 'fetch', 'parse', 'algorithm' or 'db'
+    :type name: str
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context():
+            stages = g.setdefault('metric_stages', {})
+            stages[name] = stages.get(name, 0) + time.perf_counter() - start
+
+
+def start_profile():
+    """
+    Returns an enabled profiler if the current request is sampled for profiling.
+    """
+    if config.PROFILE_SAMPLE_RATE <= 0 or random.random() >= config.PROFILE_SAMPLE_RATE:
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _record(start, status, state, endpoint, method, profiler=None, profile=None):
+    total = time.perf_counter() - start
+    stages = state.pop('metric_stages', {})
+    labels = state.pop('metric_labels', {})
+    request_duration.observe(total, endpoint=endpoint, method=method, status=status)
+    for name, duration in stages.items():
+        stage_duration.observe(duration, stage=name, **labels)
+    if store is not None:
+        store.maybe_write()
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(config.PROFILE_DIR, profile))
+    return total, stages
+
+
+def _request_info(profiler):
+    endpoint = request.url_rule.rule if request.url_rule is not None else request.path
+    profile = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.prof" if profiler is not None else None
+    return endpoint, request.method, profile
+
+
+def finish_request(start, status, profiler=None):
+    """
+    Records the metrics of the current request.
+
+    :param start: The perf_counter value at the start of the request
+    :type start: float
+    :param status: The HTTP status code of the response
+    :type status: int
+    :param profiler: The profiler returned by start_profile
+    :type profiler: cProfile.Profile
+    :return: The headers to add to the response
+    :rtype: dict
+    """
+    endpoint, method, profile = _request_info(profiler)
+    total, stages = _record(start, status, g, endpoint, method, profiler, profile)
+
+    timings = [f"{name};dur={duration * 1000:.3f}" for name, duration in stages.items()]
+    timings.append(f"total;dur={total * 1000:.3f}")
+    headers = {'Server-Timing': ', '.join(timings)}
+    if profile is not None:
+        headers['X-Profile'] = profile
+    return headers
+
+
+def finish_stream(response, start, profiler=None):
+    """
+    Records the metrics of a streamed response once its body has been sent. The stages run while
+    streaming, so the response has no Server-Timing header.
+
+    :param response: The streamed response
+    :type response: flask.Response
+    :param start: The perf_counter value at the start of the request
+    :type start: float
+    :param profiler: The profiler returned by start_profile
+    :type profiler: cProfile.Profile
+    :return: The headers to add to the response
+    :rtype: dict
+    """
+    endpoint, method, profile = _request_info(profiler)
+    # The request context is gone when the response is closed, keep the app globals of the request
+    state = g._get_current_object()
+    response.call_on_close(lambda: _record(start, response.status_code, state, endpoint, method, profiler, profile))
+    return {'X-Profile': profile} if profile is not None else {}
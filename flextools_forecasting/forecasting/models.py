@@ -1,32 +1,238 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import validates
-from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.orm import validates, declared_attr
+from sqlalchemy import text, tuple_, select, delete, update, Index, UniqueConstraint
 from sqlalchemy.sql import func
+from datetime import datetime, timedelta, timezone
+from array import array
+from instance import config
+import base64
+import sys
 import uuid
 
 db = SQLAlchemy()
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def parse_epochs(values):
+    """
+    Parses `str(datetime)` values into UTC epoch microseconds.
+    """
+    return [(datetime.fromisoformat(value) - EPOCH) // timedelta(microseconds=1) for value in values]
+
+def pack_epochs(values):
+    """
+    Packs `str(datetime)` values into little-endian int64 UTC epoch microseconds.
+    """
+    epochs = array('q', parse_epochs(values))
+    if sys.byteorder == 'big':
+        epochs.byteswap()
+    return epochs.tobytes()
+
+def unpack_epochs(data, strings=True):
+    """
+    Unpacks little-endian int64 UTC epoch microseconds into `str(datetime)` values, or
+    into the epoch microseconds themselves if `strings` is False.
+    """
+    epochs = array('q')
+    epochs.frombytes(data)
+    if sys.byteorder == 'big':
+        epochs.byteswap()
+    if not strings:
+        return epochs.tolist()
+    return [str(EPOCH + timedelta(microseconds=epoch)) for epoch in epochs]
+
 class BaseForecast(db.Model):
     __abstract__ = True
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"))
     timestamp = db.Column(db.DateTime(timezone=True), server_default=func.now())
     input_data = db.Column(db.JSON)
     algorithm = db.Column(db.String(255), nullable=False)
-    predicted_output = db.Column(db.JSON, nullable=False)
+    # The predicted output without the datetime lists moved to predicted_epochs, see encode_output
+    stored_output = db.Column('predicted_output', db.JSON, nullable=False)
+    predicted_epochs = db.Column(db.LargeBinary)
+
+    # Filter column combinations backed by a (*columns, timestamp, id) index for keyset pagination
+    filter_indexes = ((), ('algorithm',))
+    # Paths of the datetime lists of the predicted output that are stored as epoch microseconds
+    compact_fields = ()
+
+    @declared_attr
+    def __table_args__(cls):
+        return tuple(
+            Index('_'.join(('ix', cls.__tablename__, *columns, 'timestamp', 'id')), *columns, 'timestamp', 'id')
+            for columns in cls.filter_indexes
+        )
 
     def __repr__(self):
         return f"BaseForecast(id={self.id}, timestamp={self.timestamp}, input_data={self.input_data}, algorithm={self.algorithm}, predicted_output={self.predicted_output})"
 
-    def to_dict(self):
+    def to_dict(self, epochs=False):
+        """
+        :param epochs: Return the predicted timestamps as epoch microseconds instead of strings
+        :type epochs: bool
+        """
+        if not epochs:
+            predicted_output = self.predicted_output
+        elif self.predicted_epochs is not None:
+            predicted_output = self.decode_output(self.stored_output, self.predicted_epochs, strings=False)
+        else:
+            predicted_output = self.epoch_output(self.stored_output)
         return {
             'id': str(self.id),
             'timestamp': self.timestamp.isoformat(),
             'input_data': self.input_data,
             'algorithm': self.algorithm,
-            'predicted_output': self.predicted_output
+            'predicted_output': predicted_output
         }
 
+    @property
+    def predicted_output(self):
+        return self.decode_output(self.stored_output, self.predicted_epochs)
+
+    @predicted_output.setter
+    def predicted_output(self, output):
+        self.stored_output, self.predicted_epochs = self.encode_output(output)
+
+    @classmethod
+    def encode_output(cls, output):
+        """
+        Splits the datetime lists at the compact_fields paths off the predicted output if
+        COMPACT_PREDICTED_OUTPUT is set. Returns the remaining output, which records the
+        length of each moved list under 'compact', and the lists as packed epoch microseconds.
+
+        :param output: The predicted output
+        :type output: dict
+        :return: The values of stored_output and predicted_epochs
+        :rtype: tuple
+        """
+        if not config.COMPACT_PREDICTED_OUTPUT or not cls.compact_fields or not isinstance(output, dict):
+            return output, None
+        output = dict(output)
+        layout, values = [], []
+        for path in cls.compact_fields:
+            parent = output
+            for key in path[:-1]:
+                if not isinstance(parent.get(key), dict):
+                    break
+                parent[key] = parent = dict(parent[key])
+            else:
+                if isinstance(parent.get(path[-1]), list):
+                    timestamps = parent.pop(path[-1])
+                    layout.append([list(path), len(timestamps)])
+                    values.extend(timestamps)
+        output['compact'] = layout
+        return output, pack_epochs(values)
+
+    @staticmethod
+    def decode_output(output, epochs, strings=True):
+        """
+        Restores the predicted output split by encode_output. The datetime lists are returned
+        as epoch microseconds instead of strings if `strings` is False.
+        """
+        if epochs is None or not isinstance(output, dict) or 'compact' not in output:
+            return output
+        output = dict(output)
+        values = unpack_epochs(epochs, strings)
+        offset = 0
+        for path, length in output.pop('compact'):
+            parent = output
+            for key in path[:-1]:
+                parent[key] = parent = dict(parent[key])
+            parent[path[-1]] = values[offset:offset + length]
+            offset += length
+        return output
+
+    @classmethod
+    def epoch_output(cls, output):
+        """
+        Returns a copy of the predicted output with the datetime lists at the compact_fields
+        paths converted into epoch microseconds.
+        """
+        if not cls.compact_fields or not isinstance(output, dict):
+            return output
+        output = dict(output)
+        for path in cls.compact_fields:
+            parent = output
+            for key in path[:-1]:
+                if not isinstance(parent.get(key), dict):
+                    break
+                parent[key] = parent = dict(parent[key])
+            else:
+                if isinstance(parent.get(path[-1]), list):
+                    parent[path[-1]] = parse_epochs(parent[path[-1]])
+        return output
+
+    @classmethod
+    def output_values(cls, output):
+        """
+        Returns the column values of the predicted output for bulk inserts.
+        """
+        stored_output, predicted_epochs = cls.encode_output(output)
+        return {'stored_output': stored_output, 'predicted_epochs': predicted_epochs}
+
+    @classmethod
+    def prune(cls, before, batch_size=1000):
+        """
+        Deletes the forecasts created before the given time. The rows are deleted in batches
+        of `batch_size` oldest forecasts, each committed on its own, so autovacuum can keep up
+        instead of facing a single huge delete.
+
+        :param before: Forecasts created before this time are deleted
+        :type before: datetime
+        :param batch_size: The number of forecasts deleted per transaction
+        :type batch_size: int
+        :return: The number of deleted forecasts
+        :rtype: int
+        """
+        deleted = 0
+        while True:
+            ids = db.session.scalars(
+                select(cls.id).where(cls.timestamp < before).order_by(cls.timestamp, cls.id).limit(batch_size)
+            ).all()
+            if not ids:
+                return deleted
+            db.session.execute(delete(cls).where(cls.id.in_(ids)))
+            db.session.commit()
+            deleted += len(ids)
+
+    def cursor(self):
+        """
+        Returns the opaque keyset cursor pointing after this forecast.
+        """
+        return base64.urlsafe_b64encode(f"{self.timestamp.isoformat()}|{self.id}".encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            timestamp, id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return datetime.fromisoformat(timestamp), uuid.UUID(id)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Invalid cursor")
+
+    @classmethod
+    def page_query(cls, cursor=None, since=None, until=None, **filters):
+        """
+        Returns a query over the forecasts ordered by (timestamp, id), starting after the given cursor.
+
+        :param cursor: The cursor returned with the previous page
+        :type cursor: str
+        :param since: Only forecasts created at or after this time
+        :type since: datetime
+        :param until: Only forecasts created before this time
+        :type until: datetime
+        :param filters: Column values the forecasts have to match, None values are ignored
+        :type filters: dict
+        """
+        query = cls.query.filter_by(**{key: value for key, value in filters.items() if value is not None})
+        if cursor is not None:
+            query = query.filter(tuple_(cls.timestamp, cls.id) > tuple_(*cls.decode_cursor(cursor)))
+        if since is not None:
+            query = query.filter(cls.timestamp >= since)
+        if until is not None:
+            query = query.filter(cls.timestamp < until)
+        return query.order_by(cls.timestamp, cls.id)
+
     @validates('id')
     def validate_id(self, key, value):
         if self.id and self.id != value: 
@@ -48,9 +254,14 @@ class BaseForecast(db.Model):
 class TransactionForecast(BaseForecast):
     __tablename__ = 'transaction_forecast'
     event_type = db.Column(db.String(255), nullable=False)
+    # Hash of the forecast request and history watermark, see TransactionForecastAlgorithm.forecast_key
+    forecast_key = db.Column(db.String(64), index=True)
 
-    def to_dict(self):
-        data = super().to_dict()
+    filter_indexes = BaseForecast.filter_indexes + (('event_type',), ('algorithm', 'event_type'))
+    compact_fields = (('next_transaction',), ('confidence_interval', 'lower'), ('confidence_interval', 'upper'), ('counts', 'start'))
+
+    def to_dict(self, epochs=False):
+        data = super().to_dict(epochs)
         data['event_type'] = self.event_type
         return data
 
@@ -58,4 +269,301 @@ class TransactionForecast(BaseForecast):
     def validate_event_type(self, key, value):
         if not value: 
             raise ValueError("event_type cannot be empty")
-        return value
\ No newline at end of file
+        return value
+
+class DemandForecast(BaseForecast):
+    __tablename__ = 'demand_forecast'
+    item_number = db.Column(db.String(255))
+    item_id = db.Column(db.String(255))
+    prediction_horizon = db.Column(db.Integer)
+
+    filter_indexes = BaseForecast.filter_indexes + (('item_number',), ('item_id',))
+    compact_fields = (('buckets',),)
+
+    def to_dict(self, epochs=False):
+        data = super().to_dict(epochs)
+        data['item_number'] = self.item_number
+        data['item_id'] = self.item_id
+        data['prediction_horizon'] = self.prediction_horizon
+        return data
+
+class ModelState(db.Model):
+    """
+    The persisted state of an incrementally updated forecasting model, keyed by the SLT query,
+    event type, algorithm and model parameters. `watermark` is the epoch microsecond of the
+    last event folded into the state.
+    """
+    __tablename__ = 'model_state'
+    __table_args__ = (UniqueConstraint('query_hash', 'event_type', 'algorithm', 'parameters_hash'),)
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"))
+    query_hash = db.Column(db.String(64), nullable=False)
+    event_type = db.Column(db.String(255), nullable=False)
+    algorithm = db.Column(db.String(255), nullable=False)
+    parameters_hash = db.Column(db.String(64), nullable=False)
+    watermark = db.Column(db.BigInteger, nullable=False)
+    state = db.Column(db.JSON, nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"ModelState(id={self.id}, algorithm={self.algorithm}, event_type={self.event_type}, watermark={self.watermark})"
+
+    @classmethod
+    def load(cls, key):
+        """
+        Returns a copy of the state stored under the key, or an empty dict.
+
+        :param key: The query_hash, event_type, algorithm and parameters_hash of the state
+        :type key: dict
+        """
+        model_state = cls.query.filter_by(**key).first()
+        return dict(model_state.state) if model_state is not None else {}
+
+    @classmethod
+    def save(cls, key, state):
+        """
+        Upserts the state under the key. A state never replaces one with a later watermark.
+        The change is committed with the session.
+        """
+        if not state:
+            return
+        statement = insert(cls).values(id=uuid.uuid4(), watermark=state['watermark'], state=state, **key)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={'watermark': statement.excluded.watermark, 'state': statement.excluded.state, 'updated_at': func.now()},
+            where=cls.watermark <= statement.excluded.watermark
+        )
+        db.session.execute(statement)
+
+class ForecastJob(db.Model):
+    """
+    A forecast request queued for asynchronous processing by run_jobs.py. `request` holds the
+    posted forecast, `forecast_id` the created TransactionForecast once the job succeeded.
+    """
+    __tablename__ = 'forecast_job'
+    __table_args__ = (Index('ix_forecast_job_status_created_at', 'status', 'created_at'),)
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"))
+    status = db.Column(db.String(32), nullable=False, default='queued')
+    request = db.Column(db.JSON, nullable=False)
+    forecast_id = db.Column(UUID(as_uuid=True))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    started_at = db.Column(db.DateTime(timezone=True))
+    finished_at = db.Column(db.DateTime(timezone=True))
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    PENDING = (QUEUED, RUNNING)
+
+    def __repr__(self):
+        return f"ForecastJob(id={self.id}, status={self.status}, forecast_id={self.forecast_id})"
+
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'status': self.status,
+            'request': self.request,
+            'forecast_id': str(self.forecast_id) if self.forecast_id else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    @classmethod
+    def pending_count(cls):
+        return db.session.scalar(select(func.count()).select_from(cls).where(cls.status.in_(cls.PENDING)))
+
+    @classmethod
+    def claim(cls):
+        """
+        Marks the oldest queued job as running and returns it, or None if the queue is empty.
+        Concurrent runners skip the jobs locked by each other. The claim is committed.
+        """
+        job = db.session.scalars(
+            select(cls).where(cls.status == cls.QUEUED).order_by(cls.created_at).limit(1).with_for_update(skip_locked=True)
+        ).first()
+        if job is None:
+            db.session.rollback()
+            return None
+        job.status = cls.RUNNING
+        job.started_at = func.now()
+        db.session.commit()
+        return job
+
+    @classmethod
+    def finish(cls, id, status, **values):
+        """
+        Sets the final status of a running job unless it was cancelled or timed out meanwhile.
+        The change is committed with the session.
+
+        :return: Whether the job was still running
+        :rtype: bool
+        """
+        result = db.session.execute(
+            update(cls).where(cls.id == id, cls.status == cls.RUNNING).values(status=status, finished_at=func.now(), **values)
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def requeue(cls, ids):
+        """
+        Puts the running jobs with the given ids back into the queue and commits.
+        """
+        db.session.execute(
+            update(cls).where(cls.id.in_(ids), cls.status == cls.RUNNING).values(status=cls.QUEUED, started_at=None)
+        )
+        db.session.commit()
+
+    @classmethod
+    def expire(cls, timeout):
+        """
+        Fails the jobs running for longer than `timeout` seconds, e.g. those of a crashed runner,
+        and commits. Returns their number.
+        """
+        started_before = datetime.now(timezone.utc) - timedelta(seconds=timeout)
+        result = db.session.execute(
+            update(cls).where(cls.status == cls.RUNNING, cls.started_at < started_before)
+            .values(status=cls.FAILED, error=f"Timed out after {timeout:g} seconds", finished_at=func.now())
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @classmethod
+    def cancel(cls, id):
+        """
+        Cancels a queued or running job and commits. Returns whether the job was pending.
+        """
+        result = db.session.execute(
+            update(cls).where(cls.id == id, cls.status.in_(cls.PENDING)).values(status=cls.CANCELLED, finished_at=func.now())
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    @classmethod
+    def prune(cls, before):
+        """
+        Deletes the finished jobs created before the given time and returns their number.
+        """
+        result = db.session.execute(delete(cls).where(cls.created_at < before, cls.status.notin_(cls.PENDING)))
+        db.session.commit()
+        return result.rowcount
+
+class BacktestResult(db.Model):
+    """
+    The scores of a rolling-origin backtest of the forecasting algorithms on the history of an
+    SLT query. The latest result of a query and event type selects the model of algorithm=auto.
+    """
+    __tablename__ = 'backtest_result'
+    __table_args__ = (Index('ix_backtest_result_query_hash_event_type_created_at', 'query_hash', 'event_type', 'created_at'),)
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"))
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    query_hash = db.Column(db.String(64), nullable=False)
+    input_data = db.Column(db.JSON)
+    event_type = db.Column(db.String(255), nullable=False)
+    prediction_horizon = db.Column(db.Float, nullable=False)
+    bucket = db.Column(db.Float, nullable=False)
+    origins = db.Column(db.JSON, nullable=False)
+    scores = db.Column(db.JSON, nullable=False)
+    # The best candidate
+    algorithm = db.Column(db.String(255))
+    parameters = db.Column(db.JSON)
+
+    def __repr__(self):
+        return f"BacktestResult(id={self.id}, event_type={self.event_type}, algorithm={self.algorithm}, parameters={self.parameters})"
+
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'input_data': self.input_data,
+            'event_type': self.event_type,
+            'prediction_horizon': self.prediction_horizon,
+            'bucket': self.bucket,
+            'origins': self.origins,
+            'scores': self.scores,
+            'algorithm': self.algorithm,
+            'parameters': self.parameters
+        }
+
+    @classmethod
+    def latest(cls, query_hash, event_type):
+        """
+        Returns the latest result with a best candidate for the query and event type, or None.
+        """
+        return cls.query.filter(
+            cls.query_hash == query_hash, cls.event_type == event_type, cls.algorithm.isnot(None)
+        ).order_by(cls.created_at.desc()).first()
+
+class HotForecast(db.Model):
+    """
+    A requested forecast spec with its decayed request count. The scheduler keeps the forecasts
+    of the most requested specs precomputed, `forecast_id` is the latest of them.
+    """
+    __tablename__ = 'hot_forecast'
+    spec_hash = db.Column(db.String(64), primary_key=True)
+    algorithm = db.Column(db.String(255), nullable=False)
+    input_data = db.Column(db.JSON)
+    event_type = db.Column(db.String(255), nullable=False)
+    prediction_horizon = db.Column(db.Float)
+    requests = db.Column(db.Float, nullable=False, default=0)
+    last_requested_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    forecast_id = db.Column(UUID(as_uuid=True))
+    # The epoch microsecond of the latest event the forecast saw
+    latest_event = db.Column(db.BigInteger)
+    refreshed_at = db.Column(db.DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"HotForecast(spec_hash={self.spec_hash}, algorithm={self.algorithm}, event_type={self.event_type}, requests={self.requests})"
+
+    def spec(self):
+        return {
+            'algorithm': self.algorithm,
+            'input_data': self.input_data,
+            'event_type': self.event_type,
+            'prediction_horizon': self.prediction_horizon
+        }
+
+    @classmethod
+    def record(cls, specs, session):
+        """
+        Adds request counts to the specs, creating the missing ones. The change is committed with the session.
+
+        :param specs: (spec, count) by spec hash
+        :type specs: dict
+        :param session: The session to execute the upsert in
+        :type session: sqlalchemy.orm.Session
+        """
+        if not specs:
+            return
+        statement = insert(cls).values([
+            {'spec_hash': spec_hash, 'requests': count, **spec}
+            for spec_hash, (spec, count) in specs.items()
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=['spec_hash'],
+            set_={'requests': cls.requests + statement.excluded.requests, 'last_requested_at': func.now()}
+        )
+        session.execute(statement)
+
+    @classmethod
+    def hottest(cls, limit, decay=1):
+        """
+        Decays the request counts of all specs by `decay`, commits, and returns the `limit` most
+        requested ones.
+        """
+        if decay != 1:
+            db.session.execute(update(cls).values(requests=cls.requests * decay))
+            db.session.commit()
+        return cls.query.filter(cls.requests > 0).order_by(cls.requests.desc()).limit(limit).all()
+
+    @classmethod
+    def prune(cls, before):
+        """
+        Deletes the specs not requested since the given time and returns their number.
+        """
+        result = db.session.execute(delete(cls).where(cls.last_requested_at < before))
+        db.session.commit()
+        return result.rowcount
\ No newline at end of file
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from forecasting.models import db, HotForecast
+from instance import config
+
+# The key of the Postgres advisory lock held by the worker that runs the scheduler
+ADVISORY_LOCK_KEY = 7_466_530_301
+
+_scheduler = None
+_pid = None
+_lock = threading.Lock()
+
+
+def forecast_spec(data):
+    """
+    Returns the canonical spec of a forecast request, which identifies it in hot_forecast.
+    """
+    from forecasting.algorithms.transaction import normalize_horizon
+    return {
+        'algorithm': data.get('algorithm'),
+        'input_data': data.get('input_data') or {},
+        'event_type': data.get('event_type'),
+        'prediction_horizon': normalize_horizon(data.get('prediction_horizon'))
+    }
+
+
+def spec_hash(spec):
+    from forecasting.algorithms.transaction import digest
+    return digest(spec)
+
+
+def age(timestamp):
+    """
+    Returns the seconds since a database timestamp, naive timestamps are treated as UTC.
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - timestamp).total_seconds()
+
+
+class RequestTracker:
+    """
+    Counts the forecast requests of this worker per spec and adds them to hot_forecast at most
+    every `interval` seconds, so that requests rarely write to the database.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.counts = {}
+        self.flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, spec):
+        key = spec_hash(spec)
+        with self._lock:
+            self.counts[key] = (spec, self.counts.get(key, (spec, 0))[1] + 1)
+            due = time.monotonic() - self.flushed_at >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Adds the counted requests to hot_forecast in a session of its own, so that the request
+        session is neither committed nor failed by it. The counts of a failed flush are dropped.
+        """
+        with self._lock:
+            counts, self.counts = self.counts, {}
+            self.flushed_at = time.monotonic()
+        try:
+            with Session(db.engine) as session:
+                HotForecast.record(counts, session)
+                session.commit()
+        except Exception:
+            current_app.logger.exception("Recording the forecast requests failed")
+
+
+tracker = RequestTracker(config.SCHEDULER_TRACK_INTERVAL)
+
+
+class Scheduler:
+    """
+    Keeps the forecasts of the most requested specs precomputed in transaction_forecast.
+
+    Every gunicorn worker runs a scheduler thread, but only the one holding the advisory lock
+    refreshes. Every `interval` seconds the request counts are decayed and the SCHEDULER_HOT_SPECS
+    most requested specs are recomputed if their history has new events or their forecast is
+    older than SCHEDULER_MAX_AGE. If the lock holder dies, its connection and with it the
+    lock is released and another worker takes over.
+
+    :param app: The Flask app
+    :type app: flask.Flask
+    :param interval: Seconds between two refreshes
+    :type interval: float
+    """
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self.connection = None
+
+    def start(self):
+        threading.Thread(target=self.run, name='forecast-scheduler', daemon=True).start()
+        return self
+
+    def acquire(self):
+        """
+        Returns whether this worker holds the scheduler lock, trying to take it if not.
+        """
+        if db.engine.dialect.name != 'postgresql':
+            # Development databases without advisory locks serve a single process
+            return True
+        if self.connection is not None:
+            try:
+                self.connection.execute(text('SELECT 1'))
+                self.connection.commit()
+                return True
+            except Exception:
+                # The lock is gone with the connection
+                self.connection.invalidate()
+                self.connection = None
+        connection = db.engine.connect()
+        locked = connection.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': ADVISORY_LOCK_KEY}).scalar()
+        # The session level lock outlives the transaction
+        connection.commit()
+        if not locked:
+            connection.close()
+            return False
+        self.connection = connection
+        return True
+
+    def refresh(self):
+        """
+        Recomputes the forecasts of the hot specs that are out of date.
+
+        :return: The number of recomputed forecasts
+        :rtype: int
+        """
+        from forecasting.algorithms.transaction import TransactionForecastAlgorithm
+        from forecasting.blueprints.api.transaction import create_forecast
+        refreshed = 0
+        for hot in HotForecast.hottest(config.SCHEDULER_HOT_SPECS, config.SCHEDULER_DECAY):
+            try:
+                history = TransactionForecastAlgorithm.load_transaction_history(hot.input_data)
+                latest_event = TransactionForecastAlgorithm.latest_event(history, hot.event_type)
+                if hot.forecast_id is not None and hot.latest_event == latest_event and age(hot.refreshed_at) < config.SCHEDULER_MAX_AGE:
+                    continue
+                result = create_forecast(hot.spec(), write_behind=False)
+                hot.forecast_id = uuid.UUID(result['id'])
+                hot.latest_event = latest_event
+                hot.refreshed_at = func.now()
+                db.session.commit()
+                refreshed += 1
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception(f"Refreshing {hot.spec_hash} failed")
+        return refreshed
+
+    def run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    if self.acquire():
+                        self.refresh()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Forecast scheduler failed")
+                finally:
+                    db.session.remove()
+                time.sleep(self.interval)
+
+
+def start_scheduler():
+    """
+    Starts the scheduler thread of this worker process once, registered as before_request hook.
+    Threads do not survive the fork of a preloaded app, so the thread is started with the first
+    request of each worker instead of in create_app.
+    """
+    global _scheduler, _pid
+    if config.SCHEDULER_INTERVAL <= 0 or _pid == os.getpid():
+        return
+    with _lock:
+        if _pid != os.getpid():
+            _scheduler = Scheduler(current_app._get_current_object(), config.SCHEDULER_INTERVAL).start()
+            _pid = os.getpid()
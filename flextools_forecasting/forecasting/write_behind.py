@@ -0,0 +1,166 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from flask import current_app
+from sqlalchemy import insert
+from werkzeug.exceptions import ServiceUnavailable
+from forecasting.models import db, TransactionForecast
+from forecasting import metrics
+from instance import config
+
+
+class WriteBehindBuffer:
+    """
+    Buffers the rows of a model in this worker process and inserts them with batched multi-row
+    INSERTs from a background thread, once `batch_size` rows are buffered or the first buffered
+    row waited `interval` seconds.
+
+    The buffer holds at most `size` rows. When it is full, put blocks for up to `put_timeout`
+    seconds and then rejects the row, so that a slow database pushes back on the requests
+    instead of growing the buffer. The buffer is flushed when the interpreter exits, which
+    gunicorn workers do on a graceful or quick shutdown. Rows of a killed worker are lost.
+
+    :param model: The model of the buffered rows
+    :type model: flask_sqlalchemy.model.Model
+    :param size: The maximum number of buffered rows
+    :type size: int
+    :param batch_size: The maximum number of rows per INSERT
+    :type batch_size: int
+    :param interval: Seconds a buffered row waits at most for its batch to fill
+    :type interval: float
+    :param put_timeout: Seconds put waits for room in a full buffer
+    :type put_timeout: float
+    :param retries: The number of retries of a failed INSERT before its rows are dropped
+    :type retries: int
+    :param on_drop: Called with the dropped rows of a failed INSERT
+    :type on_drop: callable
+    """
+    def __init__(self, model, size, batch_size, interval, put_timeout, retries=3, on_drop=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.interval = interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.on_drop = on_drop
+        self.queue = queue.Queue(maxsize=size)
+        self.app = None
+        self._pid = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the flush thread of this worker process once. Threads do not survive the fork of
+        a preloaded app, so the thread is started with the first buffered row of each worker.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.app = current_app._get_current_object()
+                self._thread = threading.Thread(target=self.run, name='write-behind', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+                self._pid = os.getpid()
+
+    def put(self, row):
+        """
+        Buffers a row, raises a 503 if the buffer stays full for `put_timeout` seconds.
+
+        :param row: The column values of the row, keyed by attribute name
+        :type row: dict
+        """
+        self.start()
+        try:
+            self.queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            metrics.write_behind_rows.inc(result='rejected')
+            raise ServiceUnavailable(f"The write-behind buffer is full ({self.queue.maxsize} rows), retry later")
+
+    def take(self, wait=True):
+        """
+        Takes the next batch of up to `batch_size` rows. With `wait` set, waits up to `interval`
+        seconds for a first row and then up to `interval` seconds for the batch to fill.
+        """
+        rows = []
+        deadline = time.monotonic() + self.interval
+        while len(rows) < self.batch_size:
+            try:
+                if not wait:
+                    rows.append(self.queue.get_nowait())
+                else:
+                    rows.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                    if len(rows) == 1:
+                        deadline = time.monotonic() + self.interval
+            except queue.Empty:
+                break
+        return rows
+
+    def write(self, rows):
+        """
+        Inserts the rows and commits, retrying a failed INSERT with backoff before dropping its rows.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                db.session.execute(insert(self.model), rows)
+                db.session.commit()
+                metrics.write_behind_rows.inc(len(rows), result='written')
+                return
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception(f"Writing {len(rows)} buffered {self.model.__tablename__} rows failed (attempt {attempt + 1})")
+                if attempt < self.retries:
+                    time.sleep(min(2 ** attempt * self.interval, 30))
+        metrics.write_behind_rows.inc(len(rows), result='dropped')
+        self.app.logger.error(f"Dropped {len(rows)} buffered {self.model.__tablename__} rows")
+        if self.on_drop is not None:
+            self.on_drop(rows)
+
+    def run(self):
+        with self.app.app_context():
+            while not self._stopped.is_set():
+                try:
+                    rows = self.take()
+                    if rows:
+                        self.write(rows)
+                finally:
+                    db.session.remove()
+
+    def close(self):
+        """
+        Stops the flush thread and writes the rows left in the buffer, registered with atexit.
+        """
+        if self._pid != os.getpid():
+            return
+        self._stopped.set()
+        self._thread.join()
+        with self.app.app_context():
+            while True:
+                rows = self.take(wait=False)
+                if not rows:
+                    break
+                self.write(rows)
+            db.session.remove()
+
+
+def evict_forecasts(rows):
+    """
+    Removes dropped forecasts from the forecast cache, so that the ids of rows that were never
+    written are not served. Entries replaced by a later forecast are kept.
+    """
+    from forecasting.algorithms.transaction import forecast_cache
+    for row in rows:
+        forecast_cache.discard(row['forecast_key'], lambda result, id=str(row['id']): result['id'] == id)
+
+
+forecast_writer = WriteBehindBuffer(
+    TransactionForecast,
+    config.WRITE_BEHIND_BUFFER_SIZE,
+    config.WRITE_BEHIND_BATCH_SIZE,
+    config.WRITE_BEHIND_INTERVAL,
+    config.WRITE_BEHIND_PUT_TIMEOUT,
+    on_drop=evict_forecasts
+)
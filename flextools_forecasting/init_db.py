@@ -1,5 +1,5 @@
 import time
-from sqlalchemy import text
+from sqlalchemy import text, inspect
 from sqlalchemy.exc import OperationalError
 
 from forecasting import create_app 
@@ -26,4 +26,16 @@ with app.app_context():
     if not check_database_health(engine):
         raise Exception("Database connection failed. Unable to initialize the database.")
 
-    db.create_all()
\ No newline at end of file
+    db.create_all()
+
+    # create_all skips existing tables, add nullable columns and indexes introduced after their creation
+    inspector = inspect(engine)
+    for table in db.metadata.tables.values():
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns and column.nullable:
+                column_type = column.type.compile(dialect=engine.dialect)
+                with engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
\ No newline at end of file
@@ -5,4 +5,70 @@ SQLALCHEMY_TRACK_MODIFICATIONS = False
 DEBUG = True
 TESTING = True
 PYTHONUNBUFFERED=True
-STORAGE_LOCATION_TRACKING_API = os.environ.get('STORAGE_LOCATION_TRACKING_URI', 'http://localhost:5000/api/v1')
\ No newline at end of file
+STORAGE_LOCATION_TRACKING_API = os.environ.get('STORAGE_LOCATION_TRACKING_URI', 'http://localhost:5000/api/v1')
+HISTORY_CACHE_SIZE = int(os.environ.get('HISTORY_CACHE_SIZE', 128))
+HISTORY_CACHE_TTL = float(os.environ.get('HISTORY_CACHE_TTL', 30))
+HISTORY_CACHE_MAX_AGE = float(os.environ.get('HISTORY_CACHE_MAX_AGE', 3600))
+SLT_POOL_SIZE = int(os.environ.get('SLT_POOL_SIZE', 10))
+SLT_CONNECT_TIMEOUT = float(os.environ.get('SLT_CONNECT_TIMEOUT', 3.05))
+SLT_READ_TIMEOUT = float(os.environ.get('SLT_READ_TIMEOUT', 30))
+SLT_RETRIES = int(os.environ.get('SLT_RETRIES', 2))
+SLT_BACKOFF = float(os.environ.get('SLT_BACKOFF', 0.2))
+SLT_BACKOFF_MAX = float(os.environ.get('SLT_BACKOFF_MAX', 5))
+SLT_BREAKER_THRESHOLD = int(os.environ.get('SLT_BREAKER_THRESHOLD', 5))
+SLT_BREAKER_COOLDOWN = float(os.environ.get('SLT_BREAKER_COOLDOWN', 30))
+SLT_STREAM_CHUNK_SIZE = int(os.environ.get('SLT_STREAM_CHUNK_SIZE', 65536))
+PROCESS_POOL_WORKERS = int(os.environ.get('PROCESS_POOL_WORKERS', os.cpu_count() or 1))
+PROCESS_POOL_START_METHOD = os.environ.get('PROCESS_POOL_START_METHOD', 'spawn')
+FORECAST_PAGE_SIZE = int(os.environ.get('FORECAST_PAGE_SIZE', 100))
+FORECAST_PAGE_SIZE_MAX = int(os.environ.get('FORECAST_PAGE_SIZE_MAX', 1000))
+POISSON_MAX_SAMPLES = int(os.environ.get('POISSON_MAX_SAMPLES', 100000))
+POISSON_MAX_DRAWS = int(os.environ.get('POISSON_MAX_DRAWS', 50000000))
+HOLT_WINTERS_GRID = {
+    'alpha': [0.05, 0.1, 0.2, 0.4, 0.7],
+    'beta': [0.01, 0.05, 0.1, 0.2, 0.4],
+    'gamma': [0.05, 0.1, 0.3, 0.5, 0.8]
+}
+HOLT_WINTERS_MAX_CANDIDATES = int(os.environ.get('HOLT_WINTERS_MAX_CANDIDATES', 1000))
+FORECAST_CACHE_SIZE = int(os.environ.get('FORECAST_CACHE_SIZE', 1024))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/forecasting-profiles')
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_WRITE_INTERVAL = float(os.environ.get('METRICS_WRITE_INTERVAL', 1))
+CREATE_SCHEMA_ON_STARTUP = os.environ.get('CREATE_SCHEMA_ON_STARTUP', 'false').lower() in ('1', 'true', 'yes')
+COMPACT_PREDICTED_OUTPUT = os.environ.get('COMPACT_PREDICTED_OUTPUT', 'false').lower() in ('1', 'true', 'yes')
+FORECAST_RETENTION_DAYS = float(os.environ.get('FORECAST_RETENTION_DAYS', 30))
+FORECAST_PRUNE_BATCH_SIZE = int(os.environ.get('FORECAST_PRUNE_BATCH_SIZE', 1000))
+DEMAND_LOOKBACK_BUCKETS = int(os.environ.get('DEMAND_LOOKBACK_BUCKETS', 365))
+DEMAND_MAX_CELLS = int(os.environ.get('DEMAND_MAX_CELLS', 50000000))
+EVENT_STORE_DIR = os.environ.get('EVENT_STORE_DIR', '')
+EVENT_STORE_TTL = float(os.environ.get('EVENT_STORE_TTL', HISTORY_CACHE_TTL))
+EVENT_STORE_SYNC_INTERVAL = float(os.environ.get('EVENT_STORE_SYNC_INTERVAL', 10))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_QUEUE_LIMIT = int(os.environ.get('JOB_QUEUE_LIMIT', 100))
+JOB_TIMEOUT = float(os.environ.get('JOB_TIMEOUT', 600))
+JOB_MAX_WAIT = float(os.environ.get('JOB_MAX_WAIT', 30))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 0.5))
+MAX_PREDICTED_EVENTS = int(os.environ.get('MAX_PREDICTED_EVENTS', 100000))
+MAX_FORECAST_BUCKETS = int(os.environ.get('MAX_FORECAST_BUCKETS', 10000))
+BACKTEST_ORIGINS = int(os.environ.get('BACKTEST_ORIGINS', 20))
+BACKTEST_MAX_ORIGINS = int(os.environ.get('BACKTEST_MAX_ORIGINS', 200))
+BACKTEST_MIN_EVENTS = int(os.environ.get('BACKTEST_MIN_EVENTS', 100))
+# The parameter sets backtested per algorithm, algorithms without an entry are backtested with their defaults
+BACKTEST_PARAMETERS = {
+    'exponential_smoothing': [{'alpha': 0.1}, {'alpha': 0.2}, {'alpha': 0.5}],
+    'holt_winters': [{}, {'fit': True}],
+    'seasonal_poisson': [{'profile': 'week'}, {'profile': 'day'}, {'profile': 'flat'}]
+}
+# Seconds between two refreshes of the hot forecasts, 0 disables the scheduler
+SCHEDULER_INTERVAL = float(os.environ.get('SCHEDULER_INTERVAL', 60))
+SCHEDULER_HOT_SPECS = int(os.environ.get('SCHEDULER_HOT_SPECS', 20))
+SCHEDULER_MAX_AGE = float(os.environ.get('SCHEDULER_MAX_AGE', 900))
+SCHEDULER_DECAY = float(os.environ.get('SCHEDULER_DECAY', 0.9))
+SCHEDULER_TRACK_INTERVAL = float(os.environ.get('SCHEDULER_TRACK_INTERVAL', 10))
+# Return forecasts before they are committed and insert them in batches from a background thread
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+WRITE_BEHIND_BUFFER_SIZE = int(os.environ.get('WRITE_BEHIND_BUFFER_SIZE', 10000))
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 500))
+WRITE_BEHIND_INTERVAL = float(os.environ.get('WRITE_BEHIND_INTERVAL', 0.5))
+WRITE_BEHIND_PUT_TIMEOUT = float(os.environ.get('WRITE_BEHIND_PUT_TIMEOUT', 5))
\ No newline at end of file
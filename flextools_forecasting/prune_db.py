@@ -0,0 +1,20 @@
+import sys
+from datetime import datetime, timedelta, timezone
+
+from forecasting import create_app
+from forecasting.models import TransactionForecast, ForecastJob, HotForecast
+from instance import config
+
+app = create_app()
+
+# Usage: python prune_db.py [retention in days]
+retention_days = float(sys.argv[1]) if len(sys.argv) > 1 else config.FORECAST_RETENTION_DAYS
+
+with app.app_context():
+    before = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    deleted = TransactionForecast.prune(before, config.FORECAST_PRUNE_BATCH_SIZE)
+    print(f'Deleted {deleted} transaction forecasts created before {before.isoformat()}')
+    deleted = ForecastJob.prune(before)
+    print(f'Deleted {deleted} finished forecast jobs created before {before.isoformat()}')
+    deleted = HotForecast.prune(before)
+    print(f'Deleted {deleted} hot forecast specs not requested since {before.isoformat()}')
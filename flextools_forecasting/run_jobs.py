@@ -0,0 +1,11 @@
+import sys
+
+from forecasting import create_app, warm_up
+from forecasting.jobs import JobRunner
+from instance import config
+
+app = create_app()
+warm_up()
+
+# Runs the ForecastJobs queued with POST /transaction/?async=true. Usage: python run_jobs.py [--once]
+JobRunner(app, config.JOB_WORKERS, config.JOB_TIMEOUT).run(once='--once' in sys.argv)
\ No newline at end of file
@@ -0,0 +1,20 @@
+import sys
+import time
+
+from instance import config
+from forecasting.algorithms.transaction import TransactionForecastAlgorithm, event_store
+
+# Keeps every history mirrored in the event store up to date, so requests rarely sync themselves.
+# New histories are added by the first request for them. Usage: python sync_events.py [--once]
+if event_store is None:
+    sys.exit("EVENT_STORE_DIR is not configured")
+
+while True:
+    for query in event_store.queries():
+        try:
+            event_store.sync(query, TransactionForecastAlgorithm.fetch_new_events, force=True)
+        except ValueError as e:
+            print(f'Syncing {query} failed: {e}', file=sys.stderr)
+    if '--once' in sys.argv:
+        break
+    time.sleep(config.EVENT_STORE_SYNC_INTERVAL)
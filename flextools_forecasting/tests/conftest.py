@@ -0,0 +1,105 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+# The scheduler thread and the write-behind buffer would outlive the test that started them
+os.environ.setdefault('SCHEDULER_INTERVAL', '0')
+os.environ.setdefault('WRITE_BEHIND', 'false')
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from forecasting import create_app
+from forecasting.models import db
+from forecasting.algorithms import transaction
+from forecasting.algorithms.slt import slt_client
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_records(count=2000, seed=2):
+    """
+    Returns ulRecords with exponentially distributed inter-arrival times of about two minutes,
+    every third unit load still stored.
+    """
+    rng = np.random.default_rng(seed)
+    stored = START + np.cumsum(rng.exponential(120, count)) * timedelta(seconds=1)
+    return [
+        {
+            'stored_at': timestamp.isoformat(),
+            'retrieved_at': (timestamp + timedelta(minutes=10)).isoformat() if i % 3 else 'None'
+        }
+        for i, timestamp in enumerate(stored)
+    ]
+
+
+def make_history(records):
+    """
+    Returns the history of ulRecords as returned by load_transaction_history.
+    """
+    return transaction.TransactionForecastAlgorithm.parse_ul_records(records)
+
+
+class FakeSLTResponse:
+    def __init__(self, records):
+        self.status_code = 200
+        self.body = json.dumps(records).encode()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.body)
+
+    def iter_content(self, chunk_size=1):
+        for offset in range(0, len(self.body), chunk_size):
+            yield self.body[offset:offset + chunk_size]
+
+
+@pytest.fixture
+def slt(monkeypatch):
+    """
+    Serves the ulRecords of the Storage Location Tracking service from memory. Returns the
+    list of served records, tests may replace its contents.
+    """
+    records = make_records()
+    monkeypatch.setattr(slt_client, 'get', lambda path, **kwargs: FakeSLTResponse(records))
+    transaction.history_cache.clear()
+    transaction.forecast_cache.clear()
+    yield records
+    transaction.history_cache.clear()
+    transaction.forecast_cache.clear()
+
+
+@pytest.fixture
+def app():
+    """
+    The app on a fresh schema of the database at DATABASE_URI.
+    """
+    try:
+        app = create_app()
+        with app.app_context():
+            db.session.execute(text('SELECT 1'))
+    except (OperationalError, ModuleNotFoundError) as e:
+        pytest.skip(f"The database at DATABASE_URI is not available: {e}")
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app, slt):
+    return app.test_client()
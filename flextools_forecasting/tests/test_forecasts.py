@@ -0,0 +1,91 @@
+import pytest
+
+from forecasting.algorithms.transaction import TransactionForecastAlgorithm
+from conftest import make_history, make_records
+
+FORECAST = {'algorithm': 'poisson_process', 'event_type': 'storage', 'prediction_horizon': 2, 'input_data': {}}
+
+
+def test_forecast_key_changes_with_the_latest_event():
+    records = make_records()
+    history, longer = make_history(records[:-1]), make_history(records)
+    key = TransactionForecastAlgorithm.forecast_key('poisson_process', {}, 'storage', 2, history)
+    assert TransactionForecastAlgorithm.forecast_key('poisson_process', {}, 'storage', 2, history) == key
+    assert TransactionForecastAlgorithm.forecast_key('poisson_process', {}, 'storage', 2, longer) != key
+    assert TransactionForecastAlgorithm.forecast_key('poisson_process', {}, 'retrieval', 2, history) != key
+    assert TransactionForecastAlgorithm.forecast_key('poisson_process', {}, 'storage', 2.0, history) == key
+
+
+def test_identical_forecasts_are_memoized(client, slt):
+    first = client.post('/api/v1/transaction/', json=FORECAST)
+    assert first.status_code == 200
+    assert first.json['cache_hit'] is False
+
+    second = client.post('/api/v1/transaction/', json={**FORECAST, 'prediction_horizon': 2.0})
+    assert second.json['cache_hit'] is True
+    assert second.json['id'] == first.json['id']
+    assert second.json['predicted_output'] == first.json['predicted_output']
+
+    other = client.post('/api/v1/transaction/', json={**FORECAST, 'prediction_horizon': 3})
+    assert other.json['cache_hit'] is False
+    assert other.json['id'] != first.json['id']
+
+
+def test_new_events_invalidate_the_memoized_forecast(client, slt):
+    first = client.post('/api/v1/transaction/', json=FORECAST)
+    slt.pop()
+    from forecasting.algorithms import transaction
+    transaction.history_cache.clear()
+    second = client.post('/api/v1/transaction/', json=FORECAST)
+    assert second.json['cache_hit'] is False
+    assert second.json['id'] != first.json['id']
+
+
+def test_batch_forecasts_share_the_memoized_forecasts(client, slt):
+    single = client.post('/api/v1/transaction/', json=FORECAST).json
+    batch = client.post('/api/v1/transaction/batch', json={
+        'input_data': {},
+        'forecasts': [
+            {'algorithm': 'poisson_process', 'event_type': 'storage', 'prediction_horizon': 2},
+            {'algorithm': 'exponential_smoothing', 'event_type': 'both', 'prediction_horizon': 2},
+            {'algorithm': 'exponential_smoothing', 'event_type': 'both', 'prediction_horizon': 2}
+        ]
+    })
+    assert batch.status_code == 200
+    assert [result['cache_hit'] for result in batch.json] == [True, False, False]
+    assert batch.json[0]['id'] == single['id']
+    assert batch.json[1]['id'] == batch.json[2]['id']
+
+
+@pytest.mark.parametrize('body, error', [
+    ({**FORECAST, 'event_type': 'unknown'}, "Invalid event type"),
+    ({key: value for key, value in FORECAST.items() if key != 'event_type'}, "Invalid event type"),
+    ({key: value for key, value in FORECAST.items() if key != 'prediction_horizon'}, "prediction_horizon is required"),
+    ({**FORECAST, 'prediction_horizon': 'soon'}, "prediction_horizon must be a number"),
+    ({**FORECAST, 'prediction_horizon': 0}, "prediction_horizon must be positive"),
+    ({**FORECAST, 'algorithm': 'unknown'}, "Invalid algorithm"),
+])
+def test_invalid_forecasts_are_rejected(client, body, error):
+    response = client.post('/api/v1/transaction/', json=body)
+    assert response.status_code == 400
+    assert response.json['error'] == error
+
+
+def test_invalid_batch_forecasts_are_rejected(client):
+    response = client.post('/api/v1/transaction/batch', json={
+        'input_data': {},
+        'forecasts': [{'algorithm': 'poisson_process', 'event_type': 'unknown', 'prediction_horizon': 2}]
+    })
+    assert response.status_code == 400
+    assert response.json['error'] == "Invalid event type"
+
+
+@pytest.mark.parametrize('query, error', [
+    ('algorithm=holt_winters&event_type=storage', "prediction_horizon is required"),
+    ('algorithm=holt_winters&event_type=unknown&prediction_horizon=2', "Invalid event type"),
+    ('algorithm=holt_winters&prediction_horizon=2&input_data={', "input_data must be JSON"),
+])
+def test_invalid_latest_forecasts_are_rejected(client, query, error):
+    response = client.get(f'/api/v1/transaction/latest?{query}')
+    assert response.status_code == 400
+    assert response.json['error'] == error
@@ -0,0 +1,28 @@
+FORECAST = {'algorithm': 'poisson_process', 'event_type': 'storage', 'prediction_horizon': 2, 'input_data': {}}
+
+
+def test_queued_job_can_be_cancelled_once(client):
+    queued = client.post('/api/v1/transaction/?async=true', json=FORECAST)
+    assert queued.status_code == 202
+    job = queued.json
+    assert queued.headers['Location'].endswith(f"/jobs/{job['id']}")
+
+    cancelled = client.delete(f"/api/v1/transaction/jobs/{job['id']}")
+    assert cancelled.status_code == 200
+    assert cancelled.json['status'] == 'cancelled'
+
+    again = client.delete(f"/api/v1/transaction/jobs/{job['id']}")
+    assert again.status_code == 409
+
+    fetched = client.get(f"/api/v1/transaction/jobs/{job['id']}")
+    assert fetched.json['status'] == 'cancelled'
+
+
+def test_unknown_job_is_not_found(client):
+    response = client.delete('/api/v1/transaction/jobs/00000000-0000-0000-0000-000000000000')
+    assert response.status_code == 404
+
+
+def test_invalid_job_is_rejected_before_it_is_queued(client):
+    response = client.post('/api/v1/transaction/?async=true', json={**FORECAST, 'event_type': 'unknown'})
+    assert response.status_code == 400
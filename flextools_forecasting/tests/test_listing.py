@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+FORECAST = {'algorithm': 'poisson_process', 'event_type': 'storage', 'input_data': {}}
+
+
+@pytest.fixture
+def forecast_ids(client):
+    return [
+        client.post('/api/v1/transaction/', json={**FORECAST, 'prediction_horizon': horizon}).json['id']
+        for horizon in range(1, 6)
+    ]
+
+
+def test_cursor_pagination_returns_every_forecast_once(client, forecast_ids):
+    ids, cursor, pages = [], None, 0
+    while True:
+        response = client.get('/api/v1/transaction/', query_string={'limit': 2, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.json
+        assert len(page) <= 2
+        ids.extend(forecast['id'] for forecast in page)
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert pages == 3
+    assert sorted(ids) == sorted(forecast_ids)
+
+
+def test_last_page_has_no_cursor(client, forecast_ids):
+    response = client.get('/api/v1/transaction/', query_string={'limit': 5})
+    assert len(response.json) == 5
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_invalid_limit_is_rejected(client):
+    response = client.get('/api/v1/transaction/', query_string={'limit': 0})
+    assert response.status_code == 400
+
+
+def test_listing_as_ndjson(client, forecast_ids):
+    response = client.get('/api/v1/transaction/', headers={'Accept': 'application/x-ndjson'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert sorted(json.loads(line)['id'] for line in lines) == sorted(forecast_ids)
+
+
+def test_forecast_as_msgpack(client):
+    msgpack = pytest.importorskip('msgpack')
+    response = client.post('/api/v1/transaction/', json={**FORECAST, 'prediction_horizon': 2}, headers={'Accept': 'application/msgpack'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/msgpack'
+    forecast = msgpack.unpackb(response.data, raw=False)
+    # The binary formats carry the predicted timestamps as epoch microseconds
+    assert all(isinstance(timestamp, int) for timestamp in forecast['predicted_output']['next_transaction'])
+
+
+def test_msgpack_request_body(client):
+    msgpack = pytest.importorskip('msgpack')
+    response = client.post(
+        '/api/v1/transaction/',
+        data=msgpack.packb({**FORECAST, 'prediction_horizon': 2}),
+        content_type='application/msgpack'
+    )
+    assert response.status_code == 200
+    assert response.json['algorithm'] == 'poisson_process'
+
+
+def test_listing_as_arrow(client, forecast_ids):
+    pa = pytest.importorskip('pyarrow')
+    response = client.get('/api/v1/transaction/', headers={'Accept': 'application/vnd.apache.arrow.stream'})
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert sorted(table.column('id').to_pylist()) == sorted(forecast_ids)
+
+
+def test_unsupported_media_type_is_not_acceptable(client):
+    response = client.get('/api/v1/transaction/', headers={'Accept': 'text/csv'})
+    assert response.status_code == 406
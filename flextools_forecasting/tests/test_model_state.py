@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from forecasting.algorithms.transaction import TransactionForecastAlgorithm
+from conftest import make_history, make_records
+
+ALGORITHMS = [
+    ('exponential_smoothing', {}),
+    ('holt_winters', {}),
+    ('holt_winters', {'fit': True}),
+    ('seasonal_poisson', {}),
+    ('seasonal_poisson', {'profile': 'day'}),
+]
+
+
+@pytest.mark.parametrize('algorithm, input_data', ALGORITHMS)
+@pytest.mark.parametrize('event_type', ['storage', 'both'])
+def test_incremental_state_matches_full_history(algorithm, input_data, event_type):
+    """
+    Folding new events into a persisted state forecasts the same as fitting the whole history.
+    """
+    history = make_history(make_records())
+    # The history as it was at an earlier time
+    cut = history['storage'][1200]
+    earlier = {name: timestamps[:np.searchsorted(timestamps, cut, side='right')] for name, timestamps in history.items()}
+    state = {}
+    TransactionForecastAlgorithm.predict(algorithm, input_data, event_type, 6, earlier, state)
+    assert state['watermark'] <= cut
+    resumed = TransactionForecastAlgorithm.predict(algorithm, input_data, event_type, 6, history, state)
+    full = TransactionForecastAlgorithm.predict(algorithm, input_data, event_type, 6, history)
+
+    assert resumed['next_transaction'] == full['next_transaction']
+    if 'parameters' in full:
+        assert resumed['parameters'] == pytest.approx(full['parameters'])
+
+
+def test_state_without_new_events_is_unchanged():
+    history = make_history(make_records())
+    state = {}
+    first = TransactionForecastAlgorithm.predict('seasonal_poisson', {}, 'storage', 6, history, state)
+    saved = dict(state)
+    second = TransactionForecastAlgorithm.predict('seasonal_poisson', {}, 'storage', 6, history, state)
+    assert state == saved
+    assert second['next_transaction'] == first['next_transaction']
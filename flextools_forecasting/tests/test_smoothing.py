@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from forecasting.algorithms.smoothing import BLOCK_STEPS, _holt_winters_step, holt_winters_filter
+
+
+def reference_filter(inter_event_times, alpha, beta, gamma, level, trend, season, start=1):
+    """
+    Runs the Holt-Winters recursion one step at a time.
+    """
+    level, trend, season = level.copy(), trend.copy(), season.copy()
+    sse = np.zeros(alpha.size)
+    smoothed = np.zeros(alpha.size)
+    for i, value in enumerate(inter_event_times, start=start):
+        squared_error, step_smoothed = _holt_winters_step(value, i, alpha, beta, gamma, level, trend, season)
+        sse += squared_error
+        smoothed += step_smoothed
+    return {'sse': sse, 'level': level, 'trend': trend, 'season': season, 'smoothed': smoothed}
+
+
+def initial_state(rng, candidates, seasonality):
+    return rng.normal(120, 10, candidates), rng.normal(0, 1, candidates), rng.normal(0, 5, (candidates, seasonality))
+
+
+@pytest.mark.parametrize('size', [5, BLOCK_STEPS, 10 * BLOCK_STEPS + 3])
+@pytest.mark.parametrize('seasonality', [1, 7, 24])
+@pytest.mark.parametrize('start', [1, 13])
+def test_block_filter_matches_stepwise_recursion(size, seasonality, start):
+    rng = np.random.default_rng(size + seasonality)
+    inter_event_times = rng.exponential(120, size)
+    alpha, beta, gamma = (rng.uniform(0, 1, 4) for _ in range(3))
+    level, trend, season = initial_state(rng, 4, seasonality)
+
+    expected = reference_filter(inter_event_times, alpha, beta, gamma, level, trend, season, start)
+    result = holt_winters_filter(inter_event_times, alpha, beta, gamma, level, trend, season, start)
+    for name in ('sse', 'level', 'trend', 'season', 'smoothed'):
+        np.testing.assert_allclose(result[name], expected[name], rtol=1e-8, atol=1e-6)
+
+
+def test_filter_resumes_from_its_final_state():
+    rng = np.random.default_rng(0)
+    inter_event_times = rng.exponential(120, 1000)
+    alpha, beta, gamma = np.array([0.2, 0.5]), np.array([0.1, 0.05]), np.array([0.3, 0.8])
+    level, trend, season = initial_state(rng, 2, 7)
+
+    full = holt_winters_filter(inter_event_times, alpha, beta, gamma, level, trend, season)
+    first = holt_winters_filter(inter_event_times[:333], alpha, beta, gamma, level, trend, season)
+    second = holt_winters_filter(inter_event_times[333:], alpha, beta, gamma, first['level'], first['trend'], first['season'], start=334)
+    np.testing.assert_allclose(first['sse'] + second['sse'], full['sse'], rtol=1e-8)
+    np.testing.assert_allclose(first['smoothed'] + second['smoothed'], full['smoothed'], rtol=1e-8)
+    np.testing.assert_allclose(second['season'], full['season'], rtol=1e-8, atol=1e-6)
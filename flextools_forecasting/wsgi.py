@@ -1,2 +1,3 @@
-from forecasting import create_app
-app=create_app()
\ No newline at end of file
+from forecasting import create_app, warm_up
+app=create_app()
+warm_up()
\ No newline at end of file